@@ -1,19 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, Form
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from typing import List, Dict
-from itertools import groupby
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func
+from typing import List, Dict, Optional
+from datetime import datetime, time
 import secrets
 import os
 import logging
 import traceback
 from .database import get_db
-from .models import Checklist, Chore
+from .models import Checklist, Chore, Section
+from .workbooks import parse_workbook, export_workbook, apply_checklist_structure
+from .reminders import reminder_scheduler
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -24,6 +26,9 @@ templates = Jinja2Templates(directory="templates")
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")  # Change this in production!
 
+# Checklists rendered per admin page
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "10"))
+
 def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
     correct_username = secrets.compare_digest(credentials.username, ADMIN_USERNAME)
     correct_password = secrets.compare_digest(credentials.password, ADMIN_PASSWORD)
@@ -36,50 +41,115 @@ def verify_admin(credentials: HTTPBasicCredentials = Depends(security)):
         )
     return credentials.username
 
-def group_chores_by_section(chores):
+def group_chores_by_section(sections, chores) -> List[Dict]:
+    """Group chores by section id, ordered by section order then chore order.
+    
+    Chores whose section is missing end up in a trailing "Uncategorized" group.
+    Archived chores are left out.
+    """
     try:
-        # Sort chores by section to prepare for grouping
-        sorted_chores = sorted(chores, key=lambda x: (x.section or ""))  # Handle None sections
-        # Group chores by section
-        grouped = {}
-        for section, items in groupby(sorted_chores, key=lambda x: (x.section or "")):
-            grouped[section] = list(items)
+        groups = {
+            section.id: {"id": section.id, "name": section.name, "order": section.order or 0, "chores": []}
+            for section in sections
+        }
+        uncategorized = {"id": None, "name": None, "order": None, "chores": []}
+        for chore in chores:
+            if chore.archived_at is None:
+                groups.get(chore.section_id, uncategorized)["chores"].append(chore)
+        
+        grouped = sorted(groups.values(), key=lambda g: (g["order"], g["id"]))
+        if uncategorized["chores"]:
+            grouped.append(uncategorized)
+        for group in grouped:
+            group["chores"].sort(key=lambda c: (c.order or 0, c.id))
         return grouped
     except Exception as e:
         logger.error(f"Error in group_chores_by_section: {str(e)}")
         logger.error(traceback.format_exc())
-        return {}
+        return []
+
+def serialize_chore(chore: Chore) -> Dict:
+    return {
+        "id": chore.id,
+        "description": chore.description,
+        "order": chore.order,
+        "section_id": chore.section_id,
+        "due_time": chore.due_time.strftime("%H:%M") if chore.due_time else None
+    }
+
+def parse_due_time(value: Optional[str]) -> Optional[time]:
+    """Parse an optional HH:MM due time from a form."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), "%H:%M").time()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Due time must be HH:MM")
+
+def get_or_create_section(db: Session, checklist_id: int, name: str) -> Section:
+    """Find a checklist's section by name, creating it at the end if needed."""
+    section = (
+        db.query(Section)
+        .filter(Section.checklist_id == checklist_id, Section.name == name)
+        .first()
+    )
+    if section:
+        return section
+    
+    max_order = db.query(func.max(Section.order)).filter(Section.checklist_id == checklist_id).scalar() or 0
+    section = Section(checklist_id=checklist_id, name=name, order=max_order + 1)
+    db.add(section)
+    db.flush()
+    return section
 
 @router.get("/admin", response_class=HTMLResponse)
-async def admin_page(request: Request, username: str = Depends(verify_admin), db: Session = Depends(get_db)):
+async def admin_page(
+    request: Request,
+    page: int = 1,
+    per_page: int = ADMIN_PAGE_SIZE,
+    collapsed: bool = False,
+    username: str = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Render the admin dashboard.
+    
+    Checklists are paginated. Each page loads its checklists, sections and
+    chores in three queries via selectinload. With ``collapsed=true`` only
+    checklist names are loaded, and each checklist's chores are fetched on
+    demand from ``/admin/checklist/{id}/chores``.
+    """
     try:
-        logger.info("Fetching checklists from database...")
-        checklists = db.query(Checklist).all()
-        logger.info(f"Found {len(checklists)} checklists")
+        page = max(page, 1)
+        per_page = min(max(per_page, 1), 100)
+        
+        # Lightweight list of every checklist for the sidebar and the add-chore form
+        all_checklists = db.query(Checklist.id, Checklist.name).order_by(Checklist.id).all()
+        total_pages = max((len(all_checklists) + per_page - 1) // per_page, 1)
+        
+        query = db.query(Checklist).order_by(Checklist.id).offset((page - 1) * per_page).limit(per_page)
+        if not collapsed:
+            query = query.options(selectinload(Checklist.sections), selectinload(Checklist.chores))
+        checklists = query.all()
+        logger.debug(f"Rendering admin page {page}/{total_pages} with {len(checklists)} checklists")
         
-        # Create a dictionary to store grouped chores for each checklist
         checklist_data = []
         for checklist in checklists:
-            try:
-                logger.info(f"Processing checklist: {checklist.name}")
-                logger.info(f"Number of chores: {len(checklist.chores)}")
-                grouped_chores = group_chores_by_section(checklist.chores)
-                checklist_data.append({
-                    "id": checklist.id,
-                    "name": checklist.name,
-                    "grouped_chores": grouped_chores
-                })
-            except Exception as e:
-                logger.error(f"Error processing checklist {checklist.name}: {str(e)}")
-                logger.error(traceback.format_exc())
-                continue
+            checklist_data.append({
+                "id": checklist.id,
+                "name": checklist.name,
+                "sections": None if collapsed else group_chores_by_section(checklist.sections, checklist.chores)
+            })
         
-        logger.info("Rendering admin template...")
         return templates.TemplateResponse(
             "admin.html",
             {
                 "request": request,
                 "checklists": checklist_data,
+                "all_checklists": all_checklists,
+                "page": page,
+                "per_page": per_page,
+                "total_pages": total_pages,
+                "collapsed": collapsed,
                 "username": username
             }
         )
@@ -88,6 +158,31 @@ async def admin_page(request: Request, username: str = Depends(verify_admin), db
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/admin/checklist/{checklist_id}/chores")
+async def get_checklist_sections(
+    checklist_id: int,
+    username: str = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Sections and chores for one checklist, for lazy expansion on the admin page."""
+    checklist = (
+        db.query(Checklist)
+        .options(selectinload(Checklist.sections), selectinload(Checklist.chores))
+        .filter(Checklist.id == checklist_id)
+        .first()
+    )
+    if not checklist:
+        raise HTTPException(status_code=404, detail="Checklist not found")
+    
+    return [
+        {
+            "id": group["id"],
+            "name": group["name"],
+            "chores": [serialize_chore(chore) for chore in group["chores"]]
+        }
+        for group in group_chores_by_section(checklist.sections, checklist.chores)
+    ]
+
 @router.post("/admin/checklist/add")
 async def add_checklist(
     request: Request,
@@ -106,6 +201,74 @@ async def add_checklist(
     
     return RedirectResponse(url="/admin", status_code=303)
 
+@router.post("/admin/checklist/import")
+def import_checklist(
+    file: UploadFile = File(...),
+    checklist_id: Optional[int] = Form(None),
+    name: Optional[str] = Form(None),
+    username: str = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Import a checklist's sections and chores from an .xlsx workbook.
+    
+    The workbook is applied as a diff in a single transaction, so chores that
+    did not change keep their ids and completion history.
+    """
+    try:
+        title, structure = parse_workbook(file.file)
+    except Exception as e:
+        logger.error(f"Could not read workbook {file.filename}: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Could not read workbook: {str(e)}")
+    
+    if not structure:
+        raise HTTPException(status_code=400, detail="No sections or chores found in workbook")
+    
+    try:
+        if checklist_id:
+            checklist = db.query(Checklist).filter(Checklist.id == checklist_id).first()
+            if not checklist:
+                raise HTTPException(status_code=404, detail="Checklist not found")
+        else:
+            name = (name or "").strip() or title
+            if not name:
+                raise HTTPException(status_code=400, detail="Checklist name is required")
+            checklist = db.query(Checklist).filter(Checklist.name == name).first()
+            if not checklist:
+                checklist = Checklist(name=name, description=title)
+                db.add(checklist)
+                db.flush()
+        
+        stats = apply_checklist_structure(db, checklist, structure)
+        db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error importing workbook {file.filename}: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"success": True, "checklist_id": checklist.id, "checklist": checklist.name, **stats}
+
+@router.get("/admin/checklist/{checklist_id}/export")
+def export_checklist(
+    checklist_id: int,
+    username: str = Depends(verify_admin),
+    db: Session = Depends(get_db)
+):
+    """Download a checklist's sections and chores as an .xlsx workbook."""
+    checklist = db.query(Checklist).filter(Checklist.id == checklist_id).first()
+    if not checklist:
+        raise HTTPException(status_code=404, detail="Checklist not found")
+    
+    content = export_workbook(db, checklist)
+    return Response(
+        content=content,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="{checklist.name}.xlsx"'}
+    )
+
 @router.post("/admin/checklist/delete/{checklist_id}")
 async def delete_checklist(
     checklist_id: int,
@@ -134,8 +297,9 @@ async def get_chore(
     return {
         "id": chore.id,
         "description": chore.description,
-        "section": chore.section,
-        "order": chore.order
+        "section": chore.section.name if chore.section else None,
+        "order": chore.order,
+        "due_time": chore.due_time.strftime("%H:%M") if chore.due_time else None
     }
 
 @router.post("/admin/chore/add")
@@ -155,12 +319,15 @@ async def add_chore(
     
     chore = Chore(
         description=description,
-        section=section,
+        section=get_or_create_section(db, int(checklist_id), section),
         order=int(order),
-        checklist_id=int(checklist_id)
+        checklist_id=int(checklist_id),
+        due_time=parse_due_time(form.get("due_time"))
     )
     db.add(chore)
     db.commit()
+    if chore.due_time:
+        reminder_scheduler.chore_changed(chore.id, chore.due_time)
     
     return RedirectResponse(url="/admin", status_code=303)
 
@@ -184,9 +351,11 @@ async def edit_chore(
         raise HTTPException(status_code=404, detail="Chore not found")
     
     chore.description = description
-    chore.section = section
+    chore.section = get_or_create_section(db, chore.checklist_id, section)
     chore.order = int(order)
+    chore.due_time = parse_due_time(form.get("due_time"))
     db.commit()
+    reminder_scheduler.chore_changed(chore.id, chore.due_time, bool(chore.completed))
     
     return RedirectResponse(url="/admin", status_code=303)
 
@@ -202,5 +371,6 @@ async def delete_chore(
     
     db.delete(chore)
     db.commit()
+    reminder_scheduler.chore_changed(chore_id, None)
     
     return {"success": True} 
\ No newline at end of file
@@ -0,0 +1,422 @@
+"""Completion analytics for managers.
+
+``/api/analytics/*`` answers how long each shift's checklist takes, which
+chores are habitually skipped and how much each person gets through. A
+request loads one checklist's completion history for the window in a
+single query, into NumPy arrays, and computes durations, percentiles and
+rates on whole arrays rather than row by row.
+
+Results are cached per (checklist, window). Writes call ``invalidate``
+when new completions land. ``ANALYTICS_CACHE_TTL`` bounds how stale a
+result can be after writes handled by another worker.
+
+``/api/analytics/compliance`` reads the precomputed rollup tables
+instead (see ``rollups.py``), so it costs the same for any history size.
+
+Days are shift days. They start at the daily reset time, so a closing
+shift that runs past midnight counts towards the day it started.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .database import get_db
+from .models import Checklist, Chore, ChoreCompletion, Section
+from .admin import verify_admin
+from .clock import cet_tz, cet_naive, utc_naive
+from .scheduler import RESET_TIME, policy_for
+from .serializers import json_response
+from . import rollups
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/analytics", dependencies=[Depends(verify_admin)])
+
+ANALYTICS_DEFAULT_DAYS = int(os.getenv("ANALYTICS_DEFAULT_DAYS", "30"))
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "366"))
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+
+DAY_SECONDS = 86400
+EPOCH = datetime(1970, 1, 1)
+# Shift days start at the reset time
+DAY_OFFSET = RESET_TIME.hour * 3600 + RESET_TIME.minute * 60
+
+
+class History(NamedTuple):
+    """Completion events of one checklist, one array element per event, in time order."""
+    chore_ids: np.ndarray  # int64
+    staff: np.ndarray      # int64 index into staff_names
+    staff_names: np.ndarray
+    seconds: np.ndarray    # float64, local wall-clock time as epoch seconds
+    days: np.ndarray       # int64 shift day number
+    completed: np.ndarray  # bool; False for an untick
+
+
+# Cache of computed results, invalidated per checklist
+
+_lock = threading.Lock()
+_generations: Dict[int, int] = defaultdict(int)
+_cache: "OrderedDict[Tuple, Tuple[int, float, dict]]" = OrderedDict()
+
+
+def invalidate(checklist_id: int):
+    """New completions landed for a checklist; drop its cached results."""
+    with _lock:
+        _generations[checklist_id] += 1
+
+
+def _cached(key: Tuple, checklist_id: int, compute: Callable[[], dict]) -> dict:
+    now = time.monotonic()
+    with _lock:
+        generation = _generations[checklist_id]
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == generation and hit[1] > now:
+            _cache.move_to_end(key)
+            return hit[2]
+    result = compute()
+    with _lock:
+        _cache[key] = (generation, now + ANALYTICS_CACHE_TTL, result)
+        _cache.move_to_end(key)
+        while len(_cache) > ANALYTICS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+# Loading
+
+def day_date(day: int) -> date:
+    return EPOCH.date() + timedelta(days=int(day))
+
+
+def load_history(db: Session, checklist_id: int, start: date, end: date) -> History:
+    """Load the completions of shift days ``start`` to ``end`` (inclusive) in one query."""
+    # Shift days are CET; completions are stored as naive UTC
+    bounds = [
+        utc_naive(cet_tz.localize(datetime.combine(day, RESET_TIME)))
+        for day in (start, end + timedelta(days=1))
+    ]
+    rows = db.execute(
+        select(ChoreCompletion.chore_id, ChoreCompletion.staff_name, ChoreCompletion.completed, ChoreCompletion.completed_at)
+        .join(Chore, Chore.id == ChoreCompletion.chore_id)
+        .where(
+            Chore.checklist_id == checklist_id,
+            ChoreCompletion.completed_at >= bounds[0],
+            ChoreCompletion.completed_at < bounds[1]
+        )
+        .order_by(ChoreCompletion.completed_at)
+    ).all()
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return History(empty, empty, np.array([], dtype=str), np.array([], dtype=np.float64), empty, np.array([], dtype=bool))
+
+    chore_ids, staff_names, completed, completed_at = zip(*rows)
+    # Computed on CET wall-clock time, so shift days and durations follow the local clock
+    stamps = np.array([cet_naive(value) for value in completed_at], dtype="datetime64[us]")
+    seconds = stamps.astype(np.int64) / 1e6
+    names, staff = np.unique(np.array([name or "" for name in staff_names], dtype=str), return_inverse=True)
+    return History(
+        chore_ids=np.array(chore_ids, dtype=np.int64),
+        staff=staff.astype(np.int64),
+        staff_names=names,
+        seconds=seconds,
+        days=((seconds - DAY_OFFSET) // DAY_SECONDS).astype(np.int64),
+        completed=np.array([bool(value) for value in completed], dtype=bool),
+    )
+
+
+# Vectorized computations
+
+def _group_ends(*keys: np.ndarray) -> np.ndarray:
+    """Boolean mask of the last element of each run of equal keys (keys already sorted)."""
+    ends = np.ones(len(keys[0]), dtype=bool)
+    for key in keys:
+        ends[:-1] &= key[1:] == key[:-1]
+    ends[:-1] = ~ends[:-1]
+    return ends
+
+
+def final_states(history: History) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(chore id, day, done) for every chore touched on a day, done being its last state that day."""
+    order = np.lexsort((history.seconds, history.days, history.chore_ids))
+    chore_ids, days = history.chore_ids[order], history.days[order]
+    last = _group_ends(chore_ids, days)
+    return chore_ids[last], days[last], history.completed[order][last]
+
+
+def shift_durations(history: History) -> dict:
+    """First to last tick of each shift day, with percentiles over the days."""
+    done = history.completed
+    days, seconds = history.days[done], history.seconds[done]
+    if len(days) == 0:
+        return {"shifts": 0, "minutes": None, "days": []}
+    # Events are in time order, so a day's first and last ticks bound its shift
+    unique_days, first = np.unique(days, return_index=True)
+    last = len(days) - 1 - np.unique(days[::-1], return_index=True)[1]
+    started, finished = seconds[first], seconds[last]
+    minutes = (finished - started) / 60
+    ticks = np.bincount(np.searchsorted(unique_days, days), minlength=len(unique_days))
+    p50, p90 = np.percentile(minutes, [50, 90])
+    clock = lambda value: (EPOCH + timedelta(seconds=float(value))).strftime("%H:%M")
+    return {
+        "shifts": int(len(unique_days)),
+        "minutes": {
+            "mean": round(float(minutes.mean()), 1),
+            "p50": round(float(p50), 1),
+            "p90": round(float(p90), 1),
+            "min": round(float(minutes.min()), 1),
+            "max": round(float(minutes.max()), 1),
+        },
+        "days": [
+            {"day": day_date(day).isoformat(), "started": clock(start), "finished": clock(end), "minutes": round(float(m), 1), "ticks": int(n)}
+            for day, start, end, m, n in zip(unique_days, started, finished, minutes, ticks)
+        ],
+    }
+
+
+def skip_rates(history: History, chores: List[Tuple[int, str, str]]) -> dict:
+    """How often each chore was left open on days the checklist was used."""
+    active_days = np.unique(history.days)
+    chore_ids = np.array([chore_id for chore_id, _, _ in chores], dtype=np.int64)
+    order = np.argsort(chore_ids)
+    done_ids, _, done = final_states(history)
+    done_ids = done_ids[done]
+    # Count done days per chore via its position in the sorted chore list
+    positions = np.searchsorted(chore_ids[order], done_ids)
+    known = (positions < len(chore_ids)) & (chore_ids[order][np.minimum(positions, len(chore_ids) - 1)] == done_ids)
+    done_days = np.zeros(len(chore_ids), dtype=np.int64)
+    done_days[order] = np.bincount(positions[known], minlength=len(chore_ids))
+    total = len(active_days)
+    rates = 1 - done_days / total if total else np.zeros(len(chore_ids))
+    ranking = np.lexsort((chore_ids, -rates))
+    return {
+        "active_days": total,
+        "chores": [
+            {
+                "chore_id": int(chore_ids[i]),
+                "description": chores[i][1],
+                "section": chores[i][2],
+                "done_days": int(done_days[i]),
+                "skipped_days": int(total - done_days[i]),
+                "skip_rate": round(float(rates[i]), 3),
+            }
+            for i in ranking
+        ],
+    }
+
+
+def staff_throughput(history: History) -> dict:
+    """Ticks, shifts and pace per person."""
+    done = history.completed
+    staff, days, seconds = history.staff[done], history.days[done], history.seconds[done]
+    count = len(history.staff_names)
+    ticks = np.bincount(staff, minlength=count)
+
+    order = np.lexsort((seconds, days, staff))
+    staff, days, seconds = staff[order], days[order], seconds[order]
+    shift_ends = _group_ends(staff, days) if len(staff) else np.array([], dtype=bool)
+    shifts = np.bincount(staff[shift_ends], minlength=count)
+
+    # Gaps between one person's consecutive ticks within a shift, median per person
+    same = (staff[1:] == staff[:-1]) & (days[1:] == days[:-1])
+    gap_staff, gaps = staff[1:][same], np.diff(seconds)[same]
+    gap_order = np.lexsort((gaps, gap_staff))
+    gap_staff, gaps = gap_staff[gap_order], gaps[gap_order]
+    gap_counts = np.bincount(gap_staff, minlength=count)
+    starts = np.concatenate(([0], np.cumsum(gap_counts)[:-1]))
+    medians = np.full(count, np.nan)
+    has_gaps = gap_counts > 0
+    lower = starts[has_gaps] + (gap_counts[has_gaps] - 1) // 2
+    upper = starts[has_gaps] + gap_counts[has_gaps] // 2
+    medians[has_gaps] = (gaps[lower] + gaps[upper]) / 2
+
+    ranking = np.argsort(-ticks, kind="stable")
+    return {
+        "staff": [
+            {
+                "staff": str(history.staff_names[i]) or None,
+                "ticks": int(ticks[i]),
+                "shifts": int(shifts[i]),
+                "ticks_per_shift": round(float(ticks[i] / shifts[i]), 1) if shifts[i] else 0,
+                "median_gap_seconds": None if np.isnan(medians[i]) else round(float(medians[i]), 1),
+            }
+            for i in ranking
+            if ticks[i]
+        ]
+    }
+
+
+# Endpoints
+
+class Window(NamedTuple):
+    checklist: Checklist
+    start: date
+    end: date
+
+
+def get_window(
+    checklist: str,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+) -> Window:
+    """The checklist and shift-day range of a request; the last ANALYTICS_DEFAULT_DAYS by default."""
+    row = db.query(Checklist).filter(Checklist.name == checklist).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Checklist not found")
+    end = end or rollups.shift_day(datetime.now(cet_tz))
+    start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window is limited to {ANALYTICS_MAX_DAYS} days")
+    return Window(row, start, end)
+
+
+def _respond(kind: str, window: Window, compute: Callable[[], dict]):
+    checklist = window.checklist
+    result = _cached((kind, checklist.id, window.start, window.end), checklist.id, compute)
+    return json_response({
+        "checklist": checklist.name,
+        "from": window.start.isoformat(),
+        "to": window.end.isoformat(),
+        **result,
+    })
+
+
+@router.get("/durations")
+def checklist_durations(window: Window = Depends(get_window), db: Session = Depends(get_db)):
+    """How long each shift took to work through the checklist."""
+    try:
+        return _respond("durations", window, lambda: shift_durations(
+            load_history(db, window.checklist.id, window.start, window.end)
+        ))
+    except Exception as e:
+        logger.error(f"Error computing checklist durations: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/skipped")
+def skipped_chores(window: Window = Depends(get_window), db: Session = Depends(get_db)):
+    """Chores ranked by how often they were left open."""
+    def compute():
+        chores = (
+            db.query(Chore.id, Chore.description, Section.name)
+            .outerjoin(Section, Section.id == Chore.section_id)
+            .filter(Chore.checklist_id == window.checklist.id, Chore.archived_at.is_(None))
+            .all()
+        )
+        return skip_rates(load_history(db, window.checklist.id, window.start, window.end), chores)
+
+    try:
+        return _respond("skipped", window, compute)
+    except Exception as e:
+        logger.error(f"Error computing skipped chores: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/staff")
+def staff_stats(window: Window = Depends(get_window), db: Session = Depends(get_db)):
+    """Per-person ticks, shifts worked and median time between ticks."""
+    try:
+        return _respond("staff", window, lambda: staff_throughput(
+            load_history(db, window.checklist.id, window.start, window.end)
+        ))
+    except Exception as e:
+        logger.error(f"Error computing staff throughput: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/compliance")
+def compliance(
+    checklist: Optional[str] = None,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    period: str = "day",
+    db: Session = Depends(get_db),
+):
+    """Share of days (weeks for weekly checklists) each checklist was submitted, from the rollups.
+
+    Reads one index range of ``checklist_daily_rollups`` (``period=day``)
+    or ``checklist_weekly_rollups`` (``period=week``, the range widened to
+    whole ISO weeks), whatever the size of the history.
+    """
+    try:
+        if period not in ("day", "week"):
+            raise HTTPException(status_code=400, detail="period must be 'day' or 'week'")
+        today = rollups.shift_day(datetime.now(cet_tz))
+        end = end or today
+        start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+        if period == "week":
+            start, end = rollups.week_of(start), rollups.week_of(end) + timedelta(days=6)
+        if start > end:
+            raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+        if (end - start).days >= ANALYTICS_MAX_DAYS:
+            raise HTTPException(status_code=400, detail=f"Window is limited to {ANALYTICS_MAX_DAYS} days")
+
+        query = db.query(Checklist.id, Checklist.name)
+        if checklist:
+            query = query.filter(Checklist.name == checklist)
+        checklists = query.order_by(Checklist.name).all()
+        if checklist and not checklists:
+            raise HTTPException(status_code=404, detail="Checklist not found")
+
+        ids = [checklist_id for checklist_id, _ in checklists]
+        if period == "day":
+            rows = rollups.daily_rollups(db, ids, start, end)
+        else:
+            rows = rollups.weekly_rollups(db, ids, start, end)
+        by_checklist: Dict[int, list] = defaultdict(list)
+        for row in rows:
+            by_checklist[row.checklist_id].append(row)
+
+        # Days still to come are not expected to be submitted yet
+        last = min(end, today)
+        days = max((last - start).days + 1, 0)
+        weeks = max((rollups.week_of(last) - rollups.week_of(start)).days // 7 + 1, 0) if days else 0
+        result = []
+        for checklist_id, name in checklists:
+            series = by_checklist[checklist_id]
+            weekly = policy_for(name).frequency == "weekly"
+            if period == "day":
+                submitted_days = [row.day for row in series if row.submissions]
+                submitted = len({rollups.week_of(day) for day in submitted_days}) if weekly else len(submitted_days)
+            else:
+                submitted = sum(1 for row in series if row.submissions) if weekly else sum(row.days_submitted for row in series)
+            expected = weeks if weekly else days
+            result.append({
+                "checklist": name,
+                "frequency": "weekly" if weekly else "daily",
+                "expected": expected,
+                "submitted": submitted,
+                "compliance": round(submitted / expected, 3) if expected else None,
+                "ticks": sum(row.ticks for row in series),
+                "unticks": sum(row.unticks for row in series),
+                "submissions": sum(row.submissions for row in series),
+                "series": [
+                    {
+                        period: (row.day if period == "day" else row.week).isoformat(),
+                        "ticks": row.ticks,
+                        "unticks": row.unticks,
+                        "submissions": row.submissions,
+                        **({"days_submitted": row.days_submitted} if period == "week" else {}),
+                    }
+                    for row in series
+                ],
+            })
+        return json_response({"from": start.isoformat(), "to": end.isoformat(), "period": period, "checklists": result})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing compliance: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
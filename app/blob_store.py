@@ -0,0 +1,137 @@
+import os
+import io
+import base64
+import hashlib
+import logging
+import tempfile
+from typing import Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Where signature images are kept and whether to losslessly re-encode them smaller
+SIGNATURE_STORE_DIR = os.getenv("SIGNATURE_STORE_DIR", "data/signatures")
+SIGNATURE_COMPACT_PNG = os.getenv("SIGNATURE_COMPACT_PNG", "true").lower() in ("1", "true", "yes")
+
+# Images with at most this many distinct colours are stored as exact palette PNGs
+PALETTE_COLORS = 256
+
+
+class LocalBlobStore:
+    """Content-addressed blob store on the local filesystem.
+
+    Blobs are stored under their SHA-256 digest, sharded into two directory
+    levels (``ab/cd/abcd...``) so no single directory grows too large.
+    Writing the same content twice is a no-op.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def put(self, data: bytes) -> str:
+        """Store raw bytes and return their hex digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            return digest
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+    def delete(self, digest: str) -> None:
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+
+_store: Optional[LocalBlobStore] = None
+
+
+def get_blob_store() -> LocalBlobStore:
+    """Return the process-wide signature blob store."""
+    global _store
+    if _store is None:
+        _store = LocalBlobStore(SIGNATURE_STORE_DIR)
+        logger.info(f"Using signature blob store at {SIGNATURE_STORE_DIR}")
+    return _store
+
+
+def decode_data_url(signature_data: str) -> bytes:
+    """Decode a base64 PNG, with or without a ``data:image/png;base64,`` prefix."""
+    if signature_data.startswith("data:"):
+        signature_data = signature_data.split(",", 1)[1]
+    return base64.b64decode(signature_data)
+
+
+def compact_png(data: bytes) -> bytes:
+    """Losslessly re-encode a PNG if that makes it smaller.
+
+    Images with few enough distinct colours become palette PNGs holding
+    exactly those colours; others are only recompressed. The result is
+    decoded and compared pixel for pixel, and the original bytes are kept if
+    anything differs. Requires Pillow; without it the original bytes are
+    returned unchanged.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            pixels = image.convert("RGBA")
+            colors = pixels.getcolors(maxcolors=PALETTE_COLORS)
+            if colors:
+                palette = [color for _, color in colors]
+                index = {color: i for i, color in enumerate(palette)}
+                candidate = Image.new("P", pixels.size)
+                candidate.putdata([index[color] for color in pixels.getdata()])
+                candidate.putpalette(bytes(v for color in palette for v in color), rawmode="RGBA")
+            else:
+                candidate = image
+            out = io.BytesIO()
+            candidate.save(out, format="PNG", optimize=True)
+            compacted = out.getvalue()
+            with Image.open(io.BytesIO(compacted)) as decoded:
+                if decoded.convert("RGBA").tobytes() != pixels.tobytes():
+                    logger.warning("Re-encoded signature PNG differs from the original, storing original")
+                    return data
+    except Exception as e:
+        logger.warning(f"Could not re-encode signature PNG, storing original: {str(e)}")
+        return data
+
+    return compacted if len(compacted) < len(data) else data
+
+
+def store_signature(signature_data: str, compact: Optional[bool] = None) -> Tuple[str, int, str]:
+    """Store a base64 signature image and return ``(digest, size, mime type)``."""
+    raw = decode_data_url(signature_data)
+    if compact is None:
+        compact = SIGNATURE_COMPACT_PNG
+    if compact:
+        raw = compact_png(raw)
+    digest = get_blob_store().put(raw)
+    return digest, len(raw), "image/png"
@@ -0,0 +1,176 @@
+"""WebSocket fan-out that works across uvicorn workers.
+
+Each worker only holds its own WebSocket connections. With a single worker
+(or SQLite) a broadcast is delivered straight to them. With several workers
+on PostgreSQL every broadcast is published with ``NOTIFY`` and each worker
+delivers what it receives on its ``LISTEN`` connection, so a toggle handled
+by one worker reaches tablets connected to all of them.
+"""
+import os
+import json
+import asyncio
+import logging
+from typing import Optional, Set
+
+from fastapi import WebSocket
+from sqlalchemy import text
+
+from .database import engine
+from .metrics import websocket_connections_total, websocket_connections_active
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BROADCAST_CHANNEL = "checklist_events"
+# "auto" uses PostgreSQL LISTEN/NOTIFY when running more than one worker
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "auto").lower()
+# Sent to clients on shutdown so they reconnect after the restart, with jitter
+RECONNECT_AFTER_MS = int(os.getenv("WS_RECONNECT_AFTER_MS", "2000"))
+# Close code 1012: service restart
+WS_CLOSE_SERVICE_RESTART = 1012
+
+
+def use_postgres_backend() -> bool:
+    if BROADCAST_BACKEND == "postgres":
+        return True
+    if BROADCAST_BACKEND == "local":
+        return False
+    workers = int(os.getenv("WEB_CONCURRENCY", "1") or 1)
+    return engine.dialect.name == "postgresql" and workers > 1
+
+
+class PostgresListener:
+    """Receives NOTIFY payloads on a dedicated autocommit connection."""
+
+    def __init__(self, on_message, channel: str = BROADCAST_CHANNEL):
+        self.on_message = on_message
+        self.channel = channel
+        self._conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconnect: Optional[asyncio.Task] = None
+
+    def start(self):
+        import psycopg2
+
+        self._loop = asyncio.get_running_loop()
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._conn = psycopg2.connect(dsn)
+        self._conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self._conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel}")
+        self._loop.add_reader(self._conn.fileno(), self._poll)
+        logger.info(f"Listening for broadcasts on {self.channel}")
+
+    def _poll(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.error(f"Broadcast listener connection lost: {str(e)}")
+            self.stop()
+            self._reconnect = self._loop.create_task(self._restart())
+            return
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            try:
+                message = json.loads(notify.payload)
+            except ValueError:
+                logger.warning(f"Ignoring malformed broadcast payload: {notify.payload[:200]}")
+                continue
+            self._loop.create_task(self.on_message(message))
+
+    async def _restart(self, delay: float = 1.0):
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                self.start()
+                return
+            except Exception as e:
+                logger.error(f"Could not reconnect broadcast listener: {str(e)}")
+                delay = min(delay * 2, 30)
+
+    def stop(self):
+        if self._conn is not None:
+            try:
+                self._loop.remove_reader(self._conn.fileno())
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._reconnect is not None and asyncio.current_task() is not self._reconnect:
+            self._reconnect.cancel()
+            self._reconnect = None
+
+
+def _notify(payload: str):
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": BROADCAST_CHANNEL, "payload": payload})
+
+
+class ConnectionManager:
+    """The WebSocket connections held by this worker."""
+
+    def __init__(self):
+        self.active_connections: Set[WebSocket] = set()
+        self._listener: Optional[PostgresListener] = None
+
+    async def start(self):
+        if use_postgres_backend():
+            self._listener = PostgresListener(self.deliver)
+            self._listener.start()
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        self.active_connections.add(websocket)
+        websocket_connections_total.inc()
+        websocket_connections_active.inc()
+
+    def disconnect(self, websocket: WebSocket):
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+            websocket_connections_active.dec()
+
+    async def broadcast(self, message: dict):
+        """Send a message to every client connected to any worker."""
+        if self._listener is None:
+            await self.deliver(message)
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _notify, json.dumps(message, default=str))
+        except Exception as e:
+            # Better to reach this worker's clients than nobody
+            logger.error(f"Broadcast NOTIFY failed, delivering locally: {str(e)}")
+            await self.deliver(message)
+
+    async def deliver(self, message: dict):
+        """Send a message to the clients connected to this worker."""
+        for connection in list(self.active_connections):
+            try:
+                await connection.send_json(message)
+            except Exception:
+                self.disconnect(connection)
+
+    async def close_all(self, reason: str = "server restarting"):
+        """Ask every client to reconnect, then close with 1012 (service restart)."""
+        if not self.active_connections:
+            return
+        logger.info(f"Closing {len(self.active_connections)} WebSocket connections for shutdown")
+        hint = {"type": "reconnect", "reason": reason, "retry_after_ms": RECONNECT_AFTER_MS}
+
+        async def close(connection: WebSocket):
+            try:
+                await connection.send_json(hint)
+                await connection.close(code=WS_CLOSE_SERVICE_RESTART, reason=reason)
+            except Exception:
+                pass
+            self.disconnect(connection)
+
+        # Concurrently: each close waits for the client's half of the handshake
+        await asyncio.gather(*(close(c) for c in list(self.active_connections)))
+
+
+manager = ConnectionManager()
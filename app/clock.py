@@ -0,0 +1,22 @@
+from datetime import datetime
+import pytz
+
+# Set Central European timezone
+cet_tz = pytz.timezone('Europe/Berlin')  # Berlin uses CET/CEST
+
+
+def utc_naive(when=None):
+    """``when`` (aware, or naive server-local time) as naive UTC, the way timestamps are stored."""
+    if when is None:
+        return datetime.utcnow()
+    return when.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def utc_iso(utc):
+    """A stored naive UTC timestamp as an ISO string with its offset, or None."""
+    return pytz.utc.localize(utc).isoformat() if utc else None
+
+
+def cet_naive(utc):
+    """A stored naive UTC timestamp as naive CET wall-clock time."""
+    return pytz.utc.localize(utc).astimezone(cet_tz).replace(tzinfo=None)
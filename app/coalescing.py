@@ -0,0 +1,130 @@
+"""Keep DB load flat when many tablets hit the API at once.
+
+``SingleFlight`` lets concurrent identical reads share one in-flight query:
+when a room of tablets reconnects after a Wi-Fi blip and all of them fetch
+the same checklist, only the first request runs the queries and the rest
+wait for its result. ``RateLimiter`` is a token bucket per client that
+the write endpoints take as a dependency.
+
+Both are per worker process, so with several workers each one coalesces
+and limits on its own.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastapi import HTTPException, Request
+
+from .metrics import Counter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Sustained writes per second per client, and how many may come in a burst
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "5"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "20"))
+# Oldest buckets are evicted past this many clients
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+
+coalesced_requests = Counter("coalesced_requests_total", "Reads served from another request's in-flight query.", ["key"])
+rate_limited_requests = Counter("rate_limited_requests_total", "Write requests rejected with 429.", ["route"])
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result.
+
+    The shared call runs as its own task, so if the request that started it
+    goes away the others still get their answer. Exceptions (including
+    HTTPException) are shared too. A caller that joins a running flight can
+    get a result that is at most one query duration old.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            coalesced_requests.inc(key=self.name)
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+def client_key(request: Request) -> str:
+    """Identify a device: the tablet's X-Client-Id, else its address.
+
+    Tablets in one venue usually share a public IP, so the per-device id
+    sent by the frontend keeps one busy tablet from throttling the others.
+    """
+    client_id = request.headers.get("x-client-id")
+    if client_id:
+        return f"id:{client_id[:64]}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimiter:
+    """Token bucket per client; use an instance as a FastAPI dependency.
+
+    Each client may make ``burst`` requests at once and ``rate`` per second
+    after that. Over the limit the request gets a 429 with Retry-After.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # client -> (tokens, last refill time), least recently seen first
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """Take a token for ``key``; return 0, or the seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        tokens, last = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def __call__(self, request: Request):
+        # Runs on the event loop, so the buckets need no lock
+        if self.rate <= 0:
+            return
+        wait = self.acquire(client_key(request))
+        if wait:
+            route = request.scope.get("route")
+            rate_limited_requests.inc(route=getattr(route, "path", request.url.path))
+            logger.debug(f"Rate limited {client_key(request)} on {request.url.path}")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, slow down",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+chores_flight = SingleFlight("checklist_chores")
+write_limiter = RateLimiter()
@@ -7,17 +7,8 @@ import asyncio
 import logging
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Add file handler for persistent logs
-file_handler = logging.FileHandler('database.log')
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(file_handler)
-
 # Load environment variables
 load_dotenv()
 
@@ -32,10 +23,29 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Connection pool per worker process; serve.py sizes the worker count so
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under DB_MAX_CONNECTIONS
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+def engine_options(url: str) -> dict:
+    """Pool settings for ``create_engine``; SQLite keeps SQLAlchemy's defaults."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
 # Create SQLAlchemy engine with detailed logging
 try:
     logger.info("Creating SQLAlchemy engine...")
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
     logger.info("SQLAlchemy engine created successfully")
 except Exception as e:
     logger.error(f"Failed to create SQLAlchemy engine: {str(e)}", exc_info=True)
@@ -43,11 +53,11 @@ except Exception as e:
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-logger.info("Session factory created")
+logger.debug("Session factory created")
 
 # Create base class for models
 Base = declarative_base()
-logger.info("Base class for models created")
+logger.debug("Base class for models created")
 
 async def test_db_connection(db: Session) -> bool:
     """Test database connection with a short timeout.
@@ -69,16 +79,14 @@ async def test_db_connection(db: Session) -> bool:
         return False
 
 def get_db():
-    """Get database session with logging."""
-    logger.info("Getting database session...")
+    """Get database session, closed when the request finishes."""
     db = SessionLocal()
     try:
-        logger.info("Database session created successfully")
         yield db
     except Exception as e:
-        logger.error(f"Error in database session: {str(e)}", exc_info=True)
+        # HTTP errors raised by the endpoint (404s and the like) are not session failures
+        if getattr(e, "status_code", 500) >= 500:
+            logger.error(f"Error in database session: {str(e)}", exc_info=True)
         raise
     finally:
-        logger.info("Closing database session...")
-        db.close()
-        logger.info("Database session closed") 
\ No newline at end of file
+        db.close() 
\ No newline at end of file
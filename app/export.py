@@ -0,0 +1,177 @@
+"""Streaming export of completion history and the audit log.
+
+Health inspections need the full record of who ticked what and when, who
+signed off each checklist, and when checklists were reset. The export
+runs the query with ``yield_per``, which uses a server-side cursor on
+PostgreSQL. Each batch is encoded as NDJSON or CSV and sent as soon as it
+is fetched, so memory stays constant whether the table has a thousand
+rows or fifty million. ``/api/export/{kind}`` streams it over HTTP and
+``export_history.py`` writes it to a file.
+
+Timestamps are stored as naive UTC and written with their UTC offset.
+The ``from``/``to`` dates are CET calendar days.
+"""
+import io
+import csv
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .database import get_db, SessionLocal
+from .models import Checklist, ChecklistReset, Chore, ChoreCompletion, Section, Signature
+from .admin import verify_admin
+from .clock import cet_tz, utc_iso, utc_naive
+from .serializers import dumps
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/export", dependencies=[Depends(verify_admin)])
+
+EXPORT_BATCH_SIZE = 2000
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class Export(NamedTuple):
+    query: object  # Select with one labelled column per output field
+    timestamp: object  # Column the date range filters and orders on
+    checklist_id: object
+
+
+EXPORTS: Dict[str, Export] = {
+    "completions": Export(
+        select(
+            ChoreCompletion.id,
+            Checklist.name.label("checklist"),
+            Section.name.label("section"),
+            Chore.description.label("chore"),
+            ChoreCompletion.staff_name,
+            ChoreCompletion.completed,
+            ChoreCompletion.completed_at,
+            ChoreCompletion.comment,
+        )
+        .join(Chore, Chore.id == ChoreCompletion.chore_id)
+        .join(Checklist, Checklist.id == Chore.checklist_id)
+        .outerjoin(Section, Section.id == Chore.section_id),
+        ChoreCompletion.completed_at, Chore.checklist_id
+    ),
+    "signatures": Export(
+        select(
+            Signature.id,
+            Checklist.name.label("checklist"),
+            Signature.staff_name,
+            Signature.completed_at,
+            Signature.signature_hash,
+        )
+        .join(Checklist, Checklist.id == Signature.checklist_id),
+        Signature.completed_at, Signature.checklist_id
+    ),
+    "resets": Export(
+        select(
+            ChecklistReset.id,
+            Checklist.name.label("checklist"),
+            ChecklistReset.trigger,
+            ChecklistReset.reset_by,
+            ChecklistReset.chores_reset,
+            ChecklistReset.reset_at,
+        )
+        .join(Checklist, Checklist.id == ChecklistReset.checklist_id),
+        ChecklistReset.reset_at, ChecklistReset.checklist_id
+    ),
+}
+
+
+def _bound(day: date) -> datetime:
+    """Start of a CET calendar day as naive UTC, like the stored timestamps."""
+    return utc_naive(cet_tz.localize(datetime.combine(day, datetime.min.time())))
+
+
+def _with_offsets(row: dict) -> dict:
+    for name, value in row.items():
+        if isinstance(value, datetime):
+            row[name] = utc_iso(value)
+    return row
+
+
+def _ndjson(columns, rows, convert) -> bytes:
+    return b"".join(dumps(convert(dict(zip(columns, row)))) + b"\n" for row in rows)
+
+
+def _csv(columns, rows, convert) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(convert(dict(zip(columns, row))).values() for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def stream_export(
+    kind: str,
+    fmt: str = "ndjson",
+    checklist_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """Yield ``kind`` rows from ``start`` to ``end`` (CET dates, inclusive), one chunk per batch.
+
+    Uses its own session, which stays open until the generator is exhausted
+    or closed, so it outlives the request's dependencies.
+    """
+    export = EXPORTS[kind]
+    stmt = export.query
+    if checklist_id is not None:
+        stmt = stmt.where(export.checklist_id == checklist_id)
+    if start is not None:
+        stmt = stmt.where(export.timestamp >= _bound(start))
+    if end is not None:
+        stmt = stmt.where(export.timestamp < _bound(end + timedelta(days=1)))
+    stmt = stmt.order_by(export.timestamp, stmt.selected_columns.id)
+
+    encode = _csv if fmt == "csv" else _ndjson
+    rows = 0
+    with SessionLocal() as db:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        if fmt == "csv":
+            yield _csv(columns, [columns], lambda row: row)
+        for batch in result.partitions():
+            rows += len(batch)
+            yield encode(columns, batch, _with_offsets)
+    logger.info(f"Exported {rows} {kind} rows as {fmt}")
+
+
+@router.get("/{kind}")
+def export_history(
+    kind: str,
+    fmt: str = Query("ndjson", alias="format"),
+    checklist: Optional[str] = None,
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+):
+    """Stream ``completions``, ``signatures`` or ``resets`` as NDJSON or CSV."""
+    if kind not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export, expected one of: {', '.join(EXPORTS)}")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    checklist_id = None
+    if checklist:
+        checklist_id = db.query(Checklist.id).filter(Checklist.name == checklist).scalar()
+        if checklist_id is None:
+            raise HTTPException(status_code=404, detail="Checklist not found")
+
+    filename = "-".join(str(part) for part in (kind, checklist, start, end) if part) + f".{fmt}"
+    return StreamingResponse(
+        stream_export(kind, fmt, checklist_id, start, end),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,328 @@
+"""Idempotency keys for the write endpoints.
+
+A client that sends an ``Idempotency-Key`` header with a POST, PUT, PATCH
+or DELETE gets the same response for every request with that key. Only the
+first request runs; repeats from double taps and Wi-Fi retries get the
+stored response back without touching the database or sending another
+Telegram message or PDF. Keys are scoped to the client (see
+``client_key``) and the path. Reusing a key with a different body is
+rejected with 422.
+
+Responses are kept in memory (an LRU bounded by ``IDEMPOTENCY_MAX_KEYS``
+entries) for ``IDEMPOTENCY_TTL`` seconds. With several workers they go to
+the ``idempotency_keys`` table instead, so a retry that lands on another
+worker is still deduplicated. Server errors and 429s are not stored, so
+those requests can be retried.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import anyio
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from starlette.requests import Request
+
+from .database import SessionLocal
+from .models import IdempotencyKey
+from .metrics import Counter
+from .coalescing import client_key
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# "auto" uses the database when running more than one worker
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "auto").lower()
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# Larger responses (PDF downloads) are passed through but not stored
+IDEMPOTENCY_MAX_BODY = int(os.getenv("IDEMPOTENCY_MAX_BODY", str(1024 * 1024)))
+# How long a repeat waits for the first request to finish before getting a 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Not replayed: they describe the original response, or are recomputed
+SKIPPED_HEADERS = {b"content-length", b"date", b"server", b"set-cookie"}
+
+# reserve() outcomes
+NEW = "new"
+DONE = "done"
+PENDING = "pending"
+MISMATCH = "mismatch"
+
+idempotent_replays = Counter("idempotent_replays_total", "Requests answered from a stored response.")
+idempotent_conflicts = Counter("idempotent_conflicts_total", "Repeated keys rejected because the body differed or the first request was still running.", ["reason"])
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+def use_database_backend() -> bool:
+    if IDEMPOTENCY_BACKEND == "db":
+        return True
+    if IDEMPOTENCY_BACKEND == "memory":
+        return False
+    return int(os.getenv("WEB_CONCURRENCY", "1") or 1) > 1
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "created", "response", "done")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.created = time.monotonic()
+        self.response: Optional[StoredResponse] = None
+        self.done = asyncio.Event()
+
+
+class MemoryIdempotencyStore:
+    """LRU of responses by key; used from the event loop only, so no locking.
+
+    Keys whose first request is still running are kept outside the LRU until
+    it completes, so trimming it never forgets one and lets a retry run the
+    write a second time.
+    """
+
+    def __init__(self, max_keys: int = IDEMPOTENCY_MAX_KEYS, ttl: int = IDEMPOTENCY_TTL):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._pending: Dict[str, _Entry] = {}
+
+    async def reserve(self, key: str, fingerprint: str):
+        entry = self._pending.get(key) or self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.created > self.ttl:
+            self._pending.pop(key, None)
+            self._entries.pop(key, None)
+            entry = None
+        if entry is None:
+            self._pending[key] = _Entry(fingerprint)
+            return NEW, None
+
+        if entry.fingerprint != fingerprint:
+            return MISMATCH, None
+        if entry.response is None:
+            # The first request is still running: wait for its response
+            try:
+                await asyncio.wait_for(entry.done.wait(), IDEMPOTENCY_WAIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                return PENDING, None
+            if entry.response is None:
+                # It failed and released the key; this request takes over
+                return await self.reserve(key, fingerprint)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return DONE, entry.response
+
+    async def complete(self, key: str, response: StoredResponse):
+        entry = self._pending.pop(key, None)
+        if entry is not None:
+            entry.response = response
+            entry.done.set()
+            self._entries[key] = entry
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    async def release(self, key: str):
+        entry = self._pending.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+
+
+class DatabaseIdempotencyStore:
+    """Responses in the idempotency_keys table, shared by all workers.
+
+    A row with no status is a request in progress. Rows older than the TTL,
+    and in-progress rows left behind by a crashed worker, are taken over.
+    """
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL):
+        self.ttl = ttl
+        self._last_prune = 0.0
+
+    async def reserve(self, key: str, fingerprint: str):
+        return await anyio.to_thread.run_sync(self._reserve, key, fingerprint)
+
+    async def complete(self, key: str, response: StoredResponse):
+        await anyio.to_thread.run_sync(self._complete, key, response)
+
+    async def release(self, key: str):
+        await anyio.to_thread.run_sync(self._release, key)
+
+    def _reserve(self, key: str, fingerprint: str):
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            self._prune(db, now)
+            row = db.get(IdempotencyKey, key)
+            if row is not None and (
+                row.created_at < now - timedelta(seconds=self.ttl)
+                or (row.status_code is None and row.created_at < now - timedelta(seconds=IDEMPOTENCY_WAIT_TIMEOUT * 2))
+            ):
+                db.delete(row)
+                db.commit()
+                row = None
+            if row is None:
+                db.add(IdempotencyKey(key=key, fingerprint=fingerprint, created_at=now))
+                try:
+                    db.commit()
+                    return NEW, None
+                except IntegrityError:
+                    # Another worker reserved it first
+                    db.rollback()
+                    row = db.get(IdempotencyKey, key)
+                    if row is None:
+                        return PENDING, None
+            if row.fingerprint != fingerprint:
+                return MISMATCH, None
+            if row.status_code is None:
+                return PENDING, None
+            return DONE, StoredResponse(row.status_code, json.loads(row.headers), row.body)
+
+    def _complete(self, key: str, response: StoredResponse):
+        with SessionLocal() as db:
+            row = db.get(IdempotencyKey, key)
+            if row is None:
+                return
+            row.status_code = response.status
+            row.headers = json.dumps(response.headers)
+            row.body = response.body
+            db.commit()
+
+    def _release(self, key: str):
+        with SessionLocal() as db:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)).delete()
+            db.commit()
+
+    def _prune(self, db, now: datetime):
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = now - timedelta(seconds=self.ttl)
+        deleted = db.query(IdempotencyKey).filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            logger.info(f"Pruned {deleted} expired idempotency keys")
+
+
+def get_store():
+    if use_database_backend():
+        logger.info("Idempotency keys are stored in the database")
+        return DatabaseIdempotencyStore()
+    return MemoryIdempotencyStore()
+
+
+async def _send_json(send, status: int, detail: str, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + (headers or []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware that replays stored responses for repeated keys."""
+
+    def __init__(self, app, store=None):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
+        header = Headers(scope=scope).get("idempotency-key")
+        if header is None:
+            await self.app(scope, receive, send)
+            return
+        if not header or len(header) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+            return
+        if self.store is None:
+            self.store = get_store()
+
+        # Read the body up front to fingerprint it, then hand it to the app unchanged
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+
+        scoped = f"{client_key(Request(scope))}\n{scope['method']}\n{scope['path']}\n{header}"
+        key = hashlib.sha256(scoped.encode()).hexdigest()
+        fingerprint = hashlib.sha256(body).hexdigest()
+
+        state, stored = await self.store.reserve(key, fingerprint)
+        if state == DONE:
+            idempotent_replays.inc()
+            logger.debug(f"Replaying stored response for {scope['method']} {scope['path']}")
+            await send({
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in stored.headers]
+                + [(b"content-length", str(len(stored.body)).encode()), (b"idempotent-replayed", b"true")],
+            })
+            await send({"type": "http.response.body", "body": stored.body})
+            return
+        if state == MISMATCH:
+            idempotent_conflicts.inc(reason="mismatch")
+            await _send_json(send, 422, "Idempotency-Key was already used with a different request body")
+            return
+        if state == PENDING:
+            idempotent_conflicts.inc(reason="pending")
+            await _send_json(send, 409, "A request with this Idempotency-Key is still being processed", [(b"retry-after", b"1")])
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status = None
+        headers: List[Tuple[str, str]] = []
+        parts = []
+        size = 0
+
+        async def capture_send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers.extend(
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                    if name.lower() not in SKIPPED_HEADERS
+                )
+            elif message["type"] == "http.response.body" and size <= IDEMPOTENCY_MAX_BODY:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                parts.append(chunk)
+            await send(message)
+
+        stored_ok = False
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if status is not None and status < 500 and status != 429 and size <= IDEMPOTENCY_MAX_BODY:
+                await self.store.complete(key, StoredResponse(status, headers, b"".join(parts)))
+                stored_ok = True
+        finally:
+            if not stored_ok:
+                await self.store.release(key)
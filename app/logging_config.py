@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# Logging settings, all overridable from the environment
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" or "text"
+LOG_FILE = os.getenv("LOG_FILE", "app.log")  # empty to log to stdout only
+# High-volume DEBUG events: at most this many per second from one call site
+LOG_DEBUG_RATE = float(os.getenv("LOG_DEBUG_RATE", "20"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed via ``extra=``.
+# ``color_message`` is uvicorn's ANSI-coloured copy of ``msg``.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "suppressed", "color_message"}
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with ``extra=`` fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """Token bucket per call site for DEBUG records.
+
+    INFO and above always pass. When a DEBUG line from the same file and
+    line number fires faster than ``rate`` per second the excess is dropped,
+    and the next line that gets through carries a ``suppressed`` count.
+    """
+
+    def __init__(self, rate: float = LOG_DEBUG_RATE):
+        super().__init__()
+        self.rate = rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(key, (self.rate, now, 0))
+            tokens = min(self.rate, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback separate from the message.
+
+    The stock ``prepare`` folds the traceback into ``msg``, which would put
+    it inside the JSON ``msg`` field instead of ``exc``.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None, log_file: Optional[str] = None):
+    """Route all logging through a queue drained by a background thread.
+
+    Callers only pay for level checks, filtering and enqueueing; formatting
+    and the stream and file writes happen on the listener thread, off the
+    event loop. Safe to call more than once.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        level = level or LOG_LEVEL
+        fmt = fmt or LOG_FORMAT
+        log_file = LOG_FILE if log_file is None else log_file
+        formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+
+        handlers = [logging.StreamHandler()]
+        if log_file:
+            handlers.append(logging.FileHandler(log_file))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(DebugRateLimitFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
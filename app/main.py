@@ -1,46 +1,28 @@
 from fastapi import FastAPI, HTTPException, Request, Depends, WebSocket, WebSocketDisconnect
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, FileResponse
 from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import text, and_, func
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import text, and_, func, insert, select, update
 from typing import List, Optional, Dict
 from pydantic import BaseModel
 from datetime import datetime, time, timedelta
 import os
 import asyncio
+import anyio
 from contextlib import asynccontextmanager
 import logging
 import pytz
-import requests
 from sqlalchemy import inspect
-import pdfkit
-import dropbox
-from jinja2 import Environment, FileSystemLoader
 import tempfile
 import json
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from .logging_config import configure_logging
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Add file handler for persistent logs
-file_handler = logging.FileHandler('app.log')
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(file_handler)
-
-# Add stream handler for Railway console output
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(stream_handler)
-
-# Log all environment variables (except sensitive ones)
-env_vars = {k: '***' if 'TOKEN' in k or 'PASSWORD' in k else v for k, v in os.environ.items()}
-logger.info(f"Environment variables: {env_vars}")
-
 # Verify required environment variables
 required_env_vars = ['DATABASE_URL', 'TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID']
 missing_vars = [var for var in required_env_vars if not os.getenv(var)]
@@ -49,18 +31,32 @@ if missing_vars:
 
 from .database import get_db, engine, Base, test_db_connection, SessionLocal
 from .models import Checklist, Chore, ChoreCompletion, Signature, Section, Staff
-from .telegram import telegram, cet_tz
-from .seed_data import seed_database
+from .telegram import get_telegram
+from .clock import cet_tz
+from .seed_data import seed_database, seed_if_needed
+from .blob_store import store_signature, get_blob_store, decode_data_url
+from .reset_state import reset_state
+from .scheduler import reset_scheduler, reset_checklists, reset_event
+from .reminders import reminder_scheduler
+from .serializers import serialize_checklist_chores, dumps
+from .profiling import install_profiling
+from .metrics import MetricsMiddleware, render_metrics
+from .notifications import notification_queue
+from .broadcast import manager
+from .coalescing import chores_flight, write_limiter
+from .static_assets import CachedStaticFiles, JSONGZipMiddleware, static_url
+from .idempotency import IdempotencyMiddleware
 from .admin import router as admin_router  # Import the admin router
+from .analytics import router as analytics_router
+from .export import router as export_router
+from .reports import router as reports_router, report_sections, render_report_html, render_pdf, shutdown_report_pool
+from . import analytics, rollups
+from .mutations import router as mutations_router, toggle_chore_state, VersionConflict, chore_update, CHORE_STATE
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-# Constants for reset times
-RESET_START_TIME = time(6, 0)  # 6:00 AM
-RESET_END_TIME = time(8, 0)    # 8:00 AM
-
 # Global variables to track application state
 is_db_ready = False
 db_init_error = None
@@ -76,43 +72,40 @@ async def lifespan(app: FastAPI):
     # Application startup
     logger.info("Application startup initiated")
     
-    # Create tables if they don't exist
+    # Create tables if they don't exist and seed them if the seed file changed
     try:
-        logger.info("Creating database tables...")
+        logger.info("Initializing database...")
         init_db()
-        logger.info("Database tables created successfully")
-        
-        # Seed database if empty
-        logger.info("Checking if database needs seeding...")
-        db = SessionLocal()
-        try:
-            # Check if tables exist by querying the checklists table
-            logger.info("Checking if checklists table exists...")
-            result = db.execute(text("SELECT COUNT(*) FROM checklists"))
-            count = result.scalar()
-            logger.info(f"Found {count} checklists in database")
-            
-            if count == 0:
-                logger.info("Database is empty, seeding initial data...")
-                seed_database(db)
-                db.commit()
-                logger.info("Database seeded successfully")
-            else:
-                logger.info(f"Database already contains {count} checklists, skipping seeding")
-        except Exception as e:
-            logger.error(f"Error during database seeding: {str(e)}", exc_info=True)
-            raise
-        finally:
-            db.close()
-            logger.info("Database session closed after seeding")
+        logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error during database initialization: {str(e)}", exc_info=True)
         raise
     
+    # One kept-alive HTTP session for every Telegram call
+    await get_telegram().open()
+    # Check Telegram connectivity in the background so startup never waits on the network
+    telegram_check = asyncio.create_task(get_telegram().check_connection())
+    notification_queue.start()
+    await manager.start()
+    # Daily and weekly checklist resets, including any missed while down
+    reset_scheduler.start()
+    # Telegram reminders for chores still open at their due time
+    reminder_scheduler.start()
+    
     yield
     
-    # Application shutdown
+    if not telegram_check.done():
+        telegram_check.cancel()
+    
+    # Application shutdown: in-flight requests have drained by now
     logger.info("Application shutdown initiated")
+    await reset_scheduler.stop()
+    await reminder_scheduler.stop()
+    await manager.close_all()
+    await notification_queue.drain()
+    await get_telegram().close()
+    await manager.stop()
+    shutdown_report_pool()
     engine.dispose()
     logger.info("Database connections disposed")
 
@@ -126,11 +119,49 @@ app = FastAPI(
 # Include the admin router
 app.include_router(admin_router)
 
+# Batched replay of changes made while a tablet was offline
+app.include_router(mutations_router)
+
+# Completion analytics for managers
+app.include_router(analytics_router)
+
+# Streaming history export for audits
+app.include_router(export_router)
+
+# Report archives for inspections
+app.include_router(reports_router)
+
+# Repeated requests with the same Idempotency-Key get the stored response
+app.add_middleware(IdempotencyMiddleware)
+
+# Request latency, status and query counts per route, served at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Per-request SQL profiling and N+1 detection, only when SQL_PROFILE is set
+install_profiling(app)
+
+# Gzip JSON and text responses above GZIP_MIN_SIZE bytes
+app.add_middleware(JSONGZipMiddleware)
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Serve the main checklist interface."""
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/sw.js")
+async def service_worker():
+    """Service worker for offline mode, served from the root so it controls the whole app."""
+    return FileResponse(
+        "static/sw.js",
+        media_type="application/javascript",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this process."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Health check endpoints
 @app.get("/up")
 async def health_check():
@@ -184,11 +215,12 @@ async def shutdown_event():
     """Log application shutdown."""
     logger.info("Application shutdown initiated")
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files: fingerprinted builds in static/dist are cached forever
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
 
 # Exception handler for 500 errors
 @app.exception_handler(500)
@@ -212,6 +244,7 @@ class ChoreCompletionRequest(BaseModel):
     chore_id: int
     staff_name: str
     completed: bool
+    version: Optional[int] = None  # Chore version the client last saw
 
 class ChoreCommentRequest(BaseModel):
     chore_id: int
@@ -222,84 +255,70 @@ class ChecklistSubmission(BaseModel):
     staff_name: str
     generate_pdf: bool = False
     save_to_dropbox: bool = False
+    signature: Optional[str] = None  # Base64 PNG from the signature pad
 
 class TelegramUpdate(BaseModel):
     """Simplified Telegram Update model"""
     update_id: int
     message: Optional[dict] = None
 
-def get_last_reset_time(checklist_name: str, db: Session) -> Optional[datetime]:
-    """Get the last reset time for a checklist."""
-    try:
-        # Get the most recent signature for this checklist
-        last_signature = db.query(Signature).filter(
-            Signature.checklist_id == db.query(Checklist.id).filter(Checklist.name == checklist_name).scalar()
-        ).order_by(Signature.completed_at.desc()).first()
-        
-        if last_signature:
-            return last_signature.completed_at
-        return None
-    except Exception as e:
-        logger.error(f"Error getting last reset time: {str(e)}", exc_info=True)
-        return None
-
-@app.get("/api/checklists/{checklist_name}/chores")
-def get_checklist_chores(checklist_name: str, db: Session = Depends(get_db)):
-    """Get all chores for a checklist with their completion status."""
-    try:
-        logger.info(f"Getting chores for checklist: {checklist_name}")
-        
-        # Get checklist and sections in a single query with eager loading
-        checklist = (
-            db.query(Checklist)
+def load_checklist_chores(checklist_name: str) -> bytes:
+    """Query a checklist's chores and return the encoded JSON payload."""
+    with SessionLocal() as db:
+        # Only the columns the payload needs, no ORM identity map overhead
+        sections = (
+            db.query(Section.id, Section.name)
+            .join(Checklist, Section.checklist_id == Checklist.id)
             .filter(Checklist.name == checklist_name)
-            .options(joinedload(Checklist.sections))
-            .first()
+            .all()
         )
         
-        if not checklist:
+        if not sections and not db.query(Checklist.id).filter(Checklist.name == checklist_name).first():
             logger.error(f"Checklist not found: {checklist_name}")
             raise HTTPException(status_code=404, detail="Checklist not found")
         
-        sections = sorted(checklist.sections, key=lambda s: s.order or 0)
-        logger.info(f"Found {len(sections)} sections")
-        
-        # Get all chores for this checklist
         chores = (
-            db.query(Chore)
-            .filter(Chore.section_id.in_([s.id for s in sections]))
+            db.query(
+                Chore.id,
+                Chore.description,
+                Chore.order,
+                Chore.section_id,
+                Chore.completed,
+                Chore.completed_by,
+                Chore.completed_at,
+                Chore.version
+            )
+            .filter(Chore.section_id.in_([s.id for s in sections]), Chore.archived_at.is_(None))
             .order_by(Chore.order)
             .all()
         )
         
-        logger.info(f"Found {len(chores)} chores")
-        
-        # Process the results
-        chore_list = []
-        for chore in chores:
-            section = next(s for s in sections if s.id == chore.section_id)
-            chore_data = {
-                "id": chore.id,
-                "description": chore.description,
-                "order": chore.order,
-                "section": section.name,
-                "section_id": section.id,
-                "completed": chore.completed,
-                "completed_by": chore.completed_by,
-                "completed_at": chore.completed_at.isoformat() if chore.completed_at else None,
-                "comment": None  # We'll add comment support later if needed
-            }
-            chore_list.append(chore_data)
-        
-        logger.info(f"Successfully processed {len(chore_list)} chores")
-        return chore_list
+        chore_list = serialize_checklist_chores(sections, chores)
+        logger.debug(f"Found {len(sections)} sections and {len(chore_list)} chores")
+        return dumps(chore_list)
+
+@app.get("/api/checklists/{checklist_name}/chores")
+async def get_checklist_chores(checklist_name: str):
+    """Get all chores for a checklist with their completion status.
+
+    Concurrent requests for the same checklist share one query, so a room of
+    tablets polling or reconnecting together costs the database one read.
+    """
+    try:
+        logger.debug(f"Getting chores for checklist: {checklist_name}")
+        payload = await chores_flight.do(
+            checklist_name, lambda: run_in_threadpool(load_checklist_chores, checklist_name)
+        )
+        return Response(content=payload, media_type="application/json")
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing chores: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/chore_completion")
-async def complete_chore(request: ChoreCompletionRequest, db: Session = Depends(get_db)):
+@app.post("/api/chore_completion", dependencies=[Depends(write_limiter)])
+def complete_chore(request: ChoreCompletionRequest, db: Session = Depends(get_db)):
     """Mark a chore as completed or uncompleted."""
     try:
         # Get the chore
@@ -307,27 +326,6 @@ async def complete_chore(request: ChoreCompletionRequest, db: Session = Depends(
         if not chore:
             raise HTTPException(status_code=404, detail="Chore not found")
         
-        # Get the checklist name for this chore
-        checklist = db.query(Checklist).join(Section).join(Chore).filter(Chore.id == request.chore_id).first()
-        if not checklist:
-            raise HTTPException(status_code=404, detail="Checklist not found")
-        
-        # Get the last reset time
-        last_reset = get_last_reset_time(checklist.name, db)
-        
-        # Check if we're within the reset window
-        now = datetime.now(cet_tz)
-        if last_reset:
-            last_reset = last_reset.astimezone(cet_tz)
-            reset_start = datetime.combine(now.date(), RESET_START_TIME, tzinfo=cet_tz)
-            reset_end = datetime.combine(now.date(), RESET_END_TIME, tzinfo=cet_tz)
-            
-            if reset_start <= now <= reset_end and last_reset.date() == now.date():
-                raise HTTPException(
-                    status_code=400,
-                    detail="Cannot modify chores during reset window (6:00-8:00 AM)"
-                )
-        
         # Create or update completion
         completion = db.query(ChoreCompletion).filter(
             ChoreCompletion.chore_id == request.chore_id,
@@ -337,7 +335,7 @@ async def complete_chore(request: ChoreCompletionRequest, db: Session = Depends(
         if completion:
             # Update existing completion
             completion.completed = request.completed
-            completion.completed_at = datetime.now(cet_tz)
+            completion.completed_at = datetime.utcnow()
             if hasattr(request, 'comment') and request.comment:
                 completion.comment = request.comment
         else:
@@ -346,17 +344,27 @@ async def complete_chore(request: ChoreCompletionRequest, db: Session = Depends(
                 chore_id=request.chore_id,
                 staff_name=request.staff_name,
                 completed=request.completed,
-                completed_at=datetime.now(cet_tz),
+                completed_at=datetime.utcnow(),
                 comment=getattr(request, 'comment', None)
             )
             db.add(completion)
         
         # Update the chore's completion state
-        chore.completed = request.completed
-        chore.completed_by = request.staff_name
-        chore.completed_at = datetime.now(cet_tz)
-        
-        db.commit()
+        try:
+            toggle_chore_state(
+                db, chore.id, request.completed, request.staff_name, request.version, history=False
+            )
+            db.commit()
+            reminder_scheduler.chore_toggled(chore.id, request.completed)
+            analytics.invalidate(chore.checklist_id)
+        except (VersionConflict, StaleDataError) as conflict:
+            # The chore or this completion record changed since the client read it
+            db.rollback()
+            current = conflict.current if isinstance(conflict, VersionConflict) else None
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Chore was changed by someone else", "chore": current}
+            )
         
         # Send Telegram notification
         if request.completed:
@@ -367,25 +375,27 @@ async def complete_chore(request: ChoreCompletionRequest, db: Session = Depends(
             send_telegram_message(message)
         
         return {"status": "success"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error completing chore: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/chore_comment")
-async def add_chore_comment(request: ChoreCommentRequest, db: Session = Depends(get_db)):
+@app.post("/api/chore_comment", dependencies=[Depends(write_limiter)])
+def add_chore_comment(request: ChoreCommentRequest, db: Session = Depends(get_db)):
     # Get the chore
     chore = db.query(Chore).filter(Chore.id == request.chore_id).first()
     if not chore:
         raise HTTPException(status_code=404, detail="Chore not found")
     
     # Get the last reset time
-    last_reset = get_last_reset_time()
+    last_reset = reset_state.get_last_reset(chore.checklist_id, db)
     
     # Get or create completion
-    completion = db.query(ChoreCompletion).filter(
-        ChoreCompletion.chore_id == request.chore_id,
-        ChoreCompletion.completed_at >= last_reset
-    ).first()
+    query = db.query(ChoreCompletion).filter(ChoreCompletion.chore_id == request.chore_id)
+    if last_reset:
+        query = query.filter(ChoreCompletion.completed_at >= last_reset.astimezone(pytz.utc).replace(tzinfo=None))
+    completion = query.first()
     
     if not completion:
         completion = ChoreCompletion(
@@ -397,51 +407,33 @@ async def add_chore_comment(request: ChoreCommentRequest, db: Session = Depends(
     
     # Update comment
     completion.comment = request.comment
-    db.commit()
+    completion_id = completion.id
+    try:
+        db.commit()
+    except StaleDataError:
+        # The completion changed (or was reset away) since it was read here
+        db.rollback()
+        row = db.execute(select(*CHORE_STATE).where(Chore.id == request.chore_id)).one()
+        comment = db.execute(
+            select(ChoreCompletion.comment).where(ChoreCompletion.id == completion_id)
+        ).scalar() if completion_id else None
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Chore was changed by someone else", "chore": chore_update(row), "comment": comment}
+        )
     
     return {"status": "success"}
 
 def generate_pdf_report(checklist: Checklist, staff_name: str, db: Session) -> str:
     """Generate a PDF report for the completed checklist."""
     try:
-        # Get all sections and chores
-        sections = db.query(Section).filter(Section.checklist_id == checklist.id).order_by(Section.order).all()
-        chores_by_section = {}
-        
-        for section in sections:
-            chores = db.query(Chore).filter(Chore.section_id == section.id).order_by(Chore.order).all()
-            chores_with_completion = []
-            for chore in chores:
-                completion = db.query(ChoreCompletion).filter(
-                    ChoreCompletion.chore_id == chore.id
-                ).order_by(ChoreCompletion.completed_at.desc()).first()
-                
-                chores_with_completion.append({
-                    'description': chore.description,
-                    'completed': completion.completed if completion else False,
-                    'completed_by': completion.staff_name if completion else None,
-                    'completed_at': completion.completed_at.strftime('%Y-%m-%d %H:%M:%S') if completion and completion.completed_at else None,
-                    'comment': completion.comment if completion else None
-                })
-            
-            chores_by_section[section.name] = chores_with_completion
-
-        # Load template
-        env = Environment(loader=FileSystemLoader('templates'))
-        template = env.get_template('checklist_report.html')
-        
-        # Render HTML
-        html_content = template.render(
-            checklist_name=checklist.name,
-            staff_name=staff_name,
-            date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            sections=chores_by_section
+        html_content = render_report_html(
+            checklist.name, staff_name, datetime.now(), report_sections(db, checklist.id)
         )
         
         # Create temporary file for PDF
         with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
-            # Generate PDF
-            pdfkit.from_string(html_content, tmp.name)
+            tmp.write(render_pdf(html_content))
             return tmp.name
             
     except Exception as e:
@@ -452,6 +444,7 @@ def upload_to_dropbox(file_path: str, checklist_name: str, staff_name: str) -> s
     """Upload a file to Dropbox and return the shared link."""
     try:
         # Initialize Dropbox client
+        import dropbox
         dbx = dropbox.Dropbox(os.getenv('DROPBOX_ACCESS_TOKEN'))
         
         # Create folder path
@@ -470,11 +463,11 @@ def upload_to_dropbox(file_path: str, checklist_name: str, staff_name: str) -> s
         logger.error(f"Error uploading to Dropbox: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to upload to Dropbox")
 
-@app.post("/api/submit_checklist")
-async def submit_checklist(submission: ChecklistSubmission, db: Session = Depends(get_db)):
+@app.post("/api/submit_checklist", dependencies=[Depends(write_limiter)])
+def submit_checklist(submission: ChecklistSubmission, db: Session = Depends(get_db)):
     """Submit a completed checklist."""
     try:
-        logger.info(f"Received checklist submission: {submission}")
+        logger.info("Received checklist submission", extra={"checklist": submission.checklist_id, "staff": submission.staff_name})
         
         # Get the checklist
         checklist = db.query(Checklist).filter(Checklist.name == submission.checklist_id).first()
@@ -482,24 +475,23 @@ async def submit_checklist(submission: ChecklistSubmission, db: Session = Depend
             logger.error(f"Checklist not found: {submission.checklist_id}")
             raise HTTPException(status_code=404, detail="Checklist not found")
         
-        # Get all sections and chores
-        sections = db.query(Section).filter(Section.checklist_id == checklist.id).all()
-        all_chores_completed = True
-        incomplete_chores = []
-        
-        for section in sections:
-            chores = db.query(Chore).filter(Chore.section_id == section.id).all()
-            for chore in chores:
-                completion = db.query(ChoreCompletion).filter(
-                    ChoreCompletion.chore_id == chore.id,
-                    ChoreCompletion.completed == True
-                ).order_by(ChoreCompletion.completed_at.desc()).first()
-                
-                if not completion:
-                    all_chores_completed = False
-                    incomplete_chores.append(f"{section.name}: {chore.description}")
+        # Chores of this checklist with no completed record, in one query
+        has_completion = (
+            select(ChoreCompletion.id)
+            .where(ChoreCompletion.chore_id == Chore.id, ChoreCompletion.completed == True)
+            .exists()
+        )
+        incomplete_chores = [
+            f"{section_name}: {description}"
+            for section_name, description in (
+                db.query(Section.name, Chore.description)
+                .join(Chore, Chore.section_id == Section.id)
+                .filter(Section.checklist_id == checklist.id, Chore.archived_at.is_(None), ~has_completion)
+                .order_by(Section.order, Chore.order)
+            )
+        ]
         
-        if not all_chores_completed:
+        if incomplete_chores:
             logger.error(f"Incomplete chores found: {incomplete_chores}")
             raise HTTPException(
                 status_code=400,
@@ -521,6 +513,14 @@ async def submit_checklist(submission: ChecklistSubmission, db: Session = Depend
             except Exception as e:
                 logger.warning(f"Failed to remove temporary PDF file: {str(e)}")
         
+        # Record the submission; the signature image itself goes to the blob store
+        signature = Signature(checklist_id=checklist.id, staff_name=submission.staff_name)
+        if submission.signature:
+            signature.signature_hash, signature.signature_size, signature.signature_mime = store_signature(submission.signature)
+        db.add(signature)
+        rollups.record(db, checklist.id, datetime.now(cet_tz), submissions=1)
+        db.commit()
+        
         # Send Telegram notification for checklist completion
         time_str = datetime.now(cet_tz).strftime("%H:%M")
         message = f"🎉 {submission.staff_name} completed checklist '{checklist.name}' at {time_str}"
@@ -533,15 +533,44 @@ async def submit_checklist(submission: ChecklistSubmission, db: Session = Depend
             "message": "Checklist submitted successfully",
             "pdf_url": pdf_url
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error submitting checklist: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/signatures/{signature_id}/image")
+def get_signature_image(signature_id: int, db: Session = Depends(get_db)):
+    """Serve a stored signature image."""
+    signature = db.query(Signature).filter(Signature.id == signature_id).first()
+    if not signature:
+        raise HTTPException(status_code=404, detail="Signature not found")
+    
+    if signature.signature_hash:
+        try:
+            data = get_blob_store().get(signature.signature_hash)
+        except FileNotFoundError:
+            logger.error(f"Signature blob missing: {signature.signature_hash}")
+            raise HTTPException(status_code=404, detail="Signature image not found")
+        media_type = signature.signature_mime or "image/png"
+    elif signature.signature_data:
+        # Row not migrated yet
+        data = decode_data_url(signature.signature_data)
+        media_type = "image/png"
+    else:
+        raise HTTPException(status_code=404, detail="Signature image not found")
+    
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
 @app.post("/telegram/webhook")
 async def telegram_webhook(update: TelegramUpdate):
     """Handle incoming Telegram webhook updates."""
     try:
-        logger.info(f"Received Telegram webhook: {update}")
+        logger.debug(f"Received Telegram webhook: {update}")
         return {"status": "ok"}
     except Exception as e:
         logger.error(f"Error handling Telegram webhook: {str(e)}")
@@ -554,12 +583,8 @@ async def telegram_webhook(update: TelegramUpdate):
 async def test_telegram():
     """Test Telegram notifications."""
     try:
-        # Log environment variables (excluding sensitive data)
-        env_vars = {k: '***' if 'TOKEN' in k else v for k, v in os.environ.items()}
-        logger.info(f"Current environment variables: {env_vars}")
-        
         # Try to send a test message
-        await telegram.send_message("🔔 Test notification from Castle Pub Checklist")
+        await get_telegram().send_message("🔔 Test notification from Castle Pub Checklist")
         
         return {
             "status": "ok",
@@ -583,6 +608,7 @@ async def test_telegram():
 async def setup_telegram():
     """Manually trigger Telegram bot setup."""
     try:
+        telegram = get_telegram()
         webhook_info = await telegram.get_webhook_info()
         logger.info(f"Current webhook info: {webhook_info}")
         
@@ -607,7 +633,7 @@ async def setup_telegram():
 async def telegram_status():
     """Get current Telegram webhook status."""
     try:
-        webhook_info = await telegram.get_webhook_info()
+        webhook_info = await get_telegram().get_webhook_info()
         return {
             "status": "ok",
             "webhook_info": webhook_info
@@ -657,46 +683,36 @@ async def reset_database(db: Session = Depends(get_db)):
         logger.error(f"Error resetting database: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/reset_checklist/{checklist_name}")
-async def reset_checklist(checklist_name: str, request: Request, db: Session = Depends(get_db)):
-    """Reset a checklist by clearing all completion records."""
+@app.post("/api/reset_checklist/{checklist_name}", dependencies=[Depends(write_limiter)])
+def reset_checklist(checklist_name: str, data: dict, db: Session = Depends(get_db)):
+    """Reset a checklist now instead of waiting for its scheduled reset."""
     try:
         # Get the checklist
         checklist = db.query(Checklist).filter(Checklist.name == checklist_name).first()
         if not checklist:
             raise HTTPException(status_code=404, detail=f"Checklist {checklist_name} not found")
 
-        # Get request body
-        body = await request.json()
-        staff_name = body.get('staff_name', 'Someone')
+        staff_name = data.get('staff_name', 'Someone')
 
-        # Get all sections for this checklist
-        sections = db.query(Section).filter(Section.checklist_id == checklist.id).all()
-        
-        # Get all chores for these sections
-        section_ids = [section.id for section in sections]
-        chores = db.query(Chore).filter(Chore.section_id.in_(section_ids)).all()
-        
-        # Reset all chores
-        for chore in chores:
-            chore.completed = False
-            chore.completed_by = None
-            chore.completed_at = None
-        
-        # Commit the changes
+        # Clear every chore in one UPDATE
+        reset_checklists(db, [checklist.id], "manual", staff_name)
         db.commit()
+        reset_state.record_reset(checklist.id)
+        anyio.from_thread.run(manager.broadcast, reset_event([checklist.name], "manual"))
 
         # Send Telegram notification
         message = f"{staff_name} reset the {checklist_name} checklist"
         send_telegram_message(message)
 
         return {"message": "Checklist reset successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error resetting checklist: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 def send_telegram_message(message: str):
-    """Send a message to Telegram."""
+    """Queue a timestamped message for Telegram; sending happens in the background."""
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         logger.warning("Telegram configuration missing, skipping notification")
         return
@@ -704,41 +720,7 @@ def send_telegram_message(message: str):
     # Add timestamp to message
     now = datetime.now(cet_tz)
     time_str = now.strftime("%H:%M")
-    message = f"{message} at {time_str}"
-
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "HTML"
-    }
-    try:
-        response = requests.post(url, data=data)
-        response.raise_for_status()
-    except Exception as e:
-        logger.error(f"Failed to send Telegram message: {str(e)}")
-        # Don't raise the exception, just log it
-
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
-
-manager = ConnectionManager()
+    notification_queue.enqueue(f"{message} at {time_str}")
 
 @app.websocket("/ws/checklist")
 async def websocket_endpoint(websocket: WebSocket):
@@ -748,39 +730,50 @@ async def websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_text()
             # Handle any incoming messages if needed
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 # Modify the chore completion endpoint to broadcast updates
-@app.post("/api/chores/{chore_id}/toggle")
-async def toggle_chore(chore_id: int, data: dict, db: Session = Depends(get_db)):
+@app.post("/api/chores/{chore_id}/toggle", dependencies=[Depends(write_limiter)])
+def toggle_chore(chore_id: int, data: dict, db: Session = Depends(get_db)):
+    """Tick or untick a chore.
+
+    With ``version`` (the chore version the client last saw) the write only
+    lands if nobody changed the chore since; otherwise it is a 409 carrying
+    the current state.
+    """
     try:
-        chore = db.query(Chore).filter(Chore.id == chore_id).first()
-        if not chore:
+        try:
+            update = toggle_chore_state(
+                db, chore_id, data.get("completed", False), data.get("staff_name"), data.get("version")
+            )
+        except VersionConflict as conflict:
+            db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail={"message": "Chore was changed by someone else", "chore": conflict.current}
+            )
+        if update is None:
             raise HTTPException(status_code=404, detail="Chore not found")
 
-        # Update chore completion
-        chore.completed = data.get("completed", False)
-        chore.completed_by = data.get("staff_name") if chore.completed else None
-        chore.completed_at = datetime.now() if chore.completed else None
-
         db.commit()
+        reminder_scheduler.chore_toggled(chore_id, update["completed"])
+        analytics.invalidate(update["checklist_id"])
 
         # Broadcast the update to all connected clients
-        await manager.broadcast({
-            "type": "chore_update",
-            "chore_id": chore_id,
-            "completed": chore.completed,
-            "completed_by": chore.completed_by,
-            "completed_at": chore.completed_at.isoformat() if chore.completed_at else None
-        })
+        # Sync endpoint: hop back to the event loop for the WebSocket fan-out
+        anyio.from_thread.run(manager.broadcast, update)
 
-        return {"status": "success"}
+        return {"status": "success", "chore": update}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error toggling chore: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/sections/{section_id}/complete")
-async def complete_section(section_id: int, data: dict, db: Session = Depends(get_db)):
+@app.post("/api/sections/{section_id}/complete", dependencies=[Depends(write_limiter)])
+def complete_section(section_id: int, data: dict, db: Session = Depends(get_db)):
     """Complete all chores in a section."""
     try:
         # Get the section
@@ -788,74 +781,69 @@ async def complete_section(section_id: int, data: dict, db: Session = Depends(ge
         if not section:
             raise HTTPException(status_code=404, detail="Section not found")
         
-        # Get the checklist for this section
-        checklist = db.query(Checklist).filter(Checklist.id == section.checklist_id).first()
-        if not checklist:
-            raise HTTPException(status_code=404, detail="Checklist not found")
-        
-        # Get the last reset time
-        last_reset = get_last_reset_time(checklist.name, db)
-        
-        # Check if we're within the reset window
-        now = datetime.now(cet_tz)
-        if last_reset:
-            last_reset = last_reset.astimezone(cet_tz)
-            reset_start = datetime.combine(now.date(), RESET_START_TIME, tzinfo=cet_tz)
-            reset_end = datetime.combine(now.date(), RESET_END_TIME, tzinfo=cet_tz)
-            
-            if reset_start <= now <= reset_end and last_reset.date() == now.date():
-                raise HTTPException(
-                    status_code=400,
-                    detail="Cannot modify chores during reset window (6:00-8:00 AM)"
-                )
-        
-        # Get all chores in the section
-        chores = db.query(Chore).filter(Chore.section_id == section_id).all()
-        
         # Get staff name from request
         staff_name = data.get("staff_name")
         if not staff_name:
             raise HTTPException(status_code=400, detail="Staff name is required")
-        
-        # Complete all chores in the section
-        comments = []
-        for chore in chores:
-            # Skip if already completed
-            if chore.completed and chore.completed_at and chore.completed_at.date() == now.date():
-                continue
-                
-            # Create or update completion
-            completion = db.query(ChoreCompletion).filter(
-                ChoreCompletion.chore_id == chore.id,
-                ChoreCompletion.staff_name == staff_name
-            ).first()
+        comment = data.get('comment')
+        
+        # Complete the section's open chores in one statement; the scheduled reset
+        # clears earlier days' ticks. RETURNING gives the new versions for the
+        # tablets to compare-and-swap against.
+        completed_at = datetime.utcnow()
+        changed = db.execute(
+            update(Chore)
+            .where(Chore.section_id == section_id, Chore.completed == False, Chore.archived_at.is_(None))
+            .values(
+                completed=True,
+                completed_by=staff_name,
+                completed_at=completed_at,
+                version=Chore.version + 1
+            )
+            .returning(*CHORE_STATE, Chore.description)
+            .execution_options(synchronize_session=False)
+        ).all()
+        changed.sort(key=lambda row: row.id)
+        changed_ids = [row.id for row in changed]
+        
+        if changed_ids:
+            # This person's completion records for those chores, in one query keyed by chore
+            existing = dict(db.execute(
+                select(ChoreCompletion.chore_id, ChoreCompletion.id).where(
+                    ChoreCompletion.chore_id.in_(changed_ids),
+                    ChoreCompletion.staff_name == staff_name
+                )
+            ).all())
             
-            if completion:
-                # Update existing completion
-                completion.completed = True
-                completion.completed_at = datetime.now(cet_tz)
-                if data.get('comment'):
-                    completion.comment = data.get('comment')
-                    comments.append(f"• {chore.description}: {data.get('comment')}")
-            else:
-                # Create new completion
-                completion = ChoreCompletion(
-                    chore_id=chore.id,
-                    staff_name=staff_name,
-                    completed=True,
-                    completed_at=datetime.now(cet_tz),
-                    comment=data.get('comment')
+            # Update existing completions
+            if existing:
+                values = {"completed": True, "completed_at": completed_at, "version": ChoreCompletion.version + 1}
+                if comment:
+                    values["comment"] = comment
+                db.execute(
+                    update(ChoreCompletion)
+                    .where(ChoreCompletion.id.in_(list(existing.values())))
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
                 )
-                if data.get('comment'):
-                    comments.append(f"• {chore.description}: {data.get('comment')}")
-                db.add(completion)
             
-            # Update chore state
-            chore.completed = True
-            chore.completed_by = staff_name
-            chore.completed_at = datetime.now(cet_tz)
-        
+            # Create the missing ones
+            missing = [
+                {"chore_id": chore_id, "staff_name": staff_name, "completed": True, "completed_at": completed_at, "comment": comment}
+                for chore_id in changed_ids if chore_id not in existing
+            ]
+            if missing:
+                db.execute(insert(ChoreCompletion), missing)
+            
+            rollups.record(db, section.checklist_id, completed_at, ticks=len(changed_ids))
         db.commit()
+        reminder_scheduler.chores_toggled(changed_ids, True)
+        analytics.invalidate(section.checklist_id)
+        
+        updates = [chore_update(row) for row in changed]
+        for chore_message in updates:
+            anyio.from_thread.run(manager.broadcast, chore_message)
+        comments = [f"• {row.description}: {comment}" for row in changed] if comment else []
         
         # Send single Telegram notification for the entire section
         time_str = datetime.now(cet_tz).strftime("%H:%M")
@@ -864,7 +852,9 @@ async def complete_section(section_id: int, data: dict, db: Session = Depends(ge
             message += "\nComments:\n" + "\n".join(comments)
         send_telegram_message(message)
         
-        return {"status": "success"}
+        return {"status": "success", "chores": updates}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error completing section: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -873,26 +863,29 @@ async def complete_section(section_id: int, data: dict, db: Session = Depends(ge
 async def debug_db_state(db: Session = Depends(get_db)):
     """Debug endpoint to check database state."""
     try:
-        # Check checklists
-        checklists = db.query(Checklist).all()
-        checklist_data = []
-        for checklist in checklists:
-            sections = db.query(Section).filter(Section.checklist_id == checklist.id).all()
-            section_data = []
-            for section in sections:
-                chores = db.query(Chore).filter(Chore.section_id == section.id).all()
-                section_data.append({
-                    "id": section.id,
-                    "name": section.name,
-                    "order": section.order,
-                    "chores": [{"id": c.id, "description": c.description, "order": c.order} for c in chores]
-                })
-            checklist_data.append({
+        # One query per table, grouped in Python
+        chores_by_section = {}
+        for c in db.query(Chore.id, Chore.description, Chore.order, Chore.section_id).order_by(Chore.id):
+            chores_by_section.setdefault(c.section_id, []).append({"id": c.id, "description": c.description, "order": c.order})
+        
+        sections_by_checklist = {}
+        for section in db.query(Section.id, Section.name, Section.order, Section.checklist_id).order_by(Section.id):
+            sections_by_checklist.setdefault(section.checklist_id, []).append({
+                "id": section.id,
+                "name": section.name,
+                "order": section.order,
+                "chores": chores_by_section.get(section.id, [])
+            })
+        
+        checklist_data = [
+            {
                 "id": checklist.id,
                 "name": checklist.name,
                 "description": checklist.description,
-                "sections": section_data
-            })
+                "sections": sections_by_checklist.get(checklist.id, [])
+            }
+            for checklist in db.query(Checklist).all()
+        ]
         
         return {
             "status": "ok",
@@ -952,8 +945,26 @@ async def reset_db_endpoint(db: Session = Depends(get_db)):
         logger.error(f"Error resetting database: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to reset database: {str(e)}")
 
+# pg_advisory_lock key for init_db; any constant shared by all workers and replicas
+INIT_DB_LOCK_KEY = 727402
+
 def init_db():
-    """Initialize the database."""
+    """Initialize the database.
+
+    Every worker runs this at startup. On PostgreSQL they take turns under
+    an advisory lock, so the first one creates, migrates and seeds and the
+    others find everything current.
+    """
+    if engine.dialect.name != "postgresql":
+        return _init_db()
+    with engine.connect() as lock:
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+        try:
+            _init_db()
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INIT_DB_LOCK_KEY})
+
+def _init_db():
     try:
         # Create tables
         Base.metadata.create_all(bind=engine)
@@ -965,26 +976,35 @@ def init_db():
                 conn.execute(text("ALTER TABLE chores ADD COLUMN IF NOT EXISTS completed BOOLEAN DEFAULT FALSE"))
                 conn.execute(text("ALTER TABLE chores ADD COLUMN IF NOT EXISTS completed_by VARCHAR"))
                 conn.execute(text("ALTER TABLE chores ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP"))
+                conn.execute(text("ALTER TABLE chores ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+                conn.execute(text("ALTER TABLE chores ADD COLUMN IF NOT EXISTS due_time TIME"))
+                conn.execute(text("ALTER TABLE chores ADD COLUMN IF NOT EXISTS reminded_at TIMESTAMP"))
+                conn.execute(text("ALTER TABLE chores ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP"))
+                conn.execute(text("ALTER TABLE chore_completions ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_chore_completions_completed_at ON chore_completions (completed_at)"))
                 conn.commit()
                 logger.info("Added new columns to chores table")
             except Exception as e:
                 logger.warning(f"Could not add new columns: {str(e)}")
         
-        # Check if database needs seeding
+        # Signature images moved out of the row into the blob store
+        with engine.connect() as conn:
+            try:
+                conn.execute(text("ALTER TABLE signatures ADD COLUMN IF NOT EXISTS signature_hash VARCHAR(64)"))
+                conn.execute(text("ALTER TABLE signatures ADD COLUMN IF NOT EXISTS signature_size INTEGER"))
+                conn.execute(text("ALTER TABLE signatures ADD COLUMN IF NOT EXISTS signature_mime VARCHAR"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_signatures_signature_hash ON signatures (signature_hash)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_signatures_checklist_completed_at ON signatures (checklist_id, completed_at)"))
+                conn.commit()
+                logger.info("Added signature blob columns to signatures table")
+            except Exception as e:
+                logger.warning(f"Could not add signature blob columns: {str(e)}")
+        
+        # Seed only when the seed file changed since it was last applied
         logger.info("Checking if database needs seeding...")
         with SessionLocal() as db:
             try:
-                # Check if checklists table exists and has data
-                logger.info("Checking if checklists table exists...")
-                checklists = db.query(Checklist).all()
-                if checklists:
-                    logger.info(f"Found {len(checklists)} checklists in database")
-                    logger.info("Database already contains checklists, skipping seeding")
-                else:
-                    logger.info("Database is empty, seeding initial data...")
-                    seed_database(db)
-                    db.commit()
-                    logger.info("Database seeded successfully")
+                seed_if_needed(db)
             except Exception as e:
                 logger.error(f"Error checking/seeding database: {str(e)}")
                 raise
@@ -996,9 +1016,9 @@ def init_db():
 def get_checklists(db: Session = Depends(get_db)):
     """Get all checklists."""
     try:
-        logger.info("Fetching all checklists")
+        logger.debug("Fetching all checklists")
         checklists = db.query(Checklist).all()
-        logger.info(f"Found {len(checklists)} checklists")
+        logger.debug(f"Found {len(checklists)} checklists")
         return [{"id": c.id, "name": c.name, "description": c.description} for c in checklists]
     except Exception as e:
         logger.error(f"Error fetching checklists: {str(e)}", exc_info=True)
@@ -0,0 +1,237 @@
+"""In-process metrics in the Prometheus text format.
+
+A small registry of counters, gauges and histograms, the ASGI middleware
+that times requests per route template, and SQLAlchemy hooks that count
+queries per request. Values are per process; with several workers each
+one reports its own and Prometheus sums them.
+"""
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; tuned for a small app where most requests take a few milliseconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts (not cumulative), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+http_requests_total = Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+
+# Database
+db_queries_total = Counter("db_queries_total", "SQL statements executed, by route template.", ("route",))
+db_query_duration = Histogram("db_query_duration_seconds", "Total SQL time per request, by route template.", ("route",))
+db_queries_per_request = Histogram("db_queries_per_request", "SQL statements per request, by route template.", ("route",), buckets=QUERY_COUNT_BUCKETS)
+
+# Telegram
+telegram_messages_sent = Counter("telegram_messages_sent_total", "Telegram messages delivered.")
+telegram_send_failures = Counter("telegram_send_failures_total", "Telegram messages that could not be delivered.")
+telegram_send_retries = Counter("telegram_send_retries_total", "Telegram send attempts retried after 429 or 5xx.")
+telegram_send_duration = Histogram("telegram_send_duration_seconds", "Telegram sendMessage latency, including retries.")
+
+# WebSockets
+websocket_connections_total = Counter("websocket_connections_total", "WebSocket connections accepted.")
+websocket_connections_active = Gauge("websocket_connections_active", "WebSocket connections currently open.")
+
+
+class _QueryStats:
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Set by the middleware for each HTTP request. Sync endpoints and
+# dependencies run in the threadpool with a copy of the context, which
+# still points at the same _QueryStats object.
+_current_queries: contextvars.ContextVar[Optional[_QueryStats]] = contextvars.ContextVar("current_queries", default=None)
+
+
+def current_query_count() -> int:
+    """Number of SQL statements run so far in the current request (0 outside one)."""
+    stats = _current_queries.get()
+    return stats.count if stats else 0
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    stats = _current_queries.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started
+
+
+def route_template(scope) -> str:
+    """The matched route path (``/api/chores/{chore_id}/toggle``), never the raw URL."""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope.get("root_path"):
+        return scope["root_path"] + "/{path}"  # a Mount, e.g. /static
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and query counts per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = _QueryStats()
+        token = _current_queries.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            _current_queries.reset(token)
+            route = route_template(scope)
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route, status=status)
+            http_request_duration.observe(elapsed, method=method, route=route)
+            if stats.count:
+                db_queries_total.inc(stats.count, route=route)
+                db_query_duration.observe(stats.duration, route=route)
+            db_queries_per_request.observe(stats.count, route=route)
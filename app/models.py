@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, Index, LargeBinary, Time, Date
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from .database import Base
 
@@ -34,6 +34,11 @@ class Chore(Base):
     completed = Column(Boolean, default=False)
     completed_by = Column(String, nullable=True)
     completed_at = Column(DateTime, nullable=True)
+    # Bumped on every change to the completion state; writes compare-and-swap on it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    due_time = Column(Time, nullable=True)  # Time of day (CET) it should be done by; see reminders.py
+    reminded_at = Column(DateTime, nullable=True)  # Last overdue reminder sent for it
+    archived_at = Column(DateTime, nullable=True)  # Removed from the checklist; kept for its completion history
     checklist = relationship("Checklist", back_populates="chores")
     section = relationship("Section", back_populates="chores")
     completions = relationship("ChoreCompletion", back_populates="chore")
@@ -47,21 +52,100 @@ class ChoreCompletion(Base):
     completed = Column(Boolean, default=True)
     completed_at = Column(DateTime, default=datetime.utcnow)
     comment = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     chore = relationship("Chore", back_populates="completions")
 
+    # The ORM adds "AND version = :old" to every UPDATE and raises StaleDataError on a lost race
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        Index("ix_chore_completions_completed_at", "completed_at"),
+    )
+
 class Signature(Base):
     __tablename__ = "signatures"
     
     id = Column(Integer, primary_key=True, index=True)
     checklist_id = Column(Integer, ForeignKey("checklists.id"))
     staff_name = Column(String)
-    signature_data = Column(Text)  # Base64 encoded PNG
+    # Legacy base64 PNG; new signatures live in the blob store (see migrate_signatures.py)
+    signature_data = deferred(Column(Text, nullable=True))
+    signature_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the stored PNG
+    signature_size = Column(Integer, nullable=True)
+    signature_mime = Column(String, nullable=True)
     completed_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_signatures_checklist_completed_at", "checklist_id", "completed_at"),
+    )
+
 class Staff(Base):
     __tablename__ = "staff"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     telegram_id = Column(String, nullable=True)
-    is_active = Column(Boolean, default=True) 
\ No newline at end of file
+    is_active = Column(Boolean, default=True) 
+
+class SeedState(Base):
+    __tablename__ = "seed_state"
+    
+    key = Column(String, primary_key=True)
+    content_hash = Column(String(64))  # SHA-256 of the applied seed file
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+class ProcessedMutation(Base):
+    """A change replayed from a tablet's offline journal, kept for deduplication."""
+    __tablename__ = "processed_mutations"
+
+    id = Column(String(64), primary_key=True)  # Generated by the tablet
+    client_id = Column(String(64), nullable=True)
+    status = Column(String(16))
+    processed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class IdempotencyKey(Base):
+    """A response stored under an Idempotency-Key, for replaying repeats across workers."""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(64), primary_key=True)  # SHA-256 of client, method, path and key
+    fingerprint = Column(String(64))  # SHA-256 of the request body
+    status_code = Column(Integer, nullable=True)  # Null while the first request is running
+    headers = Column(Text, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ChecklistReset(Base):
+    """One reset of a checklist, scheduled or manual; the scheduler catches up from these."""
+    __tablename__ = "checklist_resets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    checklist_id = Column(Integer, ForeignKey("checklists.id"))
+    trigger = Column(String(16))  # "schedule" or "manual"
+    reset_by = Column(String, nullable=True)
+    chores_reset = Column(Integer, default=0)
+    reset_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_checklist_resets_checklist_reset_at", "checklist_id", "reset_at"),
+    )
+
+class DailyRollup(Base):
+    """Per checklist and shift day counts, kept up to date by the write endpoints; see rollups.py."""
+    __tablename__ = "checklist_daily_rollups"
+
+    checklist_id = Column(Integer, ForeignKey("checklists.id"), primary_key=True)
+    day = Column(Date, primary_key=True)  # Shift day; starts at the reset time
+    ticks = Column(Integer, nullable=False, default=0)
+    unticks = Column(Integer, nullable=False, default=0)
+    submissions = Column(Integer, nullable=False, default=0)
+
+class WeeklyRollup(Base):
+    """Per checklist and ISO week counts; ``days_submitted`` counts days with a submission."""
+    __tablename__ = "checklist_weekly_rollups"
+
+    checklist_id = Column(Integer, ForeignKey("checklists.id"), primary_key=True)
+    week = Column(Date, primary_key=True)  # Monday of the ISO week
+    ticks = Column(Integer, nullable=False, default=0)
+    unticks = Column(Integer, nullable=False, default=0)
+    submissions = Column(Integer, nullable=False, default=0)
+    days_submitted = Column(Integer, nullable=False, default=0)
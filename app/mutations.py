@@ -0,0 +1,306 @@
+"""Replaying changes made on tablets while they were offline.
+
+The frontend records ticks it could not send in an IndexedDB journal, each
+with an id generated on the tablet. When the connection is back it sends
+them here in batches. Every id is stored in ``processed_mutations``, so a
+batch that is sent twice (the response was lost, or the tablet retried)
+is only applied once.
+
+Ticks carry the chore version they were made on and are applied with the
+same compare-and-swap as ``toggle_chore_state`` (``/api/chores/{id}/toggle``),
+but set-based: a batch costs the same handful of statements however many
+ticks it holds, so a reconnecting tablet does not replay them one by one.
+"""
+import os
+import time
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+from sqlalchemy import case, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .database import get_db
+from .models import Chore, ChoreCompletion, ProcessedMutation
+from .broadcast import manager
+from .coalescing import write_limiter, client_key
+from .clock import utc_iso, utc_naive
+from .reminders import reminder_scheduler
+from . import analytics, rollups
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_BATCH_SIZE = 100
+# Processed ids are kept this long; journals older than that are not expected
+MUTATION_RETENTION_DAYS = int(os.getenv("MUTATION_RETENTION_DAYS", "30"))
+PRUNE_INTERVAL = 3600
+
+_last_prune = 0.0
+
+
+class Mutation(BaseModel):
+    id: str = Field(..., min_length=8, max_length=64)
+    type: str = "chore_toggle"
+    chore_id: int
+    completed: bool
+    staff_name: Optional[str] = None
+    created_at: Optional[datetime] = None  # When the tick was made on the tablet
+    version: Optional[int] = None  # Chore version the tick was made on; None applies it unconditionally
+
+
+class MutationBatch(BaseModel):
+    mutations: List[Mutation] = Field(..., max_length=MAX_BATCH_SIZE)
+
+
+class VersionConflict(Exception):
+    """The chore changed since the client read it; carries the current state."""
+
+    def __init__(self, current: dict):
+        super().__init__(f"Chore {current['chore_id']} is at version {current['version']}")
+        self.current = current
+
+
+def chore_update(row) -> dict:
+    """WebSocket update (and conflict payload) for a chore row."""
+    return {
+        "type": "chore_update",
+        "chore_id": row.id,
+        "checklist_id": row.checklist_id,
+        "completed": row.completed,
+        "completed_by": row.completed_by,
+        "completed_at": utc_iso(row.completed_at),
+        "version": row.version
+    }
+
+
+CHORE_STATE = (Chore.id, Chore.checklist_id, Chore.completed, Chore.completed_by, Chore.completed_at, Chore.version)
+
+
+def toggle_chore_state(
+    db: Session,
+    chore_id: int,
+    completed: bool,
+    staff_name: Optional[str],
+    expected_version: Optional[int] = None,
+    at: Optional[datetime] = None,
+    history: bool = True,
+) -> Optional[dict]:
+    """Set a chore's completion state and return the WebSocket update for it.
+
+    One ``UPDATE ... WHERE version = :expected RETURNING`` bumps the version,
+    so concurrent writers never block each other and the loser finds out
+    without a lock. Without ``expected_version`` the write is unconditional.
+    Returns None if the chore does not exist and raises VersionConflict if
+    it was changed in the meantime.
+
+    ``at`` is the naive UTC time of the tick, now by default. The tick is
+    counted in the rollups. With ``history`` a ``chore_completions`` row is
+    added for analytics; callers that keep their own completion row pass
+    False.
+    """
+    at = at or datetime.utcnow()
+    stmt = (
+        update(Chore)
+        .where(Chore.id == chore_id)
+        .values(
+            completed=completed,
+            completed_by=staff_name if completed else None,
+            completed_at=at if completed else None,
+            version=Chore.version + 1
+        )
+        .returning(*CHORE_STATE)
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        stmt = stmt.where(Chore.version == expected_version)
+    row = db.execute(stmt).first()
+    if row is not None:
+        if history:
+            db.execute(insert(ChoreCompletion).values(
+                chore_id=chore_id, staff_name=staff_name, completed=completed, completed_at=at
+            ))
+        rollups.record(db, row.checklist_id, at, ticks=int(completed), unticks=int(not completed))
+        return chore_update(row)
+
+    # Missed: either the chore is gone or someone else got there first
+    current = db.execute(select(*CHORE_STATE).where(Chore.id == chore_id)).first()
+    if current is None:
+        return None
+    raise VersionConflict(chore_update(current))
+
+
+def _utc_time(created_at: Optional[datetime]) -> Optional[datetime]:
+    """Tablet timestamp as naive UTC, as stored; naive ones are taken as server-local time."""
+    if created_at is None:
+        return None
+    # A tablet clock running fast must not date a tick in the future
+    return min(utc_naive(created_at), datetime.utcnow())
+
+
+def _prune_processed(db: Session):
+    global _last_prune
+    if time.monotonic() - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = time.monotonic()
+    cutoff = datetime.utcnow() - timedelta(days=MUTATION_RETENTION_DAYS)
+    deleted = db.query(ProcessedMutation).filter(ProcessedMutation.processed_at < cutoff).delete(synchronize_session=False)
+    if deleted:
+        logger.info(f"Pruned {deleted} processed mutation ids older than {MUTATION_RETENTION_DAYS} days")
+
+
+def _by_chore(values: Dict[int, object]):
+    """``CASE chores.id WHEN ... THEN ... END``: a different value per chore in one UPDATE."""
+    return case(values, value=Chore.id)
+
+
+def _apply_toggles(db: Session, pending: Dict[int, List[Mutation]]) -> Tuple[Dict[str, dict], Dict[int, dict]]:
+    """Apply the ticks for each chore, in batch order, with one compare-and-swap UPDATE.
+
+    Ticks on the same chore were made on top of each other, so each one's
+    version follows the one before. Per chore the run of ticks that follows
+    on from the current version is applied; the first tick that does not (and
+    every later one, made on top of it) is a conflict. Returns each
+    mutation's result and the final update per applied chore.
+    """
+    results: Dict[str, dict] = {}
+    updates: Dict[int, dict] = {}
+    current = {row.id: row for row in db.execute(select(*CHORE_STATE).where(Chore.id.in_(list(pending))))}
+
+    now = datetime.utcnow()
+    chains = {}
+    for chore_id, mutations in pending.items():
+        if chore_id not in current:
+            results.update((mutation.id, {"status": "not_found"}) for mutation in mutations)
+            continue
+        version = current[chore_id].version
+        applied = []
+        for mutation in mutations:
+            if mutation.version is not None and mutation.version != version:
+                break
+            applied.append((mutation, _utc_time(mutation.created_at) or now))
+            version += 1
+        chains[chore_id] = (applied, mutations[len(applied):])
+
+    rows = {}
+    expected = [(chore_id, current[chore_id].version) for chore_id, (applied, _) in chains.items() if applied]
+    if expected:
+        last = {chore_id: chains[chore_id][0][-1] for chore_id, _ in expected}
+        done = {chore_id: tick for chore_id, tick in last.items() if tick[0].completed}
+        stmt = (
+            update(Chore)
+            .where(tuple_(Chore.id, Chore.version).in_(expected))
+            .values(
+                completed=_by_chore({chore_id: mutation.completed for chore_id, (mutation, _) in last.items()}),
+                completed_by=_by_chore({chore_id: mutation.staff_name for chore_id, (mutation, _) in done.items()}) if done else None,
+                completed_at=_by_chore({chore_id: at for chore_id, (_, at) in done.items()}) if done else None,
+                version=Chore.version + _by_chore({chore_id: len(chains[chore_id][0]) for chore_id, _ in expected})
+            )
+            .returning(*CHORE_STATE)
+            .execution_options(synchronize_session=False)
+        )
+        rows = {row.id: row for row in db.execute(stmt)}
+
+    # Chores changed between the read and the UPDATE conflict as a whole
+    lost = [chore_id for chore_id, _ in expected if chore_id not in rows]
+    if lost:
+        current.update((row.id, row) for row in db.execute(select(*CHORE_STATE).where(Chore.id.in_(lost))))
+
+    history = []
+    counts: Dict[Tuple[int, date], list] = {}
+    for chore_id, (applied, rejected) in chains.items():
+        row = rows.get(chore_id)
+        if row is None:
+            rejected = [mutation for mutation, _ in applied] + rejected
+            applied = []
+        for mutation, at in applied:
+            results[mutation.id] = {"status": "applied"}
+            history.append({
+                "chore_id": chore_id, "staff_name": mutation.staff_name, "completed": mutation.completed, "completed_at": at
+            })
+            # Rollups are counted per checklist and shift day
+            key = (row.checklist_id, rollups.shift_day(at))
+            count = counts.setdefault(key, [at, 0, 0])
+            count[1 if mutation.completed else 2] += 1
+        state = chore_update(row if row is not None else current[chore_id])
+        results.update((mutation.id, {"status": "conflict", "chore": state}) for mutation in rejected)
+        if row is not None:
+            updates[chore_id] = state
+
+    if history:
+        db.execute(insert(ChoreCompletion), history)
+    for (checklist_id, _), (at, ticks, unticks) in counts.items():
+        rollups.record(db, checklist_id, at, ticks=ticks, unticks=unticks)
+    return results, updates
+
+
+@router.post("/api/mutations/batch", dependencies=[Depends(write_limiter)])
+def apply_mutation_batch(batch: MutationBatch, request: Request, db: Session = Depends(get_db)):
+    """Apply journaled offline changes in order, skipping ids already applied.
+
+    Each mutation gets a status: ``applied``, ``duplicate``, ``conflict``
+    (someone changed the chore since the tablet last saw it; the result
+    carries the current state), ``not_found`` (the chore was deleted) or
+    ``unsupported``. All of them are final, so the tablet removes every
+    mutation it gets a result for.
+    """
+    try:
+        ids = [m.id for m in batch.mutations]
+        seen = {row.id for row in db.query(ProcessedMutation.id).filter(ProcessedMutation.id.in_(ids))}
+
+        client = client_key(request)[:64]
+        results = []
+        # Ticks to apply per chore, in batch order
+        pending: Dict[int, List[Mutation]] = {}
+        for mutation in batch.mutations:
+            if mutation.id in seen:
+                results.append({"id": mutation.id, "status": "duplicate"})
+                continue
+            seen.add(mutation.id)
+
+            result = {"id": mutation.id}
+            if mutation.type != "chore_toggle":
+                result["status"] = "unsupported"
+            else:
+                pending.setdefault(mutation.chore_id, []).append(mutation)
+            results.append(result)
+
+        # Last state per chore, so a chore ticked and unticked offline is broadcast once
+        updates: Dict[int, dict] = {}
+        if pending:
+            outcomes, updates = _apply_toggles(db, pending)
+            for result in results:
+                if "status" not in result:
+                    result.update(outcomes[result["id"]])
+
+        processed = [
+            {"id": result["id"], "client_id": client, "status": result["status"]}
+            for result in results if result["status"] != "duplicate"
+        ]
+        if processed:
+            db.execute(insert(ProcessedMutation), processed)
+        _prune_processed(db)
+        db.commit()
+    except IntegrityError:
+        # The same ids are being applied by a concurrent request; the retry sees them as duplicates
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Mutations are already being applied, retry shortly")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying mutation batch: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    applied = sum(1 for r in results if r["status"] == "applied")
+    logger.info(f"Applied {applied} of {len(results)} offline mutations from {client}")
+    for message in updates.values():
+        reminder_scheduler.chore_toggled(message["chore_id"], message["completed"])
+        analytics.invalidate(message["checklist_id"])
+        anyio.from_thread.run(manager.broadcast, message)
+    return {"results": results}
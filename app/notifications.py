@@ -0,0 +1,85 @@
+import os
+import asyncio
+import logging
+import threading
+from typing import Optional
+from .telegram import get_telegram
+from .metrics import Counter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "500"))
+# How long shutdown waits for queued notifications to go out
+NOTIFY_DRAIN_TIMEOUT = float(os.getenv("NOTIFY_DRAIN_TIMEOUT", "10"))
+
+notifications_dropped = Counter("notifications_dropped_total", "Telegram notifications dropped because the queue was full or closed.")
+
+
+class NotificationQueue:
+    """Sends Telegram notifications from a background task.
+
+    Request handlers only enqueue, so a slow Telegram API never holds up a
+    response. ``enqueue`` may be called from the event loop or from
+    threadpool endpoints. On shutdown ``drain`` waits for the queue to empty
+    before the worker is stopped.
+    """
+
+    def __init__(self, maxsize: int = NOTIFY_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[int] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.get_ident()
+        self._queue = asyncio.Queue(self.maxsize)
+        self._task = asyncio.create_task(self._worker())
+
+    def enqueue(self, text: str):
+        if self._loop is None or self._loop.is_closed():
+            notifications_dropped.inc()
+            logger.warning(f"Notification queue not running, dropping message: {text}")
+            return
+        if threading.get_ident() == self._thread:
+            self._put(text)
+        else:
+            self._loop.call_soon_threadsafe(self._put, text)
+
+    def _put(self, text: str):
+        try:
+            self._queue.put_nowait(text)
+        except asyncio.QueueFull:
+            notifications_dropped.inc()
+            logger.error(f"Notification queue full, dropping message: {text}")
+
+    async def _worker(self):
+        while True:
+            text = await self._queue.get()
+            try:
+                await get_telegram().send_message(text)
+            except Exception as e:
+                logger.error(f"Error sending queued notification: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def drain(self, timeout: float = NOTIFY_DRAIN_TIMEOUT):
+        """Wait for queued notifications to be sent, then stop the worker."""
+        if self._task is None:
+            return
+        pending = self._queue.qsize()
+        if pending:
+            logger.info(f"Flushing {pending} queued notifications")
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            notifications_dropped.inc(self._queue.qsize())
+            logger.warning(f"Gave up on {self._queue.qsize()} notifications after {timeout}s")
+        self._task.cancel()
+        self._task = None
+        self._loop = None
+
+
+notification_queue = NotificationQueue()
@@ -0,0 +1,232 @@
+"""Opt-in per-request SQL profiling and N+1 detection.
+
+Enabled with ``SQL_PROFILE=1``. Every statement a request runs is recorded
+with its normalized shape, so the same query issued once per row shows up
+as one shape with a high count. Each response carries ``X-Request-Id`` and
+``X-SQL-*`` headers, and the full profile is kept for the last
+``SQL_PROFILE_HISTORY`` requests at ``/debug/profile/{request_id}``.
+
+Routes can be given a query budget (``QUERY_BUDGETS``, extended with the
+``SQL_QUERY_BUDGETS`` JSON env var). Going over it is logged, or with
+``SQL_PROFILE_STRICT=1`` raises ``QueryBudgetExceeded`` so a test run
+through ``TestClient`` fails on the offending request.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import route_template
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "").lower() in ("1", "true", "yes")
+SQL_PROFILE_STRICT = os.getenv("SQL_PROFILE_STRICT", "").lower() in ("1", "true", "yes")
+# A statement shape repeated this many times in one request is flagged as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5"))
+PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "200"))
+
+# Maximum statements per request, by route template
+QUERY_BUDGETS: Dict[str, int] = {
+    "/api/checklists/{checklist_name}/chores": 3,
+    "/api/chores/{chore_id}/toggle": 4,
+    "/api/chore_completion": 7,
+    "/api/submit_checklist": 6,
+    "/api/sections/{section_id}/complete": 8,
+    # Set-based, so any batch size: 7 for ticks on one checklist and shift day,
+    # 2 more for a second one, 1 for the hourly prune of processed ids
+    "/api/mutations/batch": 10,
+    "/debug/db-state": 3,
+    "/admin": 5,
+}
+QUERY_BUDGETS.update(json.loads(os.getenv("SQL_QUERY_BUDGETS", "{}")))
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]*?)\)", re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+class QueryBudgetExceeded(Exception):
+    """A route ran more SQL statements than its budget allows."""
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so per-row variants of one query compare equal."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _LITERAL.sub("?", shape)
+
+
+class RequestProfile:
+    """The statements one request ran, with their timings."""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.route = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.queries: List[tuple] = []  # (shape, seconds)
+
+    @property
+    def sql_time(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[dict]:
+        """Statement shapes run at least ``threshold`` times, most frequent first."""
+        counts = Counter(shape for shape, _ in self.queries)
+        totals = Counter()
+        for shape, duration in self.queries:
+            totals[shape] += duration
+        return [
+            {"count": count, "sql_ms": round(totals[shape] * 1000, 3), "statement": shape}
+            for shape, count in counts.most_common()
+            if count >= threshold
+        ]
+
+    def budget(self) -> Optional[int]:
+        return QUERY_BUDGETS.get(self.route)
+
+    def to_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "total_ms": round((self.elapsed or 0) * 1000, 3),
+            "query_count": len(self.queries),
+            "sql_ms": round(self.sql_time * 1000, 3),
+            "budget": self.budget(),
+            "repeated": self.repeated(),
+            "queries": [
+                {"statement": shape, "ms": round(duration * 1000, 3)}
+                for shape, duration in self.queries
+            ],
+        }
+
+
+_current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("current_profile", default=None)
+_profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def _store(profile: RequestProfile):
+    with _profiles_lock:
+        _profiles[profile.request_id] = profile
+        while len(_profiles) > PROFILE_HISTORY:
+            _profiles.popitem(last=False)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is not None and conn.info.get("profile_start"):
+        started = conn.info["profile_start"].pop()
+        profile.queries.append((statement_shape(statement), time.perf_counter() - started))
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles each HTTP request's SQL."""
+
+    def __init__(self, app, strict: bool = SQL_PROFILE_STRICT):
+        self.app = app
+        self.strict = strict
+
+    def _check(self, profile: RequestProfile):
+        repeated = profile.repeated()
+        if repeated:
+            logger.warning(
+                f"Possible N+1 in {profile.method} {profile.route}: "
+                f"{repeated[0]['count']}x {repeated[0]['statement'][:200]}",
+                extra={"request_id": profile.request_id}
+            )
+        budget = profile.budget()
+        if budget is not None and len(profile.queries) > budget:
+            message = f"{profile.method} {profile.route} ran {len(profile.queries)} queries, budget is {budget}"
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra={"request_id": profile.request_id})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/debug/profile"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex[:16]
+        profile = RequestProfile(request_id, scope["method"], scope["path"])
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # The endpoint has finished its queries by the time headers go out
+                profile.route = route_template(scope)
+                profile.elapsed = time.perf_counter() - profile.started
+                self._check(profile)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1")),
+                    (b"x-sql-queries", str(len(profile.queries)).encode()),
+                    (b"x-sql-time-ms", f"{profile.sql_time * 1000:.2f}".encode()),
+                    (b"x-sql-repeated", str(len(profile.repeated())).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            profile.route = route_template(scope)
+            profile.elapsed = time.perf_counter() - profile.started
+            _store(profile)
+
+
+router = APIRouter()
+
+
+@router.get("/debug/profile")
+async def list_profiles():
+    """Summaries of the most recent profiled requests, newest first."""
+    with _profiles_lock:
+        profiles = list(_profiles.values())
+    return [
+        {key: value for key, value in p.to_dict().items() if key != "queries"}
+        for p in reversed(profiles)
+    ]
+
+
+@router.get("/debug/profile/{request_id}")
+async def get_profile(request_id: str):
+    """Full SQL profile of one request."""
+    with _profiles_lock:
+        profile = _profiles.get(request_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.to_dict()
+
+
+def install_profiling(app, strict: Optional[bool] = None):
+    """Attach the profiler to ``app`` if SQL_PROFILE is set (or ``strict`` is given)."""
+    if not SQL_PROFILE and strict is None:
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.add_middleware(ProfilingMiddleware, strict=SQL_PROFILE_STRICT if strict is None else strict)
+    app.include_router(router)
+    logger.info(f"SQL profiling enabled (strict={SQL_PROFILE_STRICT if strict is None else strict})")
@@ -0,0 +1,280 @@
+"""Telegram reminders for chores still open at their due time.
+
+Chores may have a ``due_time`` (a time of day, Europe/Berlin). The
+scheduler keeps a heap with one entry per such chore: the next deadline it
+has to be checked at. Nothing polls the database. The heap is built once at
+startup, and endpoints update it as chores are ticked, so a completed
+chore moves on to tomorrow's deadline and an unticked one comes back to
+today's.
+
+When deadlines pass, all chores due at that moment are claimed in one
+``UPDATE ... RETURNING`` that only matches chores still open and not yet
+reminded for that deadline. That makes the database the judge: a tick
+another worker saw but this one missed cancels the reminder, and with
+several workers each reminder is still sent once. Everything claimed in one
+wakeup goes out as a single Telegram message, grouped by checklist, through
+the notification queue, so a venue-wide deadline is one message, not one
+per checklist.
+"""
+import os
+import time
+import heapq
+import asyncio
+import logging
+import threading
+from datetime import datetime, time as time_of_day, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import anyio
+import pytz
+from sqlalchemy import or_, update
+
+from .database import SessionLocal
+from .models import Checklist, Chore
+from .clock import cet_tz
+from .metrics import Counter
+from .notifications import notification_queue
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "true").lower() not in ("0", "false", "no")
+# Longest sleep between wakeups, so a changed clock is noticed
+REMINDER_CHECK_INTERVAL = int(os.getenv("REMINDER_CHECK_INTERVAL", "300"))
+
+# Telegram rejects longer messages; only then is a wakeup's reminder split
+TELEGRAM_MAX_LENGTH = 4096
+
+reminders_sent = Counter("chore_reminders_sent_total", "Overdue chore reminders sent.")
+
+
+def deadline_on(day, due_time: time_of_day) -> datetime:
+    return cet_tz.localize(datetime.combine(day, due_time))
+
+
+def next_deadline(due_time: time_of_day, after: datetime) -> datetime:
+    """The first deadline for ``due_time`` strictly after ``after``."""
+    local = after.astimezone(cet_tz)
+    deadline = deadline_on(local.date(), due_time)
+    if deadline <= local:
+        deadline = deadline_on(local.date() + timedelta(days=1), due_time)
+    return deadline
+
+
+def _utc(deadline: datetime) -> datetime:
+    return deadline.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def format_reminder(checklist_name: str, chores: List[Tuple[str, time_of_day]]) -> str:
+    lines = "\n".join(f"• {description} (due {due.strftime('%H:%M')})" for description, due in chores)
+    return f"⏰ Still open on {checklist_name}:\n{lines}"
+
+
+def format_reminders(by_checklist: List[Tuple[str, List[Tuple[str, time_of_day]]]]) -> List[str]:
+    """All reminders due together as one message, split between checklists only past Telegram's limit."""
+    messages: List[str] = []
+    for checklist_name, chores in by_checklist:
+        block = format_reminder(checklist_name, chores)
+        if messages and len(messages[-1]) + 2 + len(block) <= TELEGRAM_MAX_LENGTH:
+            messages[-1] += "\n\n" + block
+        else:
+            messages.append(block)
+    return messages
+
+
+def claim_reminders(
+    chore_ids: List[int], deadline: datetime, due_time: time_of_day
+) -> List[Tuple[str, List[Tuple[str, time_of_day]]]]:
+    """Mark the chores still open at ``deadline`` as reminded and return them by checklist.
+
+    Chores completed since, or already claimed for this deadline by another
+    worker, are not returned. Neither are chores whose due time is no longer
+    ``due_time``: a worker that has not heard of a changed due time claims
+    nothing for the old one.
+    """
+    with SessionLocal() as db:
+        rows = db.execute(
+            update(Chore)
+            .where(
+                Chore.id.in_(chore_ids),
+                Chore.due_time == due_time,
+                Chore.completed.isnot(True),
+                or_(Chore.reminded_at.is_(None), Chore.reminded_at < _utc(deadline))
+            )
+            .values(reminded_at=datetime.utcnow())
+            .returning(Chore.checklist_id, Chore.description, Chore.due_time)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+        if not rows:
+            return []
+        names = dict(db.query(Checklist.id, Checklist.name).filter(Checklist.id.in_({row.checklist_id for row in rows})))
+
+    by_checklist: Dict[str, List[Tuple[str, time_of_day]]] = {}
+    for row in rows:
+        by_checklist.setdefault(names.get(row.checklist_id, "checklist"), []).append((row.description, row.due_time))
+    return sorted(by_checklist.items())
+
+
+class ReminderScheduler:
+    """Heap of (deadline, chore id) with lazy deletion.
+
+    ``_deadlines`` holds each chore's current deadline; heap entries that no
+    longer match it are skipped when popped. Hooks are called from threadpool
+    endpoints, so the heap is guarded by a lock and the loop is woken with
+    ``call_soon_threadsafe``.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._deadlines: Dict[int, float] = {}
+        self._due_times: Dict[int, time_of_day] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # Heap maintenance
+
+    def _schedule(self, chore_id: int, deadline: datetime):
+        ts = deadline.timestamp()
+        if self._deadlines.get(chore_id) == ts:
+            return
+        self._deadlines[chore_id] = ts
+        heapq.heappush(self._heap, (ts, chore_id))
+        # Skipped entries pile up when chores are ticked back and forth
+        if len(self._heap) > 4 * len(self._deadlines) + 64:
+            self._heap = [(t, c) for c, t in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def _wake(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _pop_due(self, now_ts: float) -> Dict[Tuple[float, time_of_day], List[int]]:
+        """Remove every chore whose deadline has passed, grouped by deadline and due time."""
+        due: Dict[Tuple[float, time_of_day], List[int]] = {}
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now_ts:
+                ts, chore_id = heapq.heappop(self._heap)
+                if self._deadlines.get(chore_id) != ts:
+                    continue
+                due_time = self._due_times[chore_id]
+                due.setdefault((ts, due_time), []).append(chore_id)
+                # Check it again at tomorrow's deadline
+                self._schedule(chore_id, next_deadline(due_time, datetime.fromtimestamp(ts, pytz.utc)))
+        return due
+
+    def seconds_until_next(self) -> float:
+        with self._lock:
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return REMINDER_CHECK_INTERVAL
+            return max(0.0, min(self._heap[0][0] - time.time(), REMINDER_CHECK_INTERVAL))
+
+    # Hooks for endpoints
+
+    def chore_toggled(self, chore_id: int, completed: bool):
+        """A chore was ticked or unticked; call after the commit."""
+        self.chores_toggled([chore_id], completed)
+
+    def chores_toggled(self, chore_ids: Iterable[int], completed: bool):
+        now = datetime.now(cet_tz)
+        changed = False
+        with self._lock:
+            for chore_id in chore_ids:
+                due_time = self._due_times.get(chore_id)
+                if due_time is None:
+                    continue
+                if completed:
+                    # Done for today: next check is tomorrow's deadline
+                    today = deadline_on(now.date(), due_time)
+                    self._schedule(chore_id, next_deadline(due_time, max(now, today)))
+                else:
+                    self._schedule(chore_id, next_deadline(due_time, now))
+                changed = True
+        if changed:
+            self._wake()
+
+    def chore_changed(self, chore_id: int, due_time: Optional[time_of_day], completed: bool = False):
+        """A chore's due time was set, changed or cleared (or the chore was deleted)."""
+        with self._lock:
+            if due_time is None:
+                self._due_times.pop(chore_id, None)
+                self._deadlines.pop(chore_id, None)
+            else:
+                self._due_times[chore_id] = due_time
+        if due_time is not None:
+            self.chore_toggled(chore_id, completed)
+        else:
+            self._wake()
+
+    # Startup and the loop
+
+    def rebuild(self, now: Optional[datetime] = None) -> int:
+        """Load every chore with a due time; returns how many."""
+        now = now or datetime.now(cet_tz)
+        with SessionLocal() as db:
+            rows = db.query(Chore.id, Chore.due_time, Chore.completed, Chore.reminded_at).filter(Chore.due_time.isnot(None)).all()
+        with self._lock:
+            self._heap, self._deadlines, self._due_times = [], {}, {}
+            for chore_id, due_time, completed, reminded_at in rows:
+                self._due_times[chore_id] = due_time
+                today = deadline_on(now.astimezone(cet_tz).date(), due_time)
+                if completed:
+                    deadline = next_deadline(due_time, max(now, today))
+                elif today <= now and (reminded_at is None or reminded_at < _utc(today)):
+                    # Missed while the app was down: remind right away
+                    deadline = today
+                else:
+                    deadline = next_deadline(due_time, now)
+                self._schedule(chore_id, deadline)
+        return len(rows)
+
+    def start(self):
+        if not REMINDERS_ENABLED:
+            logger.info("Chore reminders disabled")
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    async def _run(self):
+        try:
+            count = await anyio.to_thread.run_sync(self.rebuild)
+            logger.info(f"Loaded {count} chores with due times")
+        except Exception as e:
+            logger.error(f"Error loading chore due times: {str(e)}", exc_info=True)
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.seconds_until_next())
+            except asyncio.TimeoutError:
+                pass
+            # Everything due at this wakeup is claimed first and sent together
+            by_checklist: Dict[str, List[Tuple[str, time_of_day]]] = {}
+            for (ts, due_time), chore_ids in sorted(self._pop_due(time.time()).items()):
+                try:
+                    deadline = datetime.fromtimestamp(ts, pytz.utc)
+                    for checklist_name, chores in await anyio.to_thread.run_sync(claim_reminders, chore_ids, deadline, due_time):
+                        by_checklist.setdefault(checklist_name, []).extend(chores)
+                except Exception as e:
+                    logger.error(f"Error claiming chore reminders: {str(e)}", exc_info=True)
+            for message in format_reminders(sorted(by_checklist.items())):
+                notification_queue.enqueue(message)
+            reminders_sent.inc(sum(len(chores) for chores in by_checklist.values()))
+
+
+reminder_scheduler = ReminderScheduler()
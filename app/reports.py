@@ -0,0 +1,260 @@
+"""PDF checklist reports, one at a time or as a ZIP archive.
+
+``report_sections`` and ``render_report_html`` build the report that
+``submit_checklist`` can attach to a submission.
+``/api/reports/archive?from=&to=`` rebuilds the report of every
+submission (``Signature``) in a date range for inspections. Each report
+shows the chores as they stood when it was signed, meaning the latest
+completion between the checklist's previous reset and the signature.
+
+The HTML is rendered in the request thread. The wkhtmltopdf conversion
+runs in a process pool, a few reports at a time. Each PDF is written into
+the ZIP as soon as it is ready and the bytes are sent at once, so neither
+the PDFs nor the archive are ever held in full on disk or in memory.
+"""
+import io
+import os
+import re
+import logging
+import threading
+import zipfile
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pytz
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from .database import get_db, SessionLocal
+from .models import Checklist, ChecklistReset, Chore, ChoreCompletion, Section, Signature
+from .admin import verify_admin
+from .clock import cet_tz, cet_naive
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/reports", dependencies=[Depends(verify_admin)])
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+ARCHIVE_MAX_DAYS = int(os.getenv("ARCHIVE_MAX_DAYS", "93"))
+
+
+@lru_cache(maxsize=1)
+def get_report_environment():
+    """Jinja environment for PDF reports, created on first use."""
+    from jinja2 import Environment, FileSystemLoader
+    return Environment(loader=FileSystemLoader('templates'))
+
+
+def report_sections(db: Session, checklist_id: int, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None) -> Dict[str, List[dict]]:
+    """Chores by section with their latest completion, optionally within (since, until] (naive UTC)."""
+    # Latest completion per chore, ranked in the database instead of one query per chore
+    ranked = (
+        select(
+            ChoreCompletion.chore_id,
+            ChoreCompletion.completed,
+            ChoreCompletion.staff_name,
+            ChoreCompletion.completed_at,
+            ChoreCompletion.comment,
+            func.row_number().over(
+                partition_by=ChoreCompletion.chore_id,
+                order_by=ChoreCompletion.completed_at.desc()
+            ).label("rank")
+        )
+        .join(Chore, Chore.id == ChoreCompletion.chore_id)
+        .where(Chore.checklist_id == checklist_id)
+    )
+    if since is not None:
+        ranked = ranked.where(ChoreCompletion.completed_at > since)
+    if until is not None:
+        ranked = ranked.where(ChoreCompletion.completed_at <= until)
+    ranked = ranked.subquery()
+    latest = {
+        row.chore_id: row
+        for row in db.execute(select(ranked).where(ranked.c.rank == 1))
+    }
+
+    # Sections and their chores in one query
+    chores_by_section = {}
+    for section_name, chore_id, description in (
+        db.query(Section.name, Chore.id, Chore.description)
+        .outerjoin(Chore, and_(Chore.section_id == Section.id, Chore.archived_at.is_(None)))
+        .filter(Section.checklist_id == checklist_id)
+        .order_by(Section.order, Chore.order)
+    ):
+        chores_with_completion = chores_by_section.setdefault(section_name, [])
+        if chore_id is None:
+            continue
+        completion = latest.get(chore_id)
+        chores_with_completion.append({
+            'description': description,
+            'completed': completion.completed if completion else False,
+            'completed_by': completion.staff_name if completion else None,
+            'completed_at': cet_naive(completion.completed_at).strftime('%Y-%m-%d %H:%M:%S') if completion and completion.completed_at else None,
+            'comment': completion.comment if completion else None
+        })
+    return chores_by_section
+
+
+def render_report_html(checklist_name: str, staff_name: str, when: datetime, sections: Dict[str, List[dict]]) -> str:
+    template = get_report_environment().get_template('checklist_report.html')
+    return template.render(
+        checklist_name=checklist_name,
+        staff_name=staff_name,
+        date=when.strftime('%Y-%m-%d %H:%M:%S'),
+        sections=sections
+    )
+
+
+def render_pdf(html_content: str) -> bytes:
+    """Convert report HTML to PDF bytes; runs in the report pool for archives."""
+    import pdfkit
+    return pdfkit.from_string(html_content, False)
+
+
+# Process pool for PDF conversion
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_report_pool() -> ProcessPoolExecutor:
+    """The shared pool, started on first use. Spawned rather than forked, as the server runs threads."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_report_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# Archive
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink for ZipFile whose contents are taken out as they are written.
+
+    It cannot seek, so ZipFile writes sizes after each entry instead of
+    going back to the entry header.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe(value: Optional[str]) -> str:
+    return re.sub(r"[^\w.-]+", "_", value or "unknown").strip("_") or "unknown"
+
+
+def _report_jobs(db: Session, signatures: List) -> Iterator[Tuple[str, str]]:
+    """(file name, report HTML) per submission, built as the pool asks for more."""
+    for signature_id, checklist_id, checklist_name, staff_name, completed_at in signatures:
+        signed_at = cet_naive(completed_at)
+        last_reset = (
+            db.query(func.max(ChecklistReset.reset_at))
+            .filter(ChecklistReset.checklist_id == checklist_id, ChecklistReset.reset_at <= completed_at)
+            .scalar()
+        )
+        sections = report_sections(db, checklist_id, last_reset, completed_at)
+        name = f"{signed_at:%Y-%m-%d}/{_safe(checklist_name)}_{_safe(staff_name)}_{signed_at:%H%M%S}_{signature_id}.pdf"
+        yield name, render_report_html(checklist_name, staff_name, signed_at, sections)
+
+
+def stream_archive(signatures: List) -> Iterator[bytes]:
+    """Render the reports of ``signatures`` in the pool and yield the ZIP as entries finish.
+
+    At most two reports per worker are in flight, so memory holds a
+    handful of PDFs however long the range is. A report that fails to
+    render becomes a ``.error.txt`` entry instead of breaking the download.
+    """
+    pool = get_report_pool()
+    sink = _ZipStream()
+    pending: Dict[Future, str] = {}
+    rendered = failed = 0
+    try:
+        with SessionLocal() as db, zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+            jobs = _report_jobs(db, signatures)
+            while True:
+                for name, html_content in jobs:
+                    pending[pool.submit(render_pdf, html_content)] = name
+                    if len(pending) >= REPORT_WORKERS * 2:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        archive.writestr(name, future.result())
+                        rendered += 1
+                    except Exception as e:
+                        logger.error(f"Error rendering report {name}: {str(e)}")
+                        archive.writestr(f"{name}.error.txt", f"This report could not be rendered: {e}\n")
+                        failed += 1
+                yield sink.take()
+        # The central directory, written when the archive closes
+        yield sink.take()
+        logger.info(f"Streamed report archive: {rendered} reports, {failed} failed")
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+@router.get("/archive")
+def report_archive(
+    start: date = Query(..., alias="from"),
+    end: date = Query(..., alias="to"),
+    checklist: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Every submission's report from ``from`` to ``to`` (CET dates, inclusive) as a streamed ZIP."""
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days >= ARCHIVE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Archives are limited to {ARCHIVE_MAX_DAYS} days")
+
+    bounds = [
+        cet_tz.localize(datetime.combine(day, datetime.min.time())).astimezone(pytz.utc).replace(tzinfo=None)
+        for day in (start, end + timedelta(days=1))
+    ]
+    query = (
+        db.query(Signature.id, Signature.checklist_id, Checklist.name, Signature.staff_name, Signature.completed_at)
+        .join(Checklist, Checklist.id == Signature.checklist_id)
+        .filter(Signature.completed_at >= bounds[0], Signature.completed_at < bounds[1])
+    )
+    if checklist:
+        query = query.filter(Checklist.name == checklist)
+    signatures = query.order_by(Signature.completed_at).all()
+    if not signatures:
+        raise HTTPException(status_code=404, detail="No submissions in this range")
+
+    logger.info(f"Building report archive of {len(signatures)} submissions from {start} to {end}")
+    return StreamingResponse(
+        stream_archive(signatures),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="reports-{start}-{end}.zip"'}
+    )
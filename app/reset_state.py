@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+import threading
+import logging
+import pytz
+from .models import ChecklistReset
+from .clock import cet_tz
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Upper bound on how stale another worker's view of a reset can be
+RESET_CACHE_TTL_SECONDS = 60
+
+
+class ResetStateService:
+    """Caches the last reset timestamp per checklist.
+
+    The last reset is the most recent row in ``checklist_resets``, written by
+    the reset scheduler (see ``scheduler.py``) and by manual resets. Values
+    are served from memory and refreshed from the database at most once per
+    TTL; resets made by this worker update the cache right away.
+    """
+
+    def __init__(self, ttl_seconds: int = RESET_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._cache: Dict[int, Tuple[Optional[datetime], float]] = {}
+        self._lock = threading.Lock()
+
+    def get_last_reset(self, checklist_id: int, db: Session) -> Optional[datetime]:
+        """Return the last reset time (CET) for a checklist, loading it on a cache miss."""
+        now_ts = datetime.now().timestamp()
+        with self._lock:
+            cached = self._cache.get(checklist_id)
+        if cached and now_ts - cached[1] < self.ttl_seconds:
+            return cached[0]
+
+        reset_at = (
+            db.query(func.max(ChecklistReset.reset_at))
+            .filter(ChecklistReset.checklist_id == checklist_id)
+            .scalar()
+        )
+        last_reset = pytz.utc.localize(reset_at).astimezone(cet_tz) if reset_at else None
+        with self._lock:
+            self._cache[checklist_id] = (last_reset, now_ts)
+        return last_reset
+
+    def record_reset(self, checklist_id: int, when: Optional[datetime] = None):
+        """Record that a checklist was just reset."""
+        when = when or datetime.now(cet_tz)
+        with self._lock:
+            self._cache[checklist_id] = (when, datetime.now().timestamp())
+        logger.debug(f"Recorded reset for checklist {checklist_id} at {when}")
+
+    def invalidate(self, checklist_id: Optional[int] = None):
+        with self._lock:
+            if checklist_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(checklist_id, None)
+
+
+reset_state = ResetStateService()
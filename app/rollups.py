@@ -0,0 +1,91 @@
+"""Daily and weekly compliance rollups.
+
+Dashboards ask questions like "how many days this month was the opening
+checklist submitted". Answering them from ``chore_completions`` and
+``signatures`` would scan the whole history. Instead, every write that
+ticks chores or submits a checklist also bumps counters in
+``checklist_daily_rollups`` (checklist, shift day) and
+``checklist_weekly_rollups`` (checklist, ISO week), in the same
+transaction as the write. Both tables are keyed by their primary key, so
+a dashboard read is an index range scan over one row per day or week.
+
+The counters are additive, so each update is one upsert per table. Run
+``backfill_rollups.py`` to rebuild them from history, e.g. after the
+tables are first created.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+import pytz
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import DailyRollup, WeeklyRollup
+from .clock import cet_tz
+from .scheduler import RESET_TIME
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("ticks", "unticks", "submissions")
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def shift_day(when: datetime) -> date:
+    """The shift day a moment belongs to. Days start at the reset time (CET); naive times are UTC, as stored."""
+    local = (when if when.tzinfo else pytz.utc.localize(when)).astimezone(cet_tz).replace(tzinfo=None)
+    return (local - timedelta(hours=RESET_TIME.hour, minutes=RESET_TIME.minute)).date()
+
+
+def week_of(day: date) -> date:
+    """Monday of the ISO week ``day`` is in."""
+    return day - timedelta(days=day.weekday())
+
+
+def _upsert(db: Session, model, keys: dict, counts: Dict[str, int], returning=None):
+    insert = _INSERTS[db.get_bind().dialect.name]
+    stmt = insert(model).values(**keys, **counts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: model.__table__.c[name] + stmt.excluded[name] for name in counts}
+    )
+    if returning is not None:
+        return db.execute(stmt.returning(returning)).scalar()
+    db.execute(stmt)
+
+
+def record(db: Session, checklist_id: int, when: datetime, ticks: int = 0, unticks: int = 0, submissions: int = 0):
+    """Add to the rollups of the day and week ``when`` falls in. The caller commits."""
+    day = shift_day(when)
+    counts = {"ticks": ticks, "unticks": unticks, "submissions": submissions}
+    submitted = _upsert(
+        db, DailyRollup, {"checklist_id": checklist_id, "day": day}, counts, returning=DailyRollup.submissions
+    )
+    # The day's first submission makes it a submitted day of the week
+    first_submission = bool(submissions) and submitted == submissions
+    _upsert(
+        db, WeeklyRollup, {"checklist_id": checklist_id, "week": week_of(day)},
+        {**counts, "days_submitted": int(first_submission)}
+    )
+
+
+def daily_rollups(db: Session, checklist_ids: List[int], start: date, end: date) -> List[DailyRollup]:
+    return (
+        db.query(DailyRollup)
+        .filter(DailyRollup.checklist_id.in_(checklist_ids), DailyRollup.day >= start, DailyRollup.day <= end)
+        .order_by(DailyRollup.checklist_id, DailyRollup.day)
+        .all()
+    )
+
+
+def weekly_rollups(db: Session, checklist_ids: List[int], start: date, end: date) -> List[WeeklyRollup]:
+    """Rollups of the ISO weeks overlapping ``start`` to ``end``."""
+    return (
+        db.query(WeeklyRollup)
+        .filter(WeeklyRollup.checklist_id.in_(checklist_ids), WeeklyRollup.week >= week_of(start), WeeklyRollup.week <= end)
+        .order_by(WeeklyRollup.checklist_id, WeeklyRollup.week)
+        .all()
+    )
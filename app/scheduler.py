@@ -0,0 +1,217 @@
+"""Automatic checklist resets.
+
+Every checklist has a reset policy: daily at ``RESET_TIME`` (06:00 CET) by
+default, and weekly on ``RESET_WEEKDAY`` for the checklists named in
+``WEEKLY_CHECKLISTS``. A background task started from the app's lifespan
+wakes up at the next reset time. It looks for checklists whose latest row
+in ``checklist_resets`` is older than their most recent scheduled reset,
+and clears all of them with one UPDATE. The same check runs at startup,
+so resets missed while the app was down are caught up once, not replayed
+one by one.
+
+Every worker and replica runs the task. On PostgreSQL a transaction-level
+advisory lock lets only one of them reset; the others find the reset
+already recorded. Tablets get a single ``checklist_reset`` WebSocket event
+and reload.
+"""
+import os
+import asyncio
+import logging
+import threading
+from collections import Counter as Tally
+from datetime import datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+import anyio
+import pytz
+from sqlalchemy import func, insert, or_, text, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import Checklist, ChecklistReset, Chore
+from .clock import cet_tz
+from .broadcast import manager
+from .metrics import Counter
+from .reset_state import reset_state
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _parse_time(value: str) -> time:
+    hour, minute = value.split(":")
+    return time(int(hour), int(minute))
+
+
+RESET_SCHEDULER_ENABLED = os.getenv("RESET_SCHEDULER_ENABLED", "true").lower() not in ("0", "false", "no")
+RESET_TIME = _parse_time(os.getenv("RESET_TIME", "06:00"))
+RESET_WEEKDAY = int(os.getenv("RESET_WEEKDAY", "0"))  # Monday
+WEEKLY_CHECKLISTS = {name.strip() for name in os.getenv("WEEKLY_CHECKLISTS", "weekly").split(",") if name.strip()}
+# Longest sleep between checks, so a changed clock or a missed wakeup is noticed
+RESET_CHECK_INTERVAL = int(os.getenv("RESET_CHECK_INTERVAL", "300"))
+# pg_try_advisory_xact_lock key; any constant shared by all replicas
+RESET_LOCK_KEY = 727401
+
+# Serializes runs within a process; the advisory lock covers other processes
+_run_lock = threading.Lock()
+
+checklist_resets_total = Counter("checklist_resets_total", "Checklists reset, by trigger.", ["trigger"])
+
+
+class ResetPolicy(NamedTuple):
+    frequency: str  # "daily" or "weekly"
+    at: time
+    weekday: int = 0
+
+    def _period(self) -> timedelta:
+        return timedelta(days=7 if self.frequency == "weekly" else 1)
+
+    def _at(self, day) -> datetime:
+        return cet_tz.localize(datetime.combine(day, self.at))
+
+    def last_due(self, now: datetime) -> datetime:
+        """The most recent scheduled reset at or before ``now``, in CET."""
+        local = now.astimezone(cet_tz)
+        day = local.date()
+        if self.frequency == "weekly":
+            day -= timedelta(days=(day.weekday() - self.weekday) % 7)
+        if self._at(day) > local:
+            day -= self._period()
+        return self._at(day)
+
+    def next_due(self, now: datetime) -> datetime:
+        """The first scheduled reset after ``now``, in CET."""
+        return self._at(self.last_due(now).date() + self._period())
+
+
+DAILY = ResetPolicy("daily", RESET_TIME)
+WEEKLY = ResetPolicy("weekly", RESET_TIME, RESET_WEEKDAY)
+
+
+def policy_for(checklist_name: str) -> ResetPolicy:
+    return WEEKLY if checklist_name in WEEKLY_CHECKLISTS else DAILY
+
+
+def reset_event(checklist_names: List[str], trigger: str) -> dict:
+    """WebSocket message telling tablets which checklists to reload."""
+    return {"type": "checklist_reset", "checklists": checklist_names, "trigger": trigger}
+
+
+def reset_checklists(db: Session, checklist_ids: List[int], trigger: str, reset_by: Optional[str] = None) -> Dict[int, int]:
+    """Clear the chores of several checklists in one UPDATE and record the resets.
+
+    Returns the number of chores cleared per checklist. Versions are bumped
+    so writes made against the old state get a conflict. The caller commits.
+    """
+    if not checklist_ids:
+        return {}
+    cleared = Tally(
+        db.execute(
+            update(Chore)
+            .where(
+                Chore.checklist_id.in_(checklist_ids),
+                or_(Chore.completed == True, Chore.completed_by.isnot(None), Chore.completed_at.isnot(None))
+            )
+            .values(completed=False, completed_by=None, completed_at=None, version=Chore.version + 1)
+            .returning(Chore.checklist_id)
+            .execution_options(synchronize_session=False)
+        ).scalars()
+    )
+    now = datetime.utcnow()
+    db.execute(insert(ChecklistReset), [
+        {"checklist_id": checklist_id, "trigger": trigger, "reset_by": reset_by,
+         "chores_reset": cleared[checklist_id], "reset_at": now}
+        for checklist_id in checklist_ids
+    ])
+    checklist_resets_total.inc(len(checklist_ids), trigger=trigger)
+    return {checklist_id: cleared[checklist_id] for checklist_id in checklist_ids}
+
+
+def _try_lock(db: Session) -> bool:
+    """Take the reset lock for this transaction; only PostgreSQL has more than one host."""
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RESET_LOCK_KEY}).scalar())
+
+
+def run_due_resets(now: Optional[datetime] = None) -> List[str]:
+    """Reset every checklist whose scheduled reset has passed; returns their names."""
+    with _run_lock:
+        now = now or datetime.now(cet_tz)
+        with SessionLocal() as db:
+            if not _try_lock(db):
+                logger.debug("Another worker holds the reset lock, skipping")
+                return []
+
+            last_resets = dict(
+                db.query(ChecklistReset.checklist_id, func.max(ChecklistReset.reset_at))
+                .group_by(ChecklistReset.checklist_id)
+            )
+            due, untracked = {}, []
+            for checklist_id, name in db.query(Checklist.id, Checklist.name):
+                last_reset = last_resets.get(checklist_id)
+                if last_reset is None:
+                    untracked.append(checklist_id)
+                    continue
+                scheduled = policy_for(name).last_due(now).astimezone(pytz.utc).replace(tzinfo=None)
+                if last_reset < scheduled:
+                    due[checklist_id] = name
+
+            # A checklist with no reset history (a new install or a new import)
+            # starts tracking now; clearing it mid-shift would lose the day's ticks
+            if untracked:
+                db.execute(insert(ChecklistReset), [
+                    {"checklist_id": checklist_id, "trigger": "initial", "chores_reset": 0, "reset_at": datetime.utcnow()}
+                    for checklist_id in untracked
+                ])
+                logger.info(f"Started reset tracking for {len(untracked)} checklists")
+
+            cleared = reset_checklists(db, list(due), "schedule")
+            db.commit()
+
+        for checklist_id, name in due.items():
+            reset_state.record_reset(checklist_id)
+            logger.info(f"Scheduled reset of {name}: cleared {cleared[checklist_id]} chores")
+        return list(due.values())
+
+
+class ResetScheduler:
+    """Runs ``run_due_resets`` at startup and at every scheduled reset time."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not RESET_SCHEDULER_ENABLED:
+            logger.info("Reset scheduler disabled")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now(cet_tz)
+        next_reset = min(DAILY.next_due(now), WEEKLY.next_due(now))
+        # A second late, so the check lands after the reset time
+        return max(1.0, min((next_reset - now).total_seconds() + 1, RESET_CHECK_INTERVAL))
+
+    async def _run(self):
+        while True:
+            try:
+                names = await anyio.to_thread.run_sync(run_due_resets)
+                if names:
+                    await manager.broadcast(reset_event(names, "schedule"))
+            except Exception as e:
+                logger.error(f"Error running scheduled resets: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.seconds_until_next())
+
+
+reset_scheduler = ResetScheduler()
@@ -1,249 +1,167 @@
 from sqlalchemy.orm import Session
-from .models import Checklist, Section, Chore, ChoreCompletion, Staff
+from sqlalchemy import insert, delete, select
+from .models import (
+    Checklist, ChecklistReset, Section, Chore, ChoreCompletion, DailyRollup, Signature, Staff, SeedState, WeeklyRollup
+)
+from .workbooks import apply_checklist_structure
+from datetime import datetime
+from typing import Optional, Tuple
+import hashlib
+import json
 import logging
+import os
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def seed_database(db: Session):
-    """Seed the database with initial data."""
+# Declarative seed definition: checklists -> sections -> chores, plus staff
+SEED_FILE = os.path.join(os.path.dirname(__file__), "seed_data.json")
+SEED_STATE_KEY = "default"
+
+def load_seed(path: str = SEED_FILE) -> Tuple[dict, str]:
+    """Load the seed definition and return it with its content hash."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
+
+def _record_seed_hash(db: Session, content_hash: str):
+    state = db.get(SeedState, SEED_STATE_KEY)
+    if state:
+        state.content_hash = content_hash
+        state.applied_at = datetime.utcnow()
+    else:
+        db.add(SeedState(key=SEED_STATE_KEY, content_hash=content_hash))
+
+def seed_database(db: Session, seed: Optional[dict] = None, content_hash: Optional[str] = None):
+    """Seed the database with initial data.
+
+    Existing data is deleted, then every table is filled with one bulk
+    INSERT in a single transaction.
+    """
     logger.info("Starting database seeding...")
-    
-    # Delete all existing data
-    db.query(ChoreCompletion).delete()
-    db.query(Chore).delete()
-    db.query(Section).delete()
-    db.query(Checklist).delete()
-    db.query(Staff).delete()
-    db.commit()
-    
-    try:
-        # Create checklists
-        opening = Checklist(name="opening", description="Opening Checklist")
-        closing = Checklist(name="closing", description="Closing Checklist")
-        weekly = Checklist(name="weekly", description="Weekly Checklist")
-        kitchen_opening = Checklist(name="kitchen_opening", description="Kitchen Opening Checklist")
-        kitchen_closing = Checklist(name="kitchen_closing", description="Kitchen Closing Checklist")
-        
-        db.add_all([opening, closing, weekly, kitchen_opening, kitchen_closing])
-        db.commit()
-
-        # Create sections for opening checklist
-        opening_sections = [
-            Section(checklist_id=opening.id, name="Till", order=1),
-            Section(checklist_id=opening.id, name="Floor", order=2),
-            Section(checklist_id=opening.id, name="Prep", order=3),
-            Section(checklist_id=opening.id, name="Bar", order=4),
-            Section(checklist_id=opening.id, name="Kitchen", order=5)
-        ]
-        db.add_all(opening_sections)
-        db.commit()
+    if seed is None:
+        seed, content_hash = load_seed()
 
-        # Create sections for closing checklist
-        closing_sections = [
-            Section(checklist_id=closing.id, name="Till", order=1),
-            Section(checklist_id=closing.id, name="Floor", order=2),
-            Section(checklist_id=closing.id, name="Bar", order=3),
-            Section(checklist_id=closing.id, name="Kitchen", order=4)
-        ]
-        db.add_all(closing_sections)
-        db.commit()
-
-        # Create sections for weekly checklist
-        weekly_sections = [
-            Section(checklist_id=weekly.id, name="Bar Deep Clean", order=1),
-            Section(checklist_id=weekly.id, name="Kitchen Deep Clean", order=2),
-            Section(checklist_id=weekly.id, name="Floor Deep Clean", order=3),
-            Section(checklist_id=weekly.id, name="Storage Areas", order=4)
-        ]
-        db.add_all(weekly_sections)
-        db.commit()
-
-        # Create sections for kitchen opening checklist
-        kitchen_opening_sections = [
-            Section(checklist_id=kitchen_opening.id, name="Equipment Check", order=1),
-            Section(checklist_id=kitchen_opening.id, name="Food Prep", order=2),
-            Section(checklist_id=kitchen_opening.id, name="Safety Check", order=3)
-        ]
-        db.add_all(kitchen_opening_sections)
-        db.commit()
-
-        # Create sections for kitchen closing checklist
-        kitchen_closing_sections = [
-            Section(checklist_id=kitchen_closing.id, name="Equipment Cleaning", order=1),
-            Section(checklist_id=kitchen_closing.id, name="Storage", order=2),
-            Section(checklist_id=kitchen_closing.id, name="Final Checks", order=3)
-        ]
-        db.add_all(kitchen_closing_sections)
-        db.commit()
-
-        # Create chores for opening checklist
-        opening_chores = [
-            # Till section
-            Chore(checklist_id=opening.id, section_id=opening_sections[0].id, description="Count float", order=1),
-            Chore(checklist_id=opening.id, section_id=opening_sections[0].id, description="Check card machine", order=2),
-            Chore(checklist_id=opening.id, section_id=opening_sections[0].id, description="Check till roll", order=3),
-
-            # Floor section
-            Chore(checklist_id=opening.id, section_id=opening_sections[1].id, description="Check tables are clean", order=1),
-            Chore(checklist_id=opening.id, section_id=opening_sections[1].id, description="Check chairs are clean", order=2),
-            Chore(checklist_id=opening.id, section_id=opening_sections[1].id, description="Check floor is clean", order=3),
-            Chore(checklist_id=opening.id, section_id=opening_sections[1].id, description="Check toilets are clean", order=4),
-
-            # Prep section
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Cut lemons", order=1),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Cut limes", order=2),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Cut oranges", order=3),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Check garnish tray", order=4),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Check straws", order=5),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Check napkins", order=6),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Check coasters", order=7),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Check ice", order=8),
-            Chore(checklist_id=opening.id, section_id=opening_sections[2].id, description="Check menus", order=9),
-
-            # Bar section
-            Chore(checklist_id=opening.id, section_id=opening_sections[3].id, description="Check beer lines", order=1),
-            Chore(checklist_id=opening.id, section_id=opening_sections[3].id, description="Check spirit bottles", order=2),
-            Chore(checklist_id=opening.id, section_id=opening_sections[3].id, description="Check wine bottles", order=3),
-            Chore(checklist_id=opening.id, section_id=opening_sections[3].id, description="Check fridges", order=4),
-            Chore(checklist_id=opening.id, section_id=opening_sections[3].id, description="Check glass washer", order=5),
-            Chore(checklist_id=opening.id, section_id=opening_sections[3].id, description="Check glasses are clean", order=6),
-
-            # Kitchen section
-            Chore(checklist_id=opening.id, section_id=opening_sections[4].id, description="Check fridge temperatures", order=1),
-            Chore(checklist_id=opening.id, section_id=opening_sections[4].id, description="Check freezer temperatures", order=2),
-            Chore(checklist_id=opening.id, section_id=opening_sections[4].id, description="Check food prep area", order=3),
-            Chore(checklist_id=opening.id, section_id=opening_sections[4].id, description="Check cleaning supplies", order=4)
-        ]
-        db.add_all(opening_chores)
-        db.commit()
+    try:
+        # Delete all existing data
+        db.execute(delete(ChoreCompletion))
+        db.execute(delete(Chore))
+        db.execute(delete(Section))
+        db.execute(delete(Signature))
+        db.execute(delete(ChecklistReset))
+        db.execute(delete(DailyRollup))
+        db.execute(delete(WeeklyRollup))
+        db.execute(delete(Checklist))
+        db.execute(delete(Staff))
 
-        # Create chores for closing checklist
-        closing_chores = [
-            # Till section
-            Chore(checklist_id=closing.id, section_id=closing_sections[0].id, description="Count till", order=1),
-            Chore(checklist_id=closing.id, section_id=closing_sections[0].id, description="Print Z report", order=2),
-            Chore(checklist_id=closing.id, section_id=closing_sections[0].id, description="Lock till", order=3),
-
-            # Floor section
-            Chore(checklist_id=closing.id, section_id=closing_sections[1].id, description="Clean tables", order=1),
-            Chore(checklist_id=closing.id, section_id=closing_sections[1].id, description="Clean chairs", order=2),
-            Chore(checklist_id=closing.id, section_id=closing_sections[1].id, description="Sweep floor", order=3),
-            Chore(checklist_id=closing.id, section_id=closing_sections[1].id, description="Mop floor", order=4),
-            Chore(checklist_id=closing.id, section_id=closing_sections[1].id, description="Clean toilets", order=5),
-
-            # Bar section
-            Chore(checklist_id=closing.id, section_id=closing_sections[2].id, description="Clean beer lines", order=1),
-            Chore(checklist_id=closing.id, section_id=closing_sections[2].id, description="Clean spirit bottles", order=2),
-            Chore(checklist_id=closing.id, section_id=closing_sections[2].id, description="Clean wine bottles", order=3),
-            Chore(checklist_id=closing.id, section_id=closing_sections[2].id, description="Clean fridges", order=4),
-            Chore(checklist_id=closing.id, section_id=closing_sections[2].id, description="Clean glass washer", order=5),
-            Chore(checklist_id=closing.id, section_id=closing_sections[2].id, description="Clean glasses", order=6),
-            Chore(checklist_id=closing.id, section_id=closing_sections[2].id, description="Empty ice well", order=7),
-
-            # Kitchen section
-            Chore(checklist_id=closing.id, section_id=closing_sections[3].id, description="Clean food prep area", order=1),
-            Chore(checklist_id=closing.id, section_id=closing_sections[3].id, description="Clean surfaces", order=2),
-            Chore(checklist_id=closing.id, section_id=closing_sections[3].id, description="Empty bins", order=3),
-            Chore(checklist_id=closing.id, section_id=closing_sections[3].id, description="Check fridge temperatures", order=4)
+        # Create checklists
+        checklist_ids = {
+            name: checklist_id
+            for checklist_id, name in db.execute(
+                insert(Checklist).returning(Checklist.id, Checklist.name, sort_by_parameter_order=True),
+                [{"name": c["name"], "description": c.get("description")} for c in seed["checklists"]]
+            )
+        }
+
+        # Create sections for every checklist
+        section_rows = [
+            {"checklist_id": checklist_ids[c["name"]], "name": s["name"], "order": order}
+            for c in seed["checklists"]
+            for order, s in enumerate(c["sections"], start=1)
         ]
-        db.add_all(closing_chores)
-        db.commit()
+        section_ids = db.execute(
+            insert(Section).returning(Section.id, sort_by_parameter_order=True),
+            section_rows
+        ).scalars().all()
+
+        # Create chores, in the same order the sections were inserted
+        chore_rows = []
+        section_index = 0
+        for c in seed["checklists"]:
+            for s in c["sections"]:
+                section_id = section_ids[section_index]
+                section_index += 1
+                chore_rows.extend(
+                    {
+                        "checklist_id": checklist_ids[c["name"]],
+                        "section_id": section_id,
+                        "description": description,
+                        "order": order,
+                        "completed": False
+                    }
+                    for order, description in enumerate(s["chores"], start=1)
+                )
+        if chore_rows:
+            db.execute(insert(Chore), chore_rows)
 
-        # Create chores for weekly checklist
-        weekly_chores = [
-            # Bar Deep Clean section
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[0].id, description="Clean beer lines thoroughly", order=1),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[0].id, description="Deep clean all bar equipment", order=2),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[0].id, description="Clean and organize liquor storage", order=3),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[0].id, description="Deep clean ice machines", order=4),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[0].id, description="Clean and maintain beer taps", order=5),
-
-            # Kitchen Deep Clean section
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[1].id, description="Deep clean ovens", order=1),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[1].id, description="Clean hood vents", order=2),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[1].id, description="Deep clean fridges", order=3),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[1].id, description="Clean and sanitize prep areas", order=4),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[1].id, description="Deep clean dishwasher", order=5),
-
-            # Floor Deep Clean section
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[2].id, description="Deep clean all floor areas", order=1),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[2].id, description="Clean baseboards", order=2),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[2].id, description="Clean walls", order=3),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[2].id, description="Clean ceiling vents", order=4),
-
-            # Storage Areas section
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[3].id, description="Organize storage rooms", order=1),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[3].id, description="Check inventory", order=2),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[3].id, description="Clean and organize cellar", order=3),
-            Chore(checklist_id=weekly.id, section_id=weekly_sections[3].id, description="Check for any maintenance needs", order=4)
-        ]
-        db.add_all(weekly_chores)
-        db.commit()
+        # Create staff members
+        if seed.get("staff"):
+            db.execute(insert(Staff), [{"name": name, "is_active": True} for name in seed["staff"]])
 
-        # Create chores for kitchen opening checklist
-        kitchen_opening_chores = [
-            # Equipment Check section
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[0].id, description="Turn on all equipment", order=1),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[0].id, description="Check fridge temperatures", order=2),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[0].id, description="Check freezer temperatures", order=3),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[0].id, description="Check equipment functionality", order=4),
-
-            # Food Prep section
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[1].id, description="Check food inventory", order=1),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[1].id, description="Prepare mise en place", order=2),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[1].id, description="Check prep list", order=3),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[1].id, description="Prepare sauces", order=4),
-
-            # Safety Check section
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[2].id, description="Check fire safety equipment", order=1),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[2].id, description="Check first aid kit", order=2),
-            Chore(checklist_id=kitchen_opening.id, section_id=kitchen_opening_sections[2].id, description="Check cleaning supplies", order=3)
-        ]
-        db.add_all(kitchen_opening_chores)
+        if content_hash:
+            _record_seed_hash(db, content_hash)
         db.commit()
+        logger.info(f"Database seeded successfully with {len(checklist_ids)} checklists and {len(chore_rows)} chores")
+    except Exception as e:
+        logger.error(f"Error committing database changes: {str(e)}", exc_info=True)
+        db.rollback()
+        raise
 
-        # Create chores for kitchen closing checklist
-        kitchen_closing_chores = [
-            # Equipment Cleaning section
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[0].id, description="Clean and sanitize all surfaces", order=1),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[0].id, description="Clean cooking equipment", order=2),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[0].id, description="Clean and empty fryers", order=3),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[0].id, description="Clean hood filters", order=4),
-
-            # Storage section
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[1].id, description="Store prepped items properly", order=1),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[1].id, description="Label and date all items", order=2),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[1].id, description="Rotate stock", order=3),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[1].id, description="Check storage temperatures", order=4),
-
-            # Final Checks section
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[2].id, description="Turn off all equipment", order=1),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[2].id, description="Empty all bins", order=2),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[2].id, description="Lock all storage areas", order=3),
-            Chore(checklist_id=kitchen_closing.id, section_id=kitchen_closing_sections[2].id, description="Final kitchen inspection", order=4)
-        ]
-        db.add_all(kitchen_closing_chores)
-        db.commit()
+def sync_seed(db: Session, seed: dict, content_hash: str):
+    """Apply a changed seed to a database that already has data.
 
-        # Create staff members
-        staff_members = [
-            Staff(name="Nora"),
-            Staff(name="Josh"),
-            Staff(name="Vaile"),
-            Staff(name="Melissa"),
-            Staff(name="Paddy"),
-            Staff(name="Pero"),
-            Staff(name="Guy"),
-            Staff(name="Dean"),
-            Staff(name="Bethany"),
-            Staff(name="Henry")
-        ]
-        db.add_all(staff_members)
+    Runs the workbook import diff for every seeded checklist without removing
+    anything, so completion history and admin-added chores are kept.
+    """
+    logger.info("Seed definition changed, syncing checklists...")
+    try:
+        existing = {c.name: c for c in db.query(Checklist).all()}
+        for c in seed["checklists"]:
+            checklist = existing.get(c["name"])
+            if not checklist:
+                checklist = Checklist(name=c["name"], description=c.get("description"))
+                db.add(checklist)
+                db.flush()
+            structure = [(s["name"], s["chores"]) for s in c["sections"]]
+            apply_checklist_structure(db, checklist, structure, remove_missing=False)
+
+        known_staff = set(db.execute(select(Staff.name)).scalars())
+        new_staff = [{"name": name, "is_active": True} for name in seed.get("staff", []) if name not in known_staff]
+        if new_staff:
+            db.execute(insert(Staff), new_staff)
+
+        _record_seed_hash(db, content_hash)
         db.commit()
-
-        logger.info("Database seeded successfully!")
+        logger.info("Seed sync complete")
     except Exception as e:
-        logger.error(f"Error committing database changes: {str(e)}", exc_info=True)
+        logger.error(f"Error syncing seed data: {str(e)}", exc_info=True)
         db.rollback()
-        raise 
\ No newline at end of file
+        raise
+
+def seed_if_needed(db: Session) -> bool:
+    """Seed or sync the database unless the stored seed hash is current.
+
+    The common case (seed unchanged) costs a single primary-key lookup.
+    A database that has data but no stored hash predates seed tracking; its
+    checklists are taken as they are and only the hash is recorded, so
+    chores deleted there are not brought back. Returns True if anything was
+    written.
+    """
+    seed, content_hash = load_seed()
+    stored_hash = db.execute(
+        select(SeedState.content_hash).where(SeedState.key == SEED_STATE_KEY)
+    ).scalar()
+    if stored_hash == content_hash:
+        logger.info("Seed data unchanged, skipping seeding")
+        return False
+
+    if db.execute(select(Checklist.id).limit(1)).first() is None:
+        logger.info("Database is empty, seeding initial data...")
+        seed_database(db, seed, content_hash)
+    elif stored_hash is None:
+        logger.info("Existing data without a seed hash, recording the current seed without syncing")
+        _record_seed_hash(db, content_hash)
+        db.commit()
+    else:
+        sync_seed(db, seed, content_hash)
+    return True
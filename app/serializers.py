@@ -0,0 +1,57 @@
+from datetime import datetime, date
+from typing import Any, Iterable, List
+from fastapi.responses import Response
+import json
+
+from .clock import utc_iso
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode a payload of plain dicts/lists/datetimes to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """Return already-serialized JSON, skipping FastAPI's jsonable_encoder pass."""
+    return Response(content=dumps(payload), status_code=status_code, media_type="application/json")
+
+
+def serialize_checklist_chores(sections: Iterable, chores: Iterable) -> List[dict]:
+    """Build the chore list payload for a checklist.
+
+    ``sections`` need ``id`` and ``name``; ``chores`` need ``id``,
+    ``description``, ``order``, ``section_id``, ``completed``,
+    ``completed_by``, ``completed_at`` and ``version``. Rows from column
+    queries or ORM objects both work. Sections are indexed by id so each chore is matched in
+    O(1). ``completed_at`` is stored as naive UTC and sent with its offset.
+    """
+    section_names = {section.id: section.name for section in sections}
+    return [
+        {
+            "id": chore.id,
+            "description": chore.description,
+            "order": chore.order,
+            "section": section_names[chore.section_id],
+            "section_id": chore.section_id,
+            "completed": chore.completed,
+            "completed_by": chore.completed_by,
+            "completed_at": utc_iso(chore.completed_at),
+            "version": chore.version,
+            "comment": None  # We'll add comment support later if needed
+        }
+        for chore in chores
+        if chore.section_id in section_names
+    ]
@@ -0,0 +1,144 @@
+"""Serving fingerprinted, precompressed static assets.
+
+``build_assets.py`` writes minified copies of the files under ``static/``
+to ``static/dist/`` with a content hash in the name, next to ``.gz`` and
+``.br`` variants, and records the mapping in ``static/dist/manifest.json``.
+Templates call ``static_url("js/app.js")`` to get the hashed URL. Without a
+build (local development) it returns the plain ``/static/...`` path.
+"""
+import os
+import json
+import logging
+import mimetypes
+from functools import lru_cache
+from typing import Dict
+
+import anyio
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Receive, Scope, Send
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = "static"
+DIST_DIR = "dist"
+MANIFEST_PATH = os.path.join(STATIC_DIR, DIST_DIR, "manifest.json")
+# Hashed files never change, so browsers may keep them for a year
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unhashed files are revalidated with their ETag on every use
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Preferred first; each is served only if its precompressed file exists
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml", "text/")
+
+
+@lru_cache(maxsize=1)
+def load_manifest() -> Dict[str, str]:
+    """Map source paths (``js/app.js``) to built paths (``dist/js/app.1a2b3c4d5e.js``)."""
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        logger.info("No static asset manifest, serving unbuilt assets")
+        return {}
+    except ValueError as e:
+        logger.error(f"Invalid static asset manifest {MANIFEST_PATH}: {str(e)}")
+        return {}
+    logger.info(f"Loaded static asset manifest with {len(manifest)} entries")
+    return manifest
+
+
+def static_url(path: str) -> str:
+    """URL of a static asset, fingerprinted when a build exists."""
+    return f"/{STATIC_DIR}/{load_manifest().get(path, path)}"
+
+
+def _accepted_encodings(scope: Scope) -> set:
+    accept = Headers(scope=scope).get("accept-encoding", "")
+    encodings = set()
+    for part in accept.split(","):
+        name, _, params = part.strip().partition(";")
+        try:
+            if params.strip().startswith("q=") and float(params.strip()[2:]) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that adds cache headers and serves precompressed files.
+
+    Files under ``dist/`` are fingerprinted, so they get an immutable
+    Cache-Control and are served from their ``.br``/``.gz`` variant when
+    the client accepts it. Other files are revalidated on every use.
+    """
+
+    async def get_response(self, path: str, scope: Scope):
+        hashed = path.startswith(DIST_DIR + "/")
+        response = None
+        if hashed and scope["method"] in ("GET", "HEAD"):
+            response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL
+        if hashed:
+            response.headers.add_vary_header("Accept-Encoding")
+        return response
+
+    async def _precompressed_response(self, path: str, scope: Scope):
+        accepted = _accepted_encodings(scope)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None:
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            # Typed as the original file, not as a .gz/.br archive
+            response.headers["Content-Type"] = self._media_type(path)
+            response.headers["Content-Encoding"] = encoding
+            return response
+        return None
+
+    @staticmethod
+    def _media_type(path: str) -> str:
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type == "application/javascript":
+            media_type += "; charset=utf-8"
+        return media_type
+
+
+class _CompressibleGZipResponder(GZipResponder):
+    """Leaves responses that are not text or JSON (images, PDFs) untouched."""
+
+    async def send_with_gzip(self, message):
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if not content_type.startswith(COMPRESSIBLE_TYPES):
+                # The responder passes the body through as-is when it
+                # thinks the response is already encoded
+                self.content_encoding_set = True
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """Gzip JSON and text responses above ``GZIP_MIN_SIZE`` bytes."""
+
+    def __init__(self, app, minimum_size: int = GZIP_MIN_SIZE, compresslevel: int = GZIP_LEVEL):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            responder = _CompressibleGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
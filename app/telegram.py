@@ -1,33 +1,46 @@
 import os
-import aiohttp
+import asyncio
+import time
 from datetime import datetime
 import logging
-import asyncio
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from .database import SessionLocal
-import pytz
+from typing import Optional
+from .clock import cet_tz
+from .metrics import telegram_messages_sent, telegram_send_failures, telegram_send_retries, telegram_send_duration
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Set Central European timezone
-cet_tz = pytz.timezone('Europe/Berlin')  # Berlin uses CET/CEST
+# Bot API endpoint; overridden to point at a local stub in benchmarks
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+# Retries for 429 and 5xx responses; Telegram's retry_after is honoured up to the cap
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "2"))
+TELEGRAM_MAX_RETRY_DELAY = float(os.getenv("TELEGRAM_MAX_RETRY_DELAY", "5"))
+
+# Per-request timeouts, so a hung connection cannot stall the notification queue
+TELEGRAM_TIMEOUT = float(os.getenv("TELEGRAM_TIMEOUT", "10"))
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv("TELEGRAM_CONNECT_TIMEOUT", "5"))
+# Kept-alive connections to the Bot API and how long resolved addresses are reused
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", "4"))
+TELEGRAM_KEEPALIVE = float(os.getenv("TELEGRAM_KEEPALIVE", "60"))
+TELEGRAM_DNS_TTL = int(os.getenv("TELEGRAM_DNS_TTL", "300"))
 
 class TelegramNotifier:
+    """Bot API client sharing one aiohttp session across all messages.
+
+    The session's connector keeps connections to api.telegram.org alive and
+    caches DNS, so after the first message each send is a single request on
+    an open TLS connection. The app opens the session in its lifespan and
+    closes it on shutdown. A notifier used outside the app opens it on first
+    use.
+    """
+
     def __init__(self):
-        # Log all environment variables (except sensitive ones)
-        env_vars = {k: '***' if 'TOKEN' in k else v for k, v in os.environ.items()}
-        logger.info(f"Environment variables: {env_vars}")
-        
         # Get credentials
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
         self.chat_id = os.getenv("TELEGRAM_CHAT_ID", "").strip()
         
-        logger.info("Initializing Telegram notifier...")
-        logger.info(f"Bot token present: {bool(self.bot_token)}")
-        logger.info(f"Chat ID present: {bool(self.chat_id)}")
+        logger.debug("Initializing Telegram notifier...")
         
         if not self.bot_token:
             logger.error("TELEGRAM_BOT_TOKEN not configured")
@@ -36,28 +49,67 @@ class TelegramNotifier:
             logger.error("TELEGRAM_CHAT_ID not configured")
             raise ValueError("TELEGRAM_CHAT_ID environment variable is not set")
             
-        self.api_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.api_url = f"{TELEGRAM_API_BASE}/bot{self.bot_token}"
         self.send_message_url = f"{self.api_url}/sendMessage"
+        self._session = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         logger.info("Telegram bot initialized successfully")
-        logger.info(f"Using chat ID: {self.chat_id}")
-        
-        # Test the bot token by getting bot info
-        asyncio.create_task(self._test_bot_connection())
 
-    async def _test_bot_connection(self):
+    async def open(self):
+        """Create the shared session; a no-op if it is already open on this loop."""
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is loop:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=TELEGRAM_POOL_SIZE,
+            ttl_dns_cache=TELEGRAM_DNS_TTL,
+            keepalive_timeout=TELEGRAM_KEEPALIVE,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=TELEGRAM_TIMEOUT, connect=TELEGRAM_CONNECT_TIMEOUT),
+        )
+        self._loop = loop
+        logger.debug("Opened Telegram HTTP session")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.debug("Closed Telegram HTTP session")
+        self._session = None
+        self._loop = None
+
+    async def _get_session(self):
+        await self.open()
+        return self._session
+
+    async def check_connection(self):
         """Test the bot connection by getting bot info."""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.api_url}/getMe") as response:
-                    if response.status == 200:
-                        bot_info = await response.json()
-                        logger.info(f"Connected to Telegram bot: {bot_info}")
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to connect to Telegram bot. Status: {response.status}, Response: {error_text}")
+            session = await self._get_session()
+            async with session.get(f"{self.api_url}/getMe") as response:
+                if response.status == 200:
+                    bot_info = await response.json()
+                    logger.info(f"Connected to Telegram bot: {bot_info}")
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Failed to connect to Telegram bot. Status: {response.status}, Response: {error_text}")
         except Exception as e:
             logger.error(f"Error testing bot connection: {str(e)}")
 
+    async def get_webhook_info(self):
+        """The bot's current webhook configuration, or None if it could not be fetched."""
+        try:
+            session = await self._get_session()
+            async with session.get(f"{self.api_url}/getWebhookInfo") as response:
+                result = await response.json()
+                return result.get("result")
+        except Exception as e:
+            logger.error(f"Error getting webhook info: {str(e)}")
+            return None
+
     async def send_message(self, text: str):
         if not self.bot_token or not self.chat_id:
             logger.error("Telegram message not sent - missing credentials")
@@ -65,57 +117,69 @@ class TelegramNotifier:
             logger.error(f"Chat ID present: {bool(self.chat_id)}")
             return
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                logger.info(f"Sending Telegram message to chat {self.chat_id}: {text}")
-                logger.info(f"Using API URL: {self.send_message_url}")
-                
-                # Ensure chat_id is a string and properly formatted
-                chat_id = str(self.chat_id).strip()
-                if not chat_id.startswith('-'):
-                    chat_id = f"-{chat_id}"
-                    logger.info(f"Formatted chat ID: {chat_id}")
-                
+        import aiohttp
+
+        started = time.perf_counter()
+        try:
+            session = await self._get_session()
+            # Payloads are only logged, and only formatted, when DEBUG is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sending Telegram message", extra={"chat_id": self.chat_id, "text": text})
+            
+            for attempt in range(TELEGRAM_MAX_RETRIES + 1):
                 async with session.post(
                     self.send_message_url,
                     json={
-                        "chat_id": chat_id,
+                        "chat_id": self.chat_id,
                         "text": text,
                         "parse_mode": "HTML"
                     }
                 ) as response:
-                    response_text = await response.text()
-                    logger.info(f"Telegram API response: {response_text}")
-                    
                     try:
                         result = await response.json()
                     except Exception as e:
                         logger.error(f"Error parsing response JSON: {str(e)}")
                         result = {}
-                    
-                    if response.status == 200 and result.get('ok'):
-                        logger.info("Telegram message sent successfully")
-                    else:
-                        logger.error(f"Telegram API error: {result}")
-                        if 'description' in result:
-                            logger.error(f"Error description: {result['description']}")
-                    return result
-            except aiohttp.ClientError as e:
-                logger.error(f"Telegram HTTP error: {str(e)}")
-            except Exception as e:
-                logger.error(f"Error sending Telegram message: {str(e)}")
-                logger.error(f"Full error details: {str(e)}", exc_info=True)
+                    status = response.status
+                
+                # Rate limited or Telegram-side error: wait and try again
+                if (status == 429 or status >= 500) and attempt < TELEGRAM_MAX_RETRIES:
+                    retry_after = result.get("parameters", {}).get("retry_after") or 2 ** attempt
+                    telegram_send_retries.inc()
+                    logger.warning(f"Telegram API returned {status}, retrying in {retry_after}s")
+                    await asyncio.sleep(min(retry_after, TELEGRAM_MAX_RETRY_DELAY))
+                    continue
+                break
+            
+            if status == 200 and result.get('ok'):
+                telegram_messages_sent.inc()
+                logger.info("Telegram message sent", extra={"message_id": result.get("result", {}).get("message_id")})
+            else:
+                telegram_send_failures.inc()
+                logger.error(f"Telegram API error: {result}")
+                if 'description' in result:
+                    logger.error(f"Error description: {result['description']}")
+            return result
+        except aiohttp.ClientError as e:
+            telegram_send_failures.inc()
+            logger.error(f"Telegram HTTP error: {str(e)}")
+        except Exception as e:
+            telegram_send_failures.inc()
+            logger.error(f"Error sending Telegram message: {str(e)}")
+            logger.error(f"Full error details: {str(e)}", exc_info=True)
+        finally:
+            telegram_send_duration.observe(time.perf_counter() - started)
 
     async def notify_chore_completion(self, staff_name: str, chore_description: str):
         time = datetime.now(cet_tz).strftime("%H:%M")
         message = f"✅ {staff_name} marked '{chore_description}' as done at {time}"
-        logger.info(f"Notifying chore completion: {message}")
+        logger.debug(f"Notifying chore completion: {message}")
         await self.send_message(message)
 
     async def notify_chore_uncomplete(self, staff_name: str, chore_description: str):
         time = datetime.now(cet_tz).strftime("%H:%M")
         message = f"❌ {staff_name} marked '{chore_description}' as NOT done at {time}"
-        logger.info(f"Notifying chore uncomplete: {message}")
+        logger.debug(f"Notifying chore uncomplete: {message}")
         await self.send_message(message)
 
     async def notify_checklist_completion(self, staff_name: str, checklist_name: str, message: str = None):
@@ -125,7 +189,7 @@ class TelegramNotifier:
                 time = datetime.now(cet_tz).strftime("%H:%M")
                 message = f"✅ {staff_name} completed checklist '{checklist_name}' at {time}"
             
-            logger.info(f"Notifying checklist completion: {message}")
+            logger.debug(f"Notifying checklist completion: {message}")
             result = await self.send_message(message)
             
             if not result or not result.get('ok'):
@@ -137,23 +201,43 @@ class TelegramNotifier:
             logger.error(f"Error in notify_checklist_completion: {str(e)}")
             return False
 
-# Create the Telegram notifier instance
-try:
-    telegram = TelegramNotifier()
-    logger.info("Successfully created Telegram notifier instance")
-except Exception as e:
-    logger.error(f"Failed to initialize Telegram notifier: {str(e)}")
-    # Create a dummy notifier that logs but doesn't send messages
-    class DummyNotifier:
-        async def send_message(self, text: str):
-            logger.warning(f"Would have sent Telegram message (but bot not configured): {text}")
-        async def notify_chore_completion(self, staff_name: str, chore_description: str):
-            logger.warning(f"Would have notified completion: {staff_name} - {chore_description}")
-        async def notify_checklist_completion(self, staff_name: str, checklist_name: str, message: str = None):
-            if message:
-                logger.warning(f"Would have notified checklist completion with message: {message}")
-            else:
-                logger.warning(f"Would have notified checklist completion: {staff_name} - {checklist_name}")
-            return True
-    telegram = DummyNotifier()
-    logger.info("Using dummy notifier due to initialization failure") 
\ No newline at end of file
+class DummyNotifier:
+    """Logs notifications instead of sending them when the bot is not configured."""
+    async def open(self):
+        pass
+    async def close(self):
+        pass
+    async def get_webhook_info(self):
+        return None
+    async def check_connection(self):
+        logger.warning("Telegram bot not configured, skipping connection check")
+    async def send_message(self, text: str):
+        logger.warning(f"Would have sent Telegram message (but bot not configured): {text}")
+    async def notify_chore_completion(self, staff_name: str, chore_description: str):
+        logger.warning(f"Would have notified completion: {staff_name} - {chore_description}")
+    async def notify_checklist_completion(self, staff_name: str, checklist_name: str, message: str = None):
+        if message:
+            logger.warning(f"Would have notified checklist completion with message: {message}")
+        else:
+            logger.warning(f"Would have notified checklist completion: {staff_name} - {checklist_name}")
+        return True
+
+_telegram = None
+
+def get_telegram():
+    """Return the Telegram notifier, creating it on first use.
+    
+    Construction only reads configuration; the network check is
+    ``check_connection``, which the app schedules in the background at startup.
+    """
+    global _telegram
+    if _telegram is None:
+        try:
+            _telegram = TelegramNotifier()
+            logger.info("Successfully created Telegram notifier instance")
+        except Exception as e:
+            logger.error(f"Failed to initialize Telegram notifier: {str(e)}")
+            # Create a dummy notifier that logs but doesn't send messages
+            _telegram = DummyNotifier()
+            logger.info("Using dummy notifier due to initialization failure")
+    return _telegram
@@ -0,0 +1,258 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import datetime
+import io
+import re
+import logging
+from .models import Checklist, Section, Chore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Header of the tabular layout written by export_workbook
+EXPORT_HEADER = ("Section", "Chore", "Order")
+
+# Instruction lines at the top of the printed checklists, not sections
+INSTRUCTION_PREFIXES = ("sign your initials", "one job each")
+WEEKDAYS = {"mon", "tue", "tues", "wed", "thu", "thur", "thurs", "fri", "sat", "sun"}
+# Section headings are short labels ("Beer Garden", "Prep for busy shifts / during shift")
+HEADING_MAX_WORDS = 6
+
+# A checklist structure: [(section name, [chore descriptions in order]), ...]
+ChecklistStructure = List[Tuple[str, List[str]]]
+
+
+def _cell_text(value) -> str:
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def _is_bold(cell) -> Optional[bool]:
+    """Whether a worksheet cell is bold; None for plain values, whose formatting is unknown."""
+    font = getattr(cell, "font", None)
+    return bool(font.b) if font is not None else None
+
+
+def _looks_like_heading(text: str) -> bool:
+    """Headings are a few words; chores read as sentences, often with commas or a full stop."""
+    return len(re.findall(r"\w+", text)) <= HEADING_MAX_WORDS and "," not in text and not text.endswith(".")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def parse_rows(rows) -> Tuple[Optional[str], ChecklistStructure]:
+    """Parse worksheet rows into ``(title, structure)``.
+
+    Two layouts are understood:
+
+    * the tabular layout written by :func:`export_workbook`, with a
+      ``Section | Chore | Order`` header row;
+    * the printed layout of the sheets in ``excel_checklists/``: a title row,
+      then section headings, each followed by its chores. Headings are bold
+      and short; a bold sentence is still a chore, and blank rows do not end
+      a section. Rows starting with "-" continue the chore above. Weekday
+      header rows and instruction lines are skipped.
+
+    ``rows`` are worksheet cells or plain values. Without formatting, a
+    short line right after a blank row is taken as a heading.
+    """
+    title = None
+    structure: ChecklistStructure = []
+    tabular = None
+    current: Optional[List[str]] = None
+    sections_by_name: Dict[str, List[str]] = {}
+    after_blank = True
+
+    for row in rows:
+        row = tuple(row) if row else ()
+        cells = [_cell_text(getattr(v, "value", v)) for v in row]
+        first = cells[0] if cells else ""
+
+        if tabular is None:
+            if not any(cells):
+                continue
+            if [c.lower() for c in cells[:2]] == ["section", "chore"]:
+                tabular = True
+                continue
+            tabular = False
+            title = first
+            continue
+
+        if tabular:
+            if len(cells) < 2 or not cells[1]:
+                continue
+            section_name = first or "Uncategorized"
+            chores = sections_by_name.get(section_name)
+            if chores is None:
+                chores = sections_by_name[section_name] = []
+                structure.append((section_name, chores))
+            chores.append(cells[1])
+            continue
+
+        # Printed layout
+        if not first:
+            after_blank = True
+            continue
+        if first.lower().startswith(INSTRUCTION_PREFIXES):
+            continue
+        if any(c.lower().rstrip(".") in WEEKDAYS for c in cells[1:]):
+            continue
+        if first.startswith("-") and current:
+            current[-1] = f"{current[-1]} {first}"
+            continue
+        bold = _is_bold(row[0])
+        heading = _looks_like_heading(first) and (bold if bold is not None else after_blank)
+        after_blank = False
+        if heading or current is None:
+            current = []
+            structure.append((first, current))
+        else:
+            current.append(first)
+
+    return title, [(name, chores) for name, chores in structure if chores]
+
+
+def parse_workbook(fileobj: BinaryIO) -> Tuple[Optional[str], ChecklistStructure]:
+    """Stream the first worksheet of an .xlsx file into a checklist structure."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        # Cells rather than values: headings are told apart by their bold font
+        return parse_rows(worksheet.iter_rows())
+    finally:
+        workbook.close()
+
+
+def export_workbook(db: Session, checklist: Checklist) -> bytes:
+    """Write a checklist's sections and chores to an .xlsx in the tabular layout."""
+    from openpyxl import Workbook
+
+    sections = (
+        db.query(Section.id, Section.name)
+        .filter(Section.checklist_id == checklist.id)
+        .order_by(Section.order, Section.id)
+        .all()
+    )
+    chores_by_section = defaultdict(list)
+    for section_id, description in (
+        db.query(Chore.section_id, Chore.description)
+        .filter(Chore.checklist_id == checklist.id, Chore.archived_at.is_(None))
+        .order_by(Chore.order, Chore.id)
+    ):
+        chores_by_section[section_id].append(description)
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=(checklist.name or "Checklist")[:31])
+    worksheet.append(EXPORT_HEADER)
+    for section_id, section_name in sections:
+        for order, description in enumerate(chores_by_section[section_id], start=1):
+            worksheet.append((section_name, description, order))
+
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def apply_checklist_structure(
+    db: Session,
+    checklist: Checklist,
+    structure: ChecklistStructure,
+    remove_missing: bool = True
+) -> Dict[str, int]:
+    """Sync a checklist's sections and chores with ``structure`` using bulk statements.
+
+    Existing chores are matched on (section name, description), so unchanged
+    chores keep their ids and completion history. Only order changes are
+    written for them. New sections and chores are bulk inserted. Chores no
+    longer present are archived unless ``remove_missing`` is False: they
+    leave the checklist but keep their completion history. Nothing is
+    committed; the caller owns the transaction.
+    """
+    stats = {"sections_added": 0, "chores_added": 0, "chores_updated": 0, "chores_removed": 0, "chores_unchanged": 0}
+
+    existing_sections = {
+        _normalize(name or ""): (section_id, order)
+        for section_id, name, order in db.query(Section.id, Section.name, Section.order)
+        .filter(Section.checklist_id == checklist.id)
+    }
+
+    # Sections: reorder existing ones, bulk insert the new ones
+    section_ids: Dict[str, int] = {}
+    section_updates = []
+    new_sections = []
+    for position, (name, _) in enumerate(structure, start=1):
+        key = _normalize(name)
+        if key in existing_sections:
+            section_id, order = existing_sections[key]
+            section_ids[key] = section_id
+            if order != position:
+                section_updates.append({"id": section_id, "order": position})
+        elif key not in section_ids:
+            new_sections.append({"checklist_id": checklist.id, "name": name, "order": position})
+            section_ids[key] = None
+    if section_updates:
+        db.execute(update(Section), section_updates)
+    if new_sections:
+        result = db.execute(
+            insert(Section).returning(Section.id, Section.name, sort_by_parameter_order=True),
+            new_sections
+        )
+        for section_id, name in result:
+            section_ids[_normalize(name)] = section_id
+        stats["sections_added"] = len(new_sections)
+
+    # Chores: match on (section, description); duplicates are matched in order
+    existing_chores = defaultdict(list)
+    for chore_id, section_id, description, order in (
+        db.query(Chore.id, Chore.section_id, Chore.description, Chore.order)
+        .filter(Chore.checklist_id == checklist.id, Chore.archived_at.is_(None))
+        .order_by(Chore.order, Chore.id)
+    ):
+        existing_chores[(section_id, _normalize(description or ""))].append((chore_id, order))
+
+    chore_updates = []
+    new_chores = []
+    for name, descriptions in structure:
+        section_id = section_ids[_normalize(name)]
+        for position, description in enumerate(descriptions, start=1):
+            matches = existing_chores.get((section_id, _normalize(description)))
+            if matches:
+                chore_id, order = matches.pop(0)
+                if order != position:
+                    chore_updates.append({"id": chore_id, "order": position})
+                else:
+                    stats["chores_unchanged"] += 1
+            else:
+                new_chores.append({
+                    "checklist_id": checklist.id,
+                    "section_id": section_id,
+                    "description": description,
+                    "order": position,
+                    "completed": False
+                })
+
+    removed_ids = [chore_id for matches in existing_chores.values() for chore_id, _ in matches] if remove_missing else []
+
+    if chore_updates:
+        db.execute(update(Chore), chore_updates)
+        stats["chores_updated"] = len(chore_updates)
+    if new_chores:
+        db.execute(insert(Chore), new_chores)
+        stats["chores_added"] = len(new_chores)
+    if removed_ids:
+        # No due time either, so no reminder is sent for them
+        db.execute(
+            update(Chore)
+            .where(Chore.id.in_(removed_ids))
+            .values(archived_at=datetime.utcnow(), due_time=None)
+            .execution_options(synchronize_session=False)
+        )
+        stats["chores_removed"] = len(removed_ids)
+
+    logger.info(f"Applied structure to checklist {checklist.name}: {stats}")
+    return stats
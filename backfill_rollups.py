@@ -0,0 +1,91 @@
+from app.models import Chore, ChoreCompletion, DailyRollup, Signature, WeeklyRollup
+from app.database import Base, engine, SessionLocal
+from app.rollups import shift_day, week_of
+from app.logging_config import configure_logging
+from sqlalchemy import delete, insert, select, text
+from collections import defaultdict
+from dotenv import load_dotenv
+import argparse
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def backfill_rollups(batch_size: int = 5000):
+    """Rebuild the daily and weekly rollups from chore_completions and signatures.
+
+    History is streamed in batches of ``batch_size`` rows (a server-side
+    cursor on PostgreSQL), so memory holds the counters, one entry per
+    checklist and day, rather than the rows. The rebuild runs in a single
+    transaction. On PostgreSQL the rollup tables are locked first, so
+    ticks made meanwhile wait and are then added on top of the rebuilt
+    counts instead of being lost. /api/chore_completion keeps one history
+    row per chore and person, so its repeated ticks count once here.
+    """
+    load_dotenv()
+    Base.metadata.create_all(bind=engine, tables=[DailyRollup.__table__, WeeklyRollup.__table__])
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("LOCK TABLE checklist_daily_rollups, checklist_weekly_rollups IN EXCLUSIVE MODE"))
+        db.execute(delete(DailyRollup))
+        db.execute(delete(WeeklyRollup))
+
+        days = defaultdict(lambda: {"ticks": 0, "unticks": 0, "submissions": 0})
+        rows = 0
+
+        # Timestamps are stored as naive UTC, which shift_day expects
+        completions = db.execute(
+            select(Chore.checklist_id, ChoreCompletion.completed, ChoreCompletion.completed_at)
+            .join(Chore, Chore.id == ChoreCompletion.chore_id)
+            .where(ChoreCompletion.completed_at.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        for batch in completions.partitions():
+            for checklist_id, completed, completed_at in batch:
+                counts = days[checklist_id, shift_day(completed_at)]
+                counts["ticks" if completed else "unticks"] += 1
+            rows += len(batch)
+            logger.info(f"Read {rows} rows so far")
+
+        signatures = db.execute(
+            select(Signature.checklist_id, Signature.completed_at)
+            .where(Signature.completed_at.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        for batch in signatures.partitions():
+            for checklist_id, completed_at in batch:
+                days[checklist_id, shift_day(completed_at)]["submissions"] += 1
+            rows += len(batch)
+            logger.info(f"Read {rows} rows so far")
+
+        weeks = defaultdict(lambda: {"ticks": 0, "unticks": 0, "submissions": 0, "days_submitted": 0})
+        for (checklist_id, day), counts in days.items():
+            week = weeks[checklist_id, week_of(day)]
+            for name, value in counts.items():
+                week[name] += value
+            week["days_submitted"] += int(counts["submissions"] > 0)
+
+        daily = [{"checklist_id": checklist_id, "day": day, **counts} for (checklist_id, day), counts in days.items()]
+        weekly = [{"checklist_id": checklist_id, "week": week, **counts} for (checklist_id, week), counts in weeks.items()]
+        for start in range(0, len(daily), batch_size):
+            db.execute(insert(DailyRollup), daily[start:start + batch_size])
+        for start in range(0, len(weekly), batch_size):
+            db.execute(insert(WeeklyRollup), weekly[start:start + batch_size])
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error backfilling rollups: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    logger.info(f"Rollup backfill finished: {rows} rows -> {len(daily)} daily and {len(weekly)} weekly rollups")
+    return len(daily), len(weekly)
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Rebuild the daily and weekly checklist rollups from history")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    backfill_rollups(batch_size=args.batch_size)
@@ -0,0 +1,202 @@
+// Patch cost of the keyed checklist view (static/js/reconcile.js).
+//
+// Runs in node against a small fake DOM that counts structural writes, so it
+// needs no browser. Compares rebuilding every node (what loadChecklist did
+// with innerHTML = '') against keyed patching when nothing, 1% or 10% of the
+// chores changed, a section was reordered, or one WebSocket update arrived.
+//
+//     node benchmarks/bench_dom_patch.js --chores 1000 --iterations 200
+//     node benchmarks/bench_dom_patch.js --json results/dom_patch.json
+
+const fs = require('fs');
+const path = require('path');
+
+let domWrites = 0;
+
+class FakeClassList {
+    constructor() { this.names = new Set(); }
+    add(name) { if (!this.names.has(name)) { this.names.add(name); domWrites++; } }
+    remove(name) { if (this.names.delete(name)) domWrites++; }
+    contains(name) { return this.names.has(name); }
+    toggle(name, force) {
+        const on = force === undefined ? !this.names.has(name) : force;
+        if (on) this.add(name); else this.remove(name);
+        return on;
+    }
+}
+
+// Children are a doubly linked list so firstChild/nextSibling/insertBefore are O(1), as in a browser
+class FakeElement {
+    constructor(tagName) {
+        this.tagName = tagName.toUpperCase();
+        this.parentNode = null;
+        this.firstChild = null;
+        this.lastChild = null;
+        this.nextSibling = null;
+        this.previousSibling = null;
+        this.classList = new FakeClassList();
+        this.dataset = {};
+        this.listeners = {};
+        this._text = '';
+    }
+    get className() { return [...this.classList.names].join(' '); }
+    set className(value) {
+        this.classList.names = new Set(value.split(/\s+/).filter(Boolean));
+        domWrites++;
+    }
+    get textContent() { return this._text; }
+    set textContent(value) {
+        while (this.firstChild) this.firstChild.remove();
+        this._text = String(value);
+        domWrites++;
+    }
+    addEventListener(type, listener) {
+        (this.listeners[type] = this.listeners[type] || []).push(listener);
+    }
+    _unlink() {
+        const parent = this.parentNode;
+        if (!parent) return;
+        if (this.previousSibling) this.previousSibling.nextSibling = this.nextSibling; else parent.firstChild = this.nextSibling;
+        if (this.nextSibling) this.nextSibling.previousSibling = this.previousSibling; else parent.lastChild = this.previousSibling;
+        this.parentNode = this.nextSibling = this.previousSibling = null;
+    }
+    insertBefore(node, reference) {
+        if (reference === null || reference === undefined) return this.appendChild(node);
+        node._unlink();
+        node.parentNode = this;
+        node.nextSibling = reference;
+        node.previousSibling = reference.previousSibling;
+        if (reference.previousSibling) reference.previousSibling.nextSibling = node; else this.firstChild = node;
+        reference.previousSibling = node;
+        domWrites++;
+        return node;
+    }
+    appendChild(node) {
+        node._unlink();
+        node.parentNode = this;
+        node.previousSibling = this.lastChild;
+        if (this.lastChild) this.lastChild.nextSibling = node; else this.firstChild = node;
+        this.lastChild = node;
+        domWrites++;
+        return node;
+    }
+    remove() {
+        if (this.parentNode) {
+            this._unlink();
+            domWrites++;
+        }
+    }
+}
+
+global.document = { createElement: (tag) => new FakeElement(tag) };
+const { createChecklistView } = require(path.join(__dirname, '..', 'static', 'js', 'reconcile.js'));
+
+function parseArgs() {
+    const args = { chores: 1000, sections: 20, iterations: 200, json: null };
+    const argv = process.argv.slice(2);
+    for (let i = 0; i < argv.length; i++) {
+        const key = argv[i].replace(/^--/, '');
+        if (!(key in args)) throw new Error(`Unknown option ${argv[i]}`);
+        args[key] = key === 'json' ? argv[++i] : parseInt(argv[++i], 10);
+    }
+    return args;
+}
+
+function makeChores(count, sectionCount) {
+    const perSection = Math.ceil(count / sectionCount);
+    return Array.from({ length: count }, (_, i) => ({
+        id: i + 1,
+        description: `Chore ${i + 1}: wipe down surface ${i % 37}`,
+        order: i % perSection,
+        section: `Section ${Math.floor(i / perSection) + 1}`,
+        section_id: Math.floor(i / perSection) + 1,
+        completed: i % 3 === 0,
+        completed_by: i % 3 === 0 ? 'Sam' : null,
+        completed_at: i % 3 === 0 ? '2024-05-01T09:00:00' : null,
+        comment: null
+    }));
+}
+
+// A fresh copy of `base` with `fraction` of the chores flipped
+function withChanges(base, fraction, round) {
+    const step = Math.max(1, Math.round(1 / fraction));
+    return base.map((chore, i) => {
+        if (fraction === 0 || (i + round) % step !== 0) return { ...chore };
+        const completed = !chore.completed;
+        return { ...chore, completed, completed_by: completed ? 'Alex' : null };
+    });
+}
+
+function reverseSection(base, sectionName) {
+    return base.map(chore => chore.section === sectionName
+        ? { ...chore, order: -chore.order }
+        : { ...chore });
+}
+
+function median(values) {
+    const sorted = [...values].sort((a, b) => a - b);
+    return sorted[Math.floor(sorted.length / 2)];
+}
+
+function measure(iterations, setup, run) {
+    const times = [];
+    const writes = [];
+    for (let i = 0; i < iterations; i++) {
+        const state = setup(i);
+        domWrites = 0;
+        const start = process.hrtime.bigint();
+        run(state, i);
+        times.push(Number(process.hrtime.bigint() - start) / 1000);
+        writes.push(domWrites);
+    }
+    return { median_us: median(times), dom_writes: median(writes) };
+}
+
+function main() {
+    const args = parseArgs();
+    const base = makeChores(args.chores, args.sections);
+    const mountedView = () => {
+        const view = createChecklistView(new FakeElement('div'));
+        view.render(base);
+        return view;
+    };
+
+    const results = {
+        full_rebuild: measure(args.iterations,
+            () => createChecklistView(new FakeElement('div')),
+            (view) => view.render(base)),
+        patch_unchanged: measure(args.iterations,
+            () => ({ view: mountedView(), next: withChanges(base, 0, 0) }),
+            ({ view, next }) => view.render(next)),
+        patch_1pct: measure(args.iterations,
+            (i) => ({ view: mountedView(), next: withChanges(base, 0.01, i) }),
+            ({ view, next }) => view.render(next)),
+        patch_10pct: measure(args.iterations,
+            (i) => ({ view: mountedView(), next: withChanges(base, 0.1, i) }),
+            ({ view, next }) => view.render(next)),
+        reorder_one_section: measure(args.iterations,
+            () => ({ view: mountedView(), next: reverseSection(base, 'Section 1') }),
+            ({ view, next }) => view.render(next)),
+        websocket_update: measure(args.iterations,
+            () => mountedView(),
+            (view, i) => {
+                const chore = base[(i * 7) % base.length];
+                view.patchChore({ ...chore, completed: !chore.completed, completed_by: 'Alex' });
+                view.flush();
+            }),
+    };
+
+    console.log(`${args.chores} chores in ${args.sections} sections, ${args.iterations} iterations (median)\n`);
+    console.log(`${'scenario'.padEnd(22)} ${'time'.padStart(12)} ${'DOM writes'.padStart(12)}`);
+    Object.entries(results).forEach(([name, result]) => {
+        console.log(`${name.padEnd(22)} ${(result.median_us.toFixed(0) + ' us').padStart(12)} ${String(result.dom_writes).padStart(12)}`);
+    });
+
+    if (args.json) {
+        fs.mkdirSync(path.dirname(path.resolve(args.json)), { recursive: true });
+        fs.writeFileSync(args.json, JSON.stringify({ args, results }, null, 2));
+        console.log(`\nWrote ${args.json}`);
+    }
+}
+
+main();
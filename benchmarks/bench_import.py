@@ -0,0 +1,122 @@
+"""Import-time and cold-start benchmark.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters and
+reports the cumulative import cost of ``app.main`` plus the slowest
+top-level imports. With ``--serve`` it also starts uvicorn and measures the
+time until ``/up`` answers, which is what Railway's health check waits for.
+
+    python benchmarks/bench_import.py --runs 5 --top 15
+    python benchmarks/bench_import.py --serve --json results/import.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import tempfile
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def bench_env():
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_import(env):
+    """Return (cumulative microseconds for app.main, {top-level module: cumulative us})."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    total = None
+    top_level = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == "app.main":
+            total = cumulative
+        elif indent <= 3:  # imported directly by app.main (or its siblings)
+            top_level[name] = max(top_level.get(name, 0), cumulative)
+    return total, top_level
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_cold_start(env, timeout=60.0):
+    """Seconds from spawning uvicorn until /up returns 200."""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/up", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("/up did not answer in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--serve", action="store_true", help="Also measure uvicorn start to first /up")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    env = bench_env()
+    totals = []
+    modules = {}
+    for _ in range(args.runs):
+        total, top_level = measure_import(env)
+        totals.append(total / 1000)
+        for name, us in top_level.items():
+            modules.setdefault(name, []).append(us / 1000)
+
+    results = {
+        "import_ms": {"median": statistics.median(totals), "min": min(totals)},
+        "slowest_imports_ms": dict(sorted(
+            ((name, statistics.median(times)) for name, times in modules.items()),
+            key=lambda item: item[1], reverse=True
+        )[:args.top]),
+    }
+    print(f"import app.main: median {results['import_ms']['median']:.0f} ms, min {results['import_ms']['min']:.0f} ms")
+    for name, ms in results["slowest_imports_ms"].items():
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if args.serve:
+        starts = [measure_cold_start(env) for _ in range(args.runs)]
+        results["cold_start_to_up_ms"] = {"median": statistics.median(starts) * 1000, "min": min(starts) * 1000}
+        print(f"uvicorn start to /up: median {results['cold_start_to_up_ms']['median']:.0f} ms")
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
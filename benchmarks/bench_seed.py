@@ -0,0 +1,102 @@
+"""Timing harness for database seeding.
+
+Compares three paths against the same seed definition:
+
+* ``legacy``: the old seed_database, ORM ``add_all`` with a commit after
+  every block of sections and chores;
+* ``bulk``: the current seed_database, one INSERT per table in one
+  transaction;
+* ``skip``: seed_if_needed on an already seeded database, which is what
+  every boot pays when the seed file is unchanged.
+
+    python benchmarks/bench_seed.py --runs 5
+    DATABASE_URL=postgresql://... python benchmarks/bench_seed.py
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+
+def legacy_seed(db, seed):
+    """The pre-bulk seeding strategy, replayed from the same seed definition."""
+    from app.models import Checklist, Section, Chore, ChoreCompletion, Signature, Staff
+
+    db.query(ChoreCompletion).delete()
+    db.query(Chore).delete()
+    db.query(Section).delete()
+    db.query(Signature).delete()
+    db.query(Checklist).delete()
+    db.query(Staff).delete()
+    db.commit()
+
+    checklists = [Checklist(name=c["name"], description=c.get("description")) for c in seed["checklists"]]
+    db.add_all(checklists)
+    db.commit()
+
+    for checklist, c in zip(checklists, seed["checklists"]):
+        sections = [
+            Section(checklist_id=checklist.id, name=s["name"], order=order)
+            for order, s in enumerate(c["sections"], start=1)
+        ]
+        db.add_all(sections)
+        db.commit()
+
+    for checklist, c in zip(checklists, seed["checklists"]):
+        sections = db.query(Section).filter(Section.checklist_id == checklist.id).order_by(Section.order).all()
+        chores = [
+            Chore(checklist_id=checklist.id, section_id=section.id, description=description, order=order)
+            for section, s in zip(sections, c["sections"])
+            for order, description in enumerate(s["chores"], start=1)
+        ]
+        db.add_all(chores)
+        db.commit()
+
+    db.add_all([Staff(name=name) for name in seed.get("staff", [])])
+    db.commit()
+
+
+def time_runs(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.database import engine, Base, SessionLocal
+    from app.seed_data import load_seed, seed_database, seed_if_needed
+    from app import models  # noqa: F401  register tables
+    Base.metadata.create_all(bind=engine)
+
+    seed, content_hash = load_seed()
+    db = SessionLocal()
+    try:
+        results = {
+            "legacy": time_runs(lambda: legacy_seed(db, seed), args.runs),
+            "bulk": time_runs(lambda: seed_database(db, seed, content_hash), args.runs),
+            "skip": time_runs(lambda: seed_if_needed(db), args.runs),
+        }
+    finally:
+        db.close()
+
+    print(f"Seeding {len(seed['checklists'])} checklists on {engine.dialect.name} ({args.runs} runs)")
+    for name, times in results.items():
+        print(f"  {name:>6}: median {statistics.median(times):8.2f} ms  min {min(times):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Micro-benchmark for the checklist chores payload.
+
+Compares the old serialization path of ``get_checklist_chores`` (linear
+section lookup per chore, ``isoformat`` per row, FastAPI's
+``jsonable_encoder`` + ``json.dumps``) with ``app.serializers``.
+
+    python benchmarks/bench_serialization.py --chores 5000 --sections 50
+"""
+import os
+import sys
+import json
+import argparse
+import timeit
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from app.serializers import serialize_checklist_chores, dumps
+
+SectionRow = namedtuple("SectionRow", "id name order")
+ChoreRow = namedtuple("ChoreRow", "id description order section_id completed completed_by completed_at version")
+
+
+def make_checklist(n_chores: int, n_sections: int):
+    sections = [SectionRow(i, f"Section {i}", i) for i in range(1, n_sections + 1)]
+    start = datetime(2024, 1, 1, 9, 0, 0, 123456)
+    chores = [
+        ChoreRow(
+            id=i,
+            description=f"Chore number {i} with a realistic description",
+            order=i % 40,
+            section_id=(i % n_sections) + 1,
+            completed=i % 3 == 0,
+            completed_by="Nora" if i % 3 == 0 else None,
+            completed_at=start + timedelta(seconds=i) if i % 3 == 0 else None,
+            version=1,
+        )
+        for i in range(1, n_chores + 1)
+    ]
+    return sections, chores
+
+
+def old_path(sections, chores) -> bytes:
+    chore_list = []
+    for chore in chores:
+        section = next(s for s in sections if s.id == chore.section_id)
+        chore_list.append({
+            "id": chore.id,
+            "description": chore.description,
+            "order": chore.order,
+            "section": section.name,
+            "section_id": section.id,
+            "completed": chore.completed,
+            "completed_by": chore.completed_by,
+            "completed_at": chore.completed_at.isoformat() if chore.completed_at else None,
+            "version": chore.version,
+            "comment": None
+        })
+    # What FastAPI does with a returned list: jsonable_encoder, then JSONResponse.render
+    return json.dumps(
+        jsonable_encoder(chore_list),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def new_path(sections, chores) -> bytes:
+    return dumps(serialize_checklist_chores(sections, chores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chores", type=int, default=5000)
+    parser.add_argument("--sections", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=10)
+    args = parser.parse_args()
+
+    sections, chores = make_checklist(args.chores, args.sections)
+
+    # Both paths must produce the same document
+    assert json.loads(old_path(sections, chores)) == json.loads(new_path(sections, chores))
+
+    results = {}
+    for name, fn in (("old", old_path), ("new", new_path)):
+        times = timeit.repeat(lambda: fn(sections, chores), repeat=args.repeat, number=args.number)
+        results[name] = min(times) / args.number * 1000
+
+    print(f"{args.chores} chores in {args.sections} sections (best of {args.repeat})")
+    for name, ms in results.items():
+        print(f"  {name}: {ms:8.2f} ms per payload")
+    print(f"  speedup: {results['old'] / results['new']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
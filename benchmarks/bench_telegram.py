@@ -0,0 +1,152 @@
+"""Per-message latency of Telegram notifications against a local stub.
+
+Starts a Bot API stand-in on localhost (over HTTPS with a throwaway
+self-signed certificate when ``--tls`` is given and openssl is available)
+and sends the same messages two ways:
+
+* per-message sessions: a new ``aiohttp.ClientSession`` for every message,
+  so each one pays for TCP (and TLS) setup, as the notifier used to;
+* ``TelegramNotifier``: the shared, kept-alive session the app uses.
+
+Reports mean/p50/p95 latency per message and how many connections the stub
+accepted for each.
+
+    python benchmarks/bench_telegram.py --messages 200 --tls
+    python benchmarks/bench_telegram.py --messages 200 --delay-ms 20
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_certificate(directory: str):
+    """Self-signed certificate for 127.0.0.1; returns (cert, key) paths or None without openssl."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    try:
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+             "-keyout", key, "-out", cert],
+            check=True, capture_output=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return cert, key
+
+
+async def start_stub(port: int, delay: float, certificate=None):
+    """A Bot API stand-in that accepts every message and counts connections."""
+    import ssl
+    from aiohttp import web
+
+    stats = {"messages": 0, "connections": set()}
+
+    async def send_message(request):
+        stats["messages"] += 1
+        stats["connections"].add(request.transport.get_extra_info("peername"))
+        if delay:
+            await asyncio.sleep(delay)
+        return web.json_response({"ok": True, "result": {"message_id": stats["messages"]}})
+
+    async def get_me(request):
+        return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "username": "bench_bot"}})
+
+    stub = web.Application()
+    stub.router.add_post("/bot{token}/sendMessage", send_message)
+    stub.router.add_get("/bot{token}/getMe", get_me)
+    runner = web.AppRunner(stub, access_log=None)
+    await runner.setup()
+    ssl_context = None
+    if certificate:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(*certificate)
+    await web.TCPSite(runner, "127.0.0.1", port, ssl_context=ssl_context).start()
+    return runner, stats
+
+
+def summarize(label: str, latencies, connections: int):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label:<26} mean {statistics.mean(latencies) * 1000:7.2f} ms   "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms   "
+          f"connections {connections}")
+
+
+async def per_message_sessions(url: str, messages: int):
+    import aiohttp
+
+    latencies = []
+    for i in range(messages):
+        started = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json={"chat_id": "-1", "text": f"Message {i}"}) as response:
+                await response.json()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def shared_session(notifier, messages: int):
+    latencies = []
+    for i in range(messages):
+        started = time.perf_counter()
+        await notifier.send_message(f"Message {i}")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main(args):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = make_certificate(directory) if args.tls else None
+        if args.tls and not certificate:
+            print("openssl not available, running over plain HTTP")
+        scheme = "https" if certificate else "http"
+        if certificate:
+            # Both clients verify against the default store; point it at the stub's certificate
+            os.environ["SSL_CERT_FILE"] = certificate[0]
+
+        os.environ["TELEGRAM_API_BASE"] = f"{scheme}://127.0.0.1:{port}"
+        os.environ.setdefault("TELEGRAM_BOT_TOKEN", "bench-token")
+        os.environ.setdefault("TELEGRAM_CHAT_ID", "1")
+        from app.telegram import TelegramNotifier
+
+        runner, stats = await start_stub(port, args.delay_ms / 1000, certificate)
+        try:
+            notifier = TelegramNotifier()
+            print(f"{args.messages} messages to a local stub over {scheme.upper()}, "
+                  f"{args.delay_ms} ms server delay\n")
+
+            latencies = await per_message_sessions(notifier.send_message_url, args.messages)
+            summarize("per-message sessions", latencies, len(stats["connections"]))
+
+            stats["connections"].clear()
+            await notifier.open()
+            try:
+                latencies = await shared_session(notifier, args.messages)
+            finally:
+                await notifier.close()
+            summarize("shared session", latencies, len(stats["connections"]))
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telegram notification latency against a local stub")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=0, help="Artificial server-side delay per message")
+    parser.add_argument("--tls", action="store_true", help="Serve the stub over HTTPS with a self-signed certificate")
+    asyncio.run(main(parser.parse_args()))
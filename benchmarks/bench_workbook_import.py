@@ -0,0 +1,81 @@
+"""Timing harness for the admin workbook import.
+
+Builds a synthetic workbook, then imports it twice into a scratch database:
+once into an empty checklist (all inserts) and once more unchanged (pure
+diff, nothing written).
+
+    python benchmarks/bench_workbook_import.py --rows 5000
+    DATABASE_URL=postgresql://... python benchmarks/bench_workbook_import.py
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+
+def build_workbook(rows: int, sections: int) -> bytes:
+    from openpyxl import Workbook
+    from app.workbooks import EXPORT_HEADER
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("bench")
+    worksheet.append(EXPORT_HEADER)
+    per_section = max(rows // sections, 1)
+    for i in range(rows):
+        worksheet.append((f"Section {i // per_section}", f"Synthetic chore {i}", i % per_section + 1))
+    out = io.BytesIO()
+    workbook.save(out)
+    return out.getvalue()
+
+
+def timed_import(content: bytes, name: str):
+    from app.database import SessionLocal
+    from app.models import Checklist
+    from app.workbooks import parse_workbook, apply_checklist_structure
+
+    start = time.perf_counter()
+    _, structure = parse_workbook(io.BytesIO(content))
+    parsed = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        checklist = db.query(Checklist).filter(Checklist.name == name).first()
+        if not checklist:
+            checklist = Checklist(name=name)
+            db.add(checklist)
+            db.flush()
+        stats = apply_checklist_structure(db, checklist, structure)
+        db.commit()
+    finally:
+        db.close()
+    done = time.perf_counter()
+    return parsed - start, done - parsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--sections", type=int, default=50)
+    args = parser.parse_args()
+
+    from app.database import engine, Base
+    from app import models  # noqa: F401  register tables
+    Base.metadata.create_all(bind=engine)
+
+    content = build_workbook(args.rows, args.sections)
+    name = f"bench_{int(time.time())}"
+    for label in ("initial import", "unchanged re-import"):
+        parse_s, apply_s, stats = timed_import(content, name)
+        print(f"{label}: parse {parse_s * 1000:.0f} ms, apply {apply_s * 1000:.0f} ms, "
+              f"total {(parse_s + apply_s) * 1000:.0f} ms  {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""End-to-end load test for the checklist API.
+
+Starts the app with serve.py, the production server, against a scratch
+database (SQLite by default, or whatever DATABASE_URL / --database-url
+points at), seeds synthetic checklists, and drives a shift's worth of
+traffic:
+
+* pollers: tablets re-fetching ``/api/checklists/{name}/chores``;
+* writers: bursts of ``toggle`` and ``complete_section`` calls;
+* submitters: completing every section of a checklist, then submitting it;
+* listeners: WebSocket clients on ``/ws/checklist``.
+
+Every simulated tablet sends its own ``X-Client-Id``, as the frontend does,
+so each one gets its own rate-limit bucket instead of all of them sharing
+the one for 127.0.0.1. Requests the limiter still rejects (429) are counted
+per endpoint and left out of the latency figures.
+
+Telegram is replaced by a local stub (via TELEGRAM_API_BASE). Submissions
+do not ask for a PDF, so Dropbox is never called. Client-side latency is
+reported per endpoint together with the server's SQL statement counts from
+``/metrics``; results are written as JSON and can be compared with an
+earlier run.
+
+    python benchmarks/load_test.py --duration 30 --pollers 40 --writers 8
+    python benchmarks/load_test.py --out results/after.json --compare results/before.json
+    python benchmarks/load_test.py --database-url postgresql://localhost/checklist_bench
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRIC_LINE = re.compile(r'^(\w+)\{(.*)\} ([0-9.e+-]+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# --- Setup -------------------------------------------------------------------
+
+def seed_synthetic(checklists: int, sections: int, chores: int):
+    """Seed the default data plus synthetic checklists; return what the workload needs."""
+    from app.database import engine, Base, SessionLocal
+    from app.models import Checklist, Section, Chore
+    from app.seed_data import seed_if_needed
+    from app.workbooks import apply_checklist_structure
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        seed_if_needed(db)
+        for i in range(checklists):
+            name = f"Load {i + 1:03d}"
+            checklist = db.query(Checklist).filter(Checklist.name == name).first()
+            if not checklist:
+                checklist = Checklist(name=name, description="Synthetic load-test checklist")
+                db.add(checklist)
+                db.flush()
+            structure = [
+                (f"Section {s + 1}", [f"Chore {s + 1}.{c + 1}" for c in range(chores)])
+                for s in range(sections)
+            ]
+            apply_checklist_structure(db, checklist, structure)
+        db.commit()
+
+        targets = {}
+        for checklist_id, name in db.query(Checklist.id, Checklist.name).filter(Checklist.name.like("Load %")):
+            section_ids = [s for (s,) in db.query(Section.id).filter(Section.checklist_id == checklist_id)]
+            chore_ids = [c for (c,) in db.query(Chore.id).filter(Chore.checklist_id == checklist_id)]
+            targets[name] = {"sections": section_ids, "chores": chore_ids}
+        return targets, engine.dialect.name
+    finally:
+        db.close()
+        engine.dispose()
+
+
+async def start_telegram_stub(port: int):
+    """A Telegram Bot API stand-in that accepts every message."""
+    from aiohttp import web
+
+    sent = {"count": 0}
+
+    async def get_me(request):
+        return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "username": "bench_bot"}})
+
+    async def send_message(request):
+        sent["count"] += 1
+        return web.json_response({"ok": True, "result": {"message_id": sent["count"]}})
+
+    stub = web.Application()
+    stub.router.add_get("/bot{token}/getMe", get_me)
+    stub.router.add_post("/bot{token}/sendMessage", send_message)
+    runner = web.AppRunner(stub, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, sent
+
+
+def start_server(env: dict, port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=ROOT, env=env
+    )
+
+
+async def wait_until_up(session, base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/up") as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError("Server did not come up")
+
+
+# --- Workload ----------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.rate_limited = defaultdict(int)
+
+    async def call(self, session, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                await response.read()
+                status = response.status
+        except Exception as e:
+            status = type(e).__name__
+        self.statuses[endpoint][str(status)] += 1
+        # Rejected by the rate limiter before doing any work; timing them would skew the latencies
+        if status == 429:
+            self.rate_limited[endpoint] += 1
+        else:
+            self.latencies[endpoint].append(time.perf_counter() - start)
+
+
+def device(name: str) -> dict:
+    """Headers identifying one simulated tablet, like the frontend's X-Client-Id."""
+    return {"X-Client-Id": name}
+
+
+async def poller(session, rec, base_url, names, interval, stop, headers):
+    name = random.choice(names)
+    while not stop.is_set():
+        await rec.call(session, "/api/checklists/{checklist_name}/chores", "GET", f"{base_url}/api/checklists/{name}/chores",
+                       headers=headers)
+        await asyncio.sleep(random.uniform(0.5, 1.5) * interval)
+
+
+async def writer(session, rec, base_url, targets, burst, pause, stop, headers):
+    names = list(targets)
+    while not stop.is_set():
+        target = targets[random.choice(names)]
+        for _ in range(random.randint(1, burst)):
+            if random.random() < 0.85:
+                chore_id = random.choice(target["chores"])
+                await rec.call(session, "/api/chores/{chore_id}/toggle", "POST", f"{base_url}/api/chores/{chore_id}/toggle",
+                               json={"completed": random.random() < 0.7, "staff_name": "Bench"}, headers=headers)
+            else:
+                section_id = random.choice(target["sections"])
+                await rec.call(session, "/api/sections/{section_id}/complete", "POST", f"{base_url}/api/sections/{section_id}/complete",
+                               json={"staff_name": "Bench"}, headers=headers)
+        await asyncio.sleep(random.expovariate(1 / pause))
+
+
+async def submitter(session, rec, base_url, targets, interval, stop, headers):
+    names = list(targets)
+    while not stop.is_set():
+        await asyncio.sleep(random.uniform(0.5, 1.5) * interval)
+        name = random.choice(names)
+        for section_id in targets[name]["sections"]:
+            await rec.call(session, "/api/sections/{section_id}/complete", "POST", f"{base_url}/api/sections/{section_id}/complete",
+                           json={"staff_name": "Closer"}, headers=headers)
+        await rec.call(session, "/api/submit_checklist", "POST", f"{base_url}/api/submit_checklist",
+                       json={"checklist_id": name, "staff_name": "Closer"}, headers=headers)
+
+
+async def listener(session, base_url, received, stop):
+    try:
+        async with session.ws_connect(f"{base_url.replace('http', 'ws', 1)}/ws/checklist") as ws:
+            while not stop.is_set():
+                try:
+                    message = await ws.receive(timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                if message.type.name != "TEXT":
+                    break
+                received["count"] += 1
+    except Exception as e:
+        received["errors"] += 1
+        received["last_error"] = str(e)
+
+
+def parse_metrics(text: str):
+    """Per-route totals for http_requests_total and db_queries_total."""
+    requests_by_route = defaultdict(float)
+    queries_by_route = defaultdict(float)
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.group(1), dict(LABEL.findall(match.group(2))), float(match.group(3))
+        if name == "http_requests_total":
+            requests_by_route[labels["route"]] += value
+        elif name == "db_queries_total":
+            queries_by_route[labels["route"]] += value
+    return requests_by_route, queries_by_route
+
+
+async def run(args, targets, dialect):
+    import aiohttp
+
+    telegram_port, app_port = free_port(), free_port()
+    stub_runner, sent = await start_telegram_stub(telegram_port)
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": args.database_url,
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "TELEGRAM_CHAT_ID": "1",
+        "TELEGRAM_API_BASE": f"http://127.0.0.1:{telegram_port}",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": "",
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    server = start_server(env, app_port, args.workers)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    rec = Recorder()
+    received = {"count": 0, "errors": 0}
+    connector = aiohttp.TCPConnector(limit=0)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_until_up(session, base_url)
+            metrics_before = parse_metrics(await (await session.get(f"{base_url}/metrics")).text())
+
+            stop = asyncio.Event()
+            names = list(targets)
+            tasks = [asyncio.create_task(listener(session, base_url, received, stop)) for _ in range(args.listeners)]
+            tasks += [asyncio.create_task(poller(session, rec, base_url, names, args.poll_interval, stop, device(f"bench-poller-{i}")))
+                      for i in range(args.pollers)]
+            tasks += [asyncio.create_task(writer(session, rec, base_url, targets, args.burst, args.write_pause, stop,
+                                                 device(f"bench-writer-{i}")))
+                      for i in range(args.writers)]
+            tasks += [asyncio.create_task(submitter(session, rec, base_url, targets, args.submit_interval, stop,
+                                                    device(f"bench-submitter-{i}")))
+                      for i in range(args.submitters)]
+
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            elapsed = time.perf_counter() - started
+
+            metrics_after = parse_metrics(await (await session.get(f"{base_url}/metrics")).text())
+    finally:
+        server.terminate()
+        server.wait()
+        await stub_runner.cleanup()
+
+    requests_by_route = {k: v - metrics_before[0].get(k, 0) for k, v in metrics_after[0].items()}
+    queries_by_route = {k: v - metrics_before[1].get(k, 0) for k, v in metrics_after[1].items()}
+
+    endpoints = {}
+    for endpoint in sorted(rec.statuses):
+        latencies = rec.latencies[endpoint]
+        # Rate-limited requests never reach the route handler, so they run no queries
+        served = requests_by_route.get(endpoint, 0) - rec.rate_limited[endpoint]
+        endpoints[endpoint] = {
+            "requests": len(latencies),
+            "rate_limited": rec.rate_limited[endpoint],
+            "rps": round(len(latencies) / elapsed, 2),
+            "statuses": dict(rec.statuses[endpoint]),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+            "queries_per_request": round(queries_by_route.get(endpoint, 0) / served, 2) if served > 0 else None,
+        }
+
+    total = sum(len(v) for v in rec.latencies.values())
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "database_url")},
+        "environment": {"dialect": dialect, "python": platform.python_version(), "platform": platform.platform()},
+        "duration_s": round(elapsed, 2),
+        "total_requests": total,
+        "rate_limited": sum(rec.rate_limited.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "telegram_messages": sent["count"],
+        "websocket": received,
+        "endpoints": endpoints,
+    }
+
+
+def _ms(value) -> str:
+    return f"{value:8.2f}" if value is not None else f"{'-':>8}"
+
+
+def print_report(results, baseline=None):
+    print(f"\n{results['total_requests']} requests in {results['duration_s']} s "
+          f"({results['throughput_rps']} req/s) on {results['environment']['dialect']}, "
+          f"{results.get('rate_limited', 0)} rate-limited (429, not counted)")
+    print(f"Telegram messages: {results['telegram_messages']}, "
+          f"WebSocket messages received: {results['websocket']['count']}")
+    header = f"{'endpoint':44} {'req':>6} {'429':>5} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, e in results["endpoints"].items():
+        line = (f"{endpoint:44} {e['requests']:6d} {e.get('rate_limited', 0):5d} {e['rps']:7.1f} {_ms(e['p50_ms'])} "
+                f"{_ms(e['p95_ms'])} {_ms(e['p99_ms'])} {e['queries_per_request'] if e['queries_per_request'] is not None else '-':>6}")
+        before = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if before and e["p95_ms"] is not None and before.get("p95_ms") is not None:
+            line += f"   p95 {e['p95_ms'] - before['p95_ms']:+.2f} ms, rps {e['rps'] - before['rps']:+.1f}"
+        print(line)
+        errors = {s: n for s, n in e["statuses"].items() if not s.startswith("2") and s != "429"}
+        if errors:
+            print(f"{'':44} non-2xx: {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--checklists", type=int, default=5)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--chores", type=int, default=10, help="Chores per section")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of traffic")
+    parser.add_argument("--pollers", type=int, default=30)
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--writers", type=int, default=6)
+    parser.add_argument("--burst", type=int, default=5, help="Max writes per burst")
+    parser.add_argument("--write-pause", type=float, default=1.0, help="Mean seconds between bursts")
+    parser.add_argument("--submitters", type=int, default=1)
+    parser.add_argument("--submit-interval", type=float, default=10.0)
+    parser.add_argument("--listeners", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the traffic mix")
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--compare", help="Earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        args.database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    os.environ["DATABASE_URL"] = args.database_url
+    random.seed(args.seed)
+
+    targets, dialect = seed_synthetic(args.checklists, args.sections, args.chores)
+    results = asyncio.run(run(args, targets, dialect))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Build fingerprinted, precompressed copies of the static assets.
+
+Minifies CSS and JS, writes every file under static/ to static/dist/ with a
+content hash in its name, adds .gz and .br variants of text files, and
+writes static/dist/manifest.json. Templates resolve asset URLs through the
+manifest (see app/static_assets.py). Run on every deploy:
+
+    python build_assets.py
+"""
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+import logging
+
+try:
+    import rjsmin
+    import rcssmin
+except ImportError:  # pragma: no cover - both are in requirements.txt
+    rjsmin = rcssmin = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is in requirements.txt
+    brotli = None
+
+from app.static_assets import STATIC_DIR, DIST_DIR
+from app.logging_config import configure_logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".html", ".json", ".txt", ".map"}
+# Smaller files fit in a packet or two; compressing them saves nothing
+MIN_COMPRESS_SIZE = 256
+HASH_LENGTH = 10
+
+
+def minify(path: str, content: bytes) -> bytes:
+    """Minify CSS and JS when the minifiers are installed."""
+    extension = os.path.splitext(path)[1]
+    if extension not in (".js", ".css"):
+        return content
+    if rjsmin is None:
+        logger.warning(f"rjsmin/rcssmin not installed, {path} is not minified")
+        return content
+    text = content.decode("utf-8")
+    text = rjsmin.jsmin(text) if extension == ".js" else rcssmin.cssmin(text)
+    return text.encode("utf-8")
+
+
+def fingerprint(path: str, content: bytes) -> str:
+    """``js/app.js`` -> ``js/app.<hash>.js``"""
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{digest}{extension}"
+
+
+def write_compressed(path: str, content: bytes) -> dict:
+    """Write .gz and .br next to ``path``, keeping only the ones that are smaller."""
+    sizes = {}
+    # mtime=0 keeps the .gz identical across builds of the same content
+    variants = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda data: brotli.compress(data, quality=11)))
+    for suffix, compress in variants:
+        compressed = compress(content)
+        if len(compressed) >= len(content):
+            continue
+        with open(path + suffix, "wb") as f:
+            f.write(compressed)
+        sizes[suffix] = len(compressed)
+    return sizes
+
+
+def source_files(static_dir: str):
+    for root, dirs, files in os.walk(static_dir):
+        rel_root = os.path.relpath(root, static_dir)
+        if rel_root == DIST_DIR or rel_root.startswith(DIST_DIR + os.sep):
+            dirs[:] = []
+            continue
+        dirs.sort()
+        for name in sorted(files):
+            if name.startswith("."):
+                continue
+            yield os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+
+
+def build(static_dir: str = STATIC_DIR) -> dict:
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    for path in source_files(static_dir):
+        with open(os.path.join(static_dir, path), "rb") as f:
+            original = f.read()
+        content = minify(path, original)
+        built = fingerprint(path, content)
+        out_path = os.path.join(dist_dir, built)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        with open(out_path, "wb") as f:
+            f.write(content)
+
+        sizes = {}
+        if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS and len(content) >= MIN_COMPRESS_SIZE:
+            sizes = write_compressed(out_path, content)
+        manifest[path] = f"{DIST_DIR}/{built}"
+        variants = ", ".join(f"{suffix} {size:,}" for suffix, size in sizes.items())
+        logger.info(f"{path} -> {built}: {len(original):,} -> {len(content):,} bytes" + (f" ({variants})" if variants else ""))
+
+    with open(os.path.join(dist_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    logger.info(f"Wrote {len(manifest)} assets to {dist_dir}")
+    return manifest
+
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Minify, fingerprint and precompress static assets")
+    parser.add_argument("--static-dir", default=STATIC_DIR, help="Directory holding the source assets")
+    args = parser.parse_args()
+    build(args.static_dir)
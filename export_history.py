@@ -0,0 +1,44 @@
+from app.export import EXPORTS, EXPORT_BATCH_SIZE, FORMATS, stream_export
+from app.models import Checklist
+from app.database import SessionLocal
+from app.logging_config import configure_logging
+from datetime import date
+from dotenv import load_dotenv
+import argparse
+import logging
+import sys
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def export_history(kind: str, fmt: str, output: str = "-", checklist: str = None,
+                   start: date = None, end: date = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Write an export to ``output`` (``-`` for stdout), one batch at a time."""
+    load_dotenv()
+    checklist_id = None
+    if checklist:
+        with SessionLocal() as db:
+            checklist_id = db.query(Checklist.id).filter(Checklist.name == checklist).scalar()
+        if checklist_id is None:
+            raise SystemExit(f"Checklist not found: {checklist}")
+
+    out = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        for chunk in stream_export(kind, fmt, checklist_id, start, end, batch_size):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Export completion history or the audit log as NDJSON or CSV")
+    parser.add_argument("kind", choices=list(EXPORTS))
+    parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+    parser.add_argument("--checklist", help="Only this checklist (by name)")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="First day, YYYY-MM-DD (CET)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Last day, YYYY-MM-DD (CET)")
+    parser.add_argument("--output", "-o", default="-", help="File to write; stdout by default")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    export_history(args.kind, args.format, args.output, args.checklist, args.start, args.end, args.batch_size)
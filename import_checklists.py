@@ -0,0 +1,78 @@
+from app.models import Base, Checklist
+from app.database import engine, SessionLocal
+from app.workbooks import parse_workbook, apply_checklist_structure
+from app.logging_config import configure_logging
+from dotenv import load_dotenv
+import argparse
+import json
+import logging
+import os
+import sys
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def import_checklists(paths, name=None):
+    """Import one or more .xlsx workbooks, each in its own transaction."""
+    load_dotenv()
+    Base.metadata.create_all(bind=engine)
+
+    for path in paths:
+        db = SessionLocal()
+        try:
+            with open(path, "rb") as f:
+                title, structure = parse_workbook(f)
+            checklist_name = name or title or os.path.splitext(os.path.basename(path))[0]
+
+            checklist = db.query(Checklist).filter(Checklist.name == checklist_name).first()
+            if not checklist:
+                checklist = Checklist(name=checklist_name, description=title)
+                db.add(checklist)
+                db.flush()
+
+            stats = apply_checklist_structure(db, checklist, structure)
+            db.commit()
+            logger.info(f"Imported {path} into '{checklist_name}': {stats}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error importing {path}: {e}")
+            raise
+        finally:
+            db.close()
+
+def check_checklists(paths, expected_path):
+    """Parse workbooks without importing them and compare with the expected structures.
+
+    ``expected_path`` maps workbook file names to ``{"title", "sections"}``;
+    excel_checklists/expected_structure.json covers the shipped workbooks.
+    Returns the number of workbooks that parse differently.
+    """
+    with open(expected_path, encoding="utf-8") as f:
+        expected = json.load(f)
+
+    mismatches = 0
+    for path in paths:
+        name = os.path.basename(path)
+        with open(path, "rb") as f:
+            title, structure = parse_workbook(f)
+        parsed = {"title": title, "sections": [{"name": section, "chores": chores} for section, chores in structure]}
+        if name not in expected:
+            logger.warning(f"No expected structure for {name}")
+        elif parsed != expected[name]:
+            mismatches += 1
+            logger.error(f"{name} parses differently from {expected_path}:\n{json.dumps(parsed, indent=2, ensure_ascii=False)}")
+        else:
+            logger.info(f"{name}: {len(structure)} sections, {sum(len(chores) for _, chores in structure)} chores as expected")
+    return mismatches
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Import checklist workbooks (.xlsx)")
+    parser.add_argument("paths", nargs="+", help="Workbook files, e.g. excel_checklists/*.xlsx")
+    parser.add_argument("--name", help="Checklist name (defaults to the workbook title)")
+    parser.add_argument("--check", metavar="EXPECTED_JSON",
+                        help="Only parse and compare with expected structures, e.g. excel_checklists/expected_structure.json")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(1 if check_checklists(args.paths, args.check) else 0)
+    import_checklists(args.paths, name=args.name)
@@ -1,12 +1,12 @@
 from app.models import Base
 from app.database import engine, SessionLocal
-from app.seed_data import seed_database
+from app.seed_data import seed_if_needed
+from app.logging_config import configure_logging
 from dotenv import load_dotenv
 import time
 import logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_database():
@@ -20,11 +20,11 @@ def init_database():
             Base.metadata.create_all(bind=engine)
             logger.info("Database tables created successfully!")
             
-            # Seed the database with initial data
+            # Seed the database unless the seed data is already applied
             db = SessionLocal()
             try:
-                seed_database(db)
-                logger.info("Database seeded successfully!")
+                if seed_if_needed(db):
+                    logger.info("Database seeded successfully!")
                 break
             finally:
                 db.close()
@@ -38,4 +38,5 @@ def init_database():
                 raise
 
 if __name__ == "__main__":
+    configure_logging()
     init_database() 
\ No newline at end of file
@@ -0,0 +1,104 @@
+from app.models import Signature
+from app.database import engine, SessionLocal
+from app.blob_store import decode_data_url, compact_png, get_blob_store
+from app.logging_config import configure_logging
+from sqlalchemy import text, update
+from dotenv import load_dotenv
+import argparse
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def add_signature_columns():
+    """Make sure the blob columns exist before migrating."""
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE signatures ADD COLUMN IF NOT EXISTS signature_hash VARCHAR(64)"))
+            conn.execute(text("ALTER TABLE signatures ADD COLUMN IF NOT EXISTS signature_size INTEGER"))
+            conn.execute(text("ALTER TABLE signatures ADD COLUMN IF NOT EXISTS signature_mime VARCHAR"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_signatures_signature_hash ON signatures (signature_hash)"))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not add signature blob columns: {e}")
+
+def migrate_signatures(batch_size: int = 200, compact: bool = True):
+    """Move inline base64 signatures into the blob store in batches.
+
+    Rows are walked in id order (keyset pagination), so each batch is a
+    single indexed range scan and only ``batch_size`` images are held in
+    memory at a time. Each batch commits on its own, so the migration can
+    be interrupted and re-run safely.
+    """
+    load_dotenv()
+    add_signature_columns()
+    store = get_blob_store()
+
+    migrated = 0
+    failed = 0
+    bytes_before = 0
+    bytes_after = 0
+    last_id = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                text(
+                    "SELECT id, signature_data FROM signatures "
+                    "WHERE id > :last_id AND signature_hash IS NULL AND signature_data IS NOT NULL "
+                    "ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size}
+            ).all()
+            if not rows:
+                break
+
+            for signature_id, signature_data in rows:
+                last_id = signature_id
+                try:
+                    raw = decode_data_url(signature_data)
+                    bytes_before += len(signature_data)
+                    if compact:
+                        raw = compact_png(raw)
+                    digest = store.put(raw)
+                    bytes_after += len(raw)
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Could not migrate signature {signature_id}: {e}")
+                    continue
+
+                db.execute(
+                    update(Signature)
+                    .where(Signature.id == signature_id)
+                    .values(
+                        signature_hash=digest,
+                        signature_size=len(raw),
+                        signature_mime="image/png",
+                        signature_data=None
+                    )
+                )
+                migrated += 1
+
+            db.commit()
+            logger.info(f"Migrated {migrated} signatures so far (up to id {last_id})")
+        except Exception as e:
+            logger.error(f"Error migrating signatures: {e}")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    logger.info(
+        f"Signature migration finished: {migrated} migrated, {failed} failed, "
+        f"{bytes_before} bytes inline -> {bytes_after} bytes in blob store"
+    )
+    return migrated
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Move signature images out of the signatures table")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--no-compact", action="store_true", help="Store PNGs as-is instead of palette PNGs")
+    args = parser.parse_args()
+    migrate_signatures(batch_size=args.batch_size, compact=not args.no_compact)
@@ -1,11 +1,11 @@
 from app.models import Base
 from app.database import engine, SessionLocal
 from app.seed_data import seed_database
+from app.logging_config import configure_logging
 from dotenv import load_dotenv
 import logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def reset_database():
@@ -33,4 +33,5 @@ def reset_database():
         raise
 
 if __name__ == "__main__":
+    configure_logging()
     reset_database() 
\ No newline at end of file
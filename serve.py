@@ -0,0 +1,126 @@
+import os
+import sys
+import math
+import argparse
+import logging
+import importlib.util
+from dotenv import load_dotenv
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.logging_config import configure_logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Connections left for migrations, psql sessions and scripts
+DB_RESERVED_CONNECTIONS = 10
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity and a cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def compute_workers(database_url: str) -> int:
+    """Worker count bounded by CPUs and by the database connection budget.
+
+    Each worker has its own pool of DB_POOL_SIZE + DB_MAX_OVERFLOW
+    connections (plus one LISTEN connection for broadcasts), and all of
+    them together must fit in DB_MAX_CONNECTIONS. SQLite gets one worker:
+    it has a single writer, and more processes only add lock contention.
+    """
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    if database_url.startswith("sqlite"):
+        return 1
+
+    from app.database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+    cpu_limit = available_cpus() * int(os.getenv("WORKERS_PER_CPU", "2"))
+    max_connections = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+    per_worker = DB_POOL_SIZE + DB_MAX_OVERFLOW + 1
+    pool_limit = max(1, (max_connections - DB_RESERVED_CONNECTIONS) // per_worker)
+    workers = max(1, min(cpu_limit, pool_limit))
+    logger.info(f"Workers: {workers} (cpu limit {cpu_limit}, connection limit {pool_limit})")
+    return workers
+
+
+class GracefulServer(uvicorn.Server):
+    """uvicorn server that tells WebSocket clients to reconnect before it stops.
+
+    uvicorn drains in-flight requests for ``timeout_graceful_shutdown`` and
+    then runs the app's lifespan shutdown, which flushes queued Telegram
+    notifications.
+    """
+
+    async def shutdown(self, sockets=None):
+        from app.broadcast import manager
+
+        await manager.close_all()
+        await super().shutdown(sockets=sockets)
+
+
+def main():
+    load_dotenv()
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Run the checklist app in production mode")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, help="Defaults to WEB_CONCURRENCY or a value derived from CPUs and DB_MAX_CONNECTIONS")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE", "75")),
+                        help="Seconds to keep idle connections open; keep above the proxy's idle timeout")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "20")),
+                        help="Seconds to let in-flight requests finish on shutdown")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        logger.error("DATABASE_URL environment variable is not set")
+        sys.exit(1)
+
+    workers = args.workers or compute_workers(database_url)
+    # Workers read this to decide whether broadcasts need to cross processes
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    config = uvicorn.Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "auto",
+        http="httptools" if importlib.util.find_spec("httptools") else "auto",
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        # Uvicorn's own loggers propagate to the handlers configure_logging set up
+        log_config=None,
+        log_level=os.getenv("LOG_LEVEL", "info").lower(),
+        access_log=os.getenv("ACCESS_LOG", "false").lower() in ("1", "true", "yes"),
+    )
+    server = GracefulServer(config)
+    logger.info(f"Starting {workers} worker(s) on {args.host}:{args.port}")
+
+    if workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
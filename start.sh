@@ -7,5 +7,6 @@ PORT=${PORT:-8000}
 # Log the port we're using
 echo "Starting application on port $PORT"
 
-# Start the application
-exec uvicorn app.main:app --host 0.0.0.0 --port $PORT 
\ No newline at end of file
+# Start the application: workers sized from CPUs and the DB connection budget,
+# graceful drain on SIGTERM
+exec python serve.py --host 0.0.0.0 --port $PORT 
\ No newline at end of file
@@ -19,6 +19,53 @@ let lastUpdateTime = 0;
 const UPDATE_THROTTLE = 300; // Minimum time between updates in ms
 const REFRESH_INTERVAL = 30000; // Refresh every 30 seconds
 let wsConnection = null;
+let checklistView = null;
+let renderedChecklist = null;
+let wsReconnectDelay = 5000;
+const MAX_RATE_LIMIT_RETRIES = 2;
+
+// Per-device id so the server rate-limits each tablet on its own, even when
+// they all share the venue's public IP
+const CLIENT_ID = (() => {
+    let id = localStorage.getItem('clientId');
+    if (!id) {
+        id = Date.now().toString(36) + Math.random().toString(36).slice(2);
+        localStorage.setItem('clientId', id);
+    }
+    return id;
+})();
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+}
+
+// fetch() that identifies the device and waits out 429 responses.
+// Writes carry an Idempotency-Key (options.idempotencyKey, or a new one per
+// call) that is kept across retries, so the server applies them only once.
+async function apiFetch(url, options = {}, retries = MAX_RATE_LIMIT_RETRIES) {
+    const { idempotencyKey, ...fetchOptions } = options;
+    const headers = { ...(fetchOptions.headers || {}), 'X-Client-Id': CLIENT_ID };
+    const method = (fetchOptions.method || 'GET').toUpperCase();
+    let key = idempotencyKey;
+    if (method !== 'GET' && method !== 'HEAD') {
+        key = key || newIdempotencyKey();
+        headers['Idempotency-Key'] = key;
+    }
+    const response = await fetch(url, { ...fetchOptions, headers });
+    // 409 with Retry-After: the first request with this key is still running
+    const retryable = response.status === 429 || (response.status === 409 && response.headers.has('Retry-After'));
+    if (retryable && retries > 0) {
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 1;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+        return apiFetch(url, { ...options, idempotencyKey: key }, retries - 1);
+    }
+    return response;
+}
+
+// One key per distinct submission, so pressing submit again after a lost
+// response replays the first result instead of sending a second report
+let lastSubmission = { body: null, key: null };
 
 // Add achievements container to the body
 const achievementsContainer = document.createElement('div');
@@ -110,21 +157,35 @@ function initializeWebSocket() {
     
     wsConnection.onmessage = function(event) {
         const data = JSON.parse(event.data);
+        if (data.type === 'reconnect') {
+            // Server is restarting; it says how long to wait before reconnecting
+            wsReconnectDelay = data.retry_after_ms || wsReconnectDelay;
+            return;
+        }
+        if (data.type === 'checklist_reset') {
+            // Every tablet gets this at once; spread the reloads over a second
+            if (data.checklists.includes(checklistSelect.value)) {
+                setTimeout(() => loadChecklist(checklistSelect.value), Math.random() * 1000);
+            }
+            return;
+        }
         if (data.type === 'chore_update') {
             // Update the specific chore
             const chore = currentChores.find(c => c.id === data.chore_id);
-            if (chore) {
-                chore.completed = data.completed;
-                chore.completed_by = data.completed_by;
-                chore.completed_at = data.completed_at;
+            // Versions only go up; an older update arriving late is ignored
+            if (chore && !(data.version <= chore.version)) {
+                applyChoreState(chore, data);
                 updateUI();
             }
         }
     };
     
-    wsConnection.onclose = function() {
-        // Try to reconnect after 5 seconds
-        setTimeout(initializeWebSocket, 5000);
+    wsConnection.onclose = function(event) {
+        // Reconnect after the server's hint on a restart (1012), otherwise after 5 seconds.
+        // Jitter spreads the tablets out so they don't all reconnect at once.
+        const delay = event.code === 1012 ? wsReconnectDelay : 5000;
+        wsReconnectDelay = 5000;
+        setTimeout(initializeWebSocket, delay * (1 + Math.random()));
     };
 }
 
@@ -156,6 +217,13 @@ document.addEventListener('DOMContentLoaded', async function() {
         if (!choreContainer) throw new Error('Chores container element not found');
         if (!successSection) throw new Error('Success section element not found');
         
+        // Keyed view of the chores: refreshes patch the DOM instead of rebuilding it
+        checklistView = createChecklistView(choreContainer, {
+            onToggle: handleChoreCompletion,
+            onSectionToggle: handleSectionCheckboxChange,
+            onRendered: updateProgress
+        });
+        
         console.log('Populating staff dropdown...');
         await populateStaffDropdown();
         console.log('Staff dropdown populated');
@@ -193,7 +261,7 @@ document.addEventListener('DOMContentLoaded', async function() {
                 }
                 
                 try {
-                    const response = await fetch(window.location.origin + `/api/reset_checklist/${checklistName}`, {
+                    const response = await apiFetch(window.location.origin + `/api/reset_checklist/${checklistName}`, {
                         method: 'POST',
                         headers: {
                             'Content-Type': 'application/json'
@@ -231,6 +299,16 @@ document.addEventListener('DOMContentLoaded', async function() {
         initializeWebSocket();
         startPeriodicRefresh();
 
+        // Offline mode: cache the app shell and replay journaled ticks once back online
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.register('/sw.js').catch(error => {
+                console.warn('Service worker registration failed:', error);
+            });
+        }
+        mutationJournal.start(() => {
+            if (checklistSelect.value) loadChecklist(checklistSelect.value);
+        });
+
         console.log('Application initialization complete');
     } catch (error) {
         console.error('Error during application initialization:', error);
@@ -278,54 +356,30 @@ async function loadChecklist(checklistId) {
         console.log('Loading checklist:', checklistId);
         console.log('Fetching from:', window.location.origin + `/api/checklists/${checklistId}/chores`);
         
-        const response = await fetch(window.location.origin + `/api/checklists/${checklistId}/chores`);
+        const response = await apiFetch(window.location.origin + `/api/checklists/${checklistId}/chores`);
         if (!response.ok) {
             console.error('Failed to load checklist:', response.status, response.statusText);
             throw new Error('Failed to load checklist');
         }
         
-        const data = await response.json();
+        // Show ticks made offline that have not synced yet
+        const data = await mutationJournal.overlay(await response.json());
         console.log('Received checklist data:', data);
         currentChores = data;
         
-        // Clear existing chores
-        choreContainer.innerHTML = '';
-        
-        // Add progress display
-        const progressDiv = document.createElement('div');
-        progressDiv.id = 'progressDisplay';
-        progressDiv.className = 'progress-display';
-        choreContainer.appendChild(progressDiv);
-        
-        // Group chores by section
-        const sections = {};
         if (Array.isArray(data)) {
-            data.forEach(chore => {
-                if (!sections[chore.section]) sections[chore.section] = [];
-                sections[chore.section].push(chore);
-            });
-            
-            console.log('Grouped sections:', sections);
-            
-            // Create a container for sections
-            const sectionsContainer = document.createElement('div');
-            sectionsContainer.className = 'sections-container';
-            
-            // Render each section
-            Object.entries(sections).forEach(([sectionName, sectionChores]) => {
-                console.log('Rendering section:', sectionName, 'with chores:', sectionChores);
-                const sectionElement = renderSection(sectionName, sectionChores);
-                sectionsContainer.appendChild(sectionElement);
-            });
-            
-            // Add sections container to main container
-            choreContainer.appendChild(sectionsContainer);
+            if (renderedChecklist !== checklistId) {
+                // Another checklist: start from empty and render straight away
+                checklistView.reset();
+                renderedChecklist = checklistId;
+                checklistView.render(data);
+            } else {
+                // Refresh: patch only the chores that changed, in the next frame
+                checklistView.schedule(data);
+            }
             
             // Show the container
             choreContainer.classList.remove('d-none');
-            
-            // Update progress
-            updateProgress();
         } else {
             console.error('Received data is not an array:', data);
         }
@@ -335,37 +389,6 @@ async function loadChecklist(checklistId) {
     }
 }
 
-function renderChores(chores) {
-    choreContainer.innerHTML = '';
-    
-    // Add progress display
-    const progressDiv = document.createElement('div');
-    progressDiv.id = 'progressDisplay';
-    choreContainer.appendChild(progressDiv);
-    
-    // Group chores by section
-    const sections = {};
-    if (Array.isArray(chores)) {
-        chores.forEach(chore => {
-            if (!sections[chore.section]) {
-                sections[chore.section] = [];
-            }
-            sections[chore.section].push(chore);
-        });
-    } else {
-        console.error('chores is not an array:', chores);
-        return;
-    }
-    
-    // Render each section
-    Object.entries(sections).forEach(([sectionName, sectionChores]) => {
-        const sectionElement = renderSection(sectionName, sectionChores);
-        choreContainer.appendChild(sectionElement);
-    });
-    
-    updateProgress();
-}
-
 // Debounce function
 function debounce(func, wait) {
     let timeout;
@@ -394,6 +417,16 @@ function throttle(func, limit) {
 // Create throttled version of updateProgressIndicator
 const throttledUpdateProgress = throttle(updateProgress, 100);
 
+// Take the server's state for a chore (a WebSocket update, a write's
+// response or a 409's current state) and patch its node
+function applyChoreState(chore, state) {
+    chore.completed = state.completed;
+    chore.completed_by = state.completed_by;
+    chore.completed_at = state.completed_at;
+    chore.version = state.version;
+    checklistView.patchChore(chore);
+}
+
 async function handleChoreCompletion(choreId, checkbox, sectionName) {
     const isChecked = checkbox.checked;
     const staffName = staffSelect.value;
@@ -404,52 +437,52 @@ async function handleChoreCompletion(choreId, checkbox, sectionName) {
         return;
     }
     
+    const chore = currentChores.find(c => c.id === choreId);
     try {
-        const response = await fetch(window.location.origin + `/api/chores/${choreId}/toggle`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                staff_name: staffName,
-                completed: isChecked
-            })
-        });
+        let response = null;
+        try {
+            // The version we last saw: the server rejects the write if someone changed the chore since
+            response = await apiFetch(window.location.origin + `/api/chores/${choreId}/toggle`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    staff_name: staffName,
+                    completed: isChecked,
+                    version: chore ? chore.version : undefined
+                })
+            });
+        } catch (error) {
+            if (!isNetworkError(error)) throw error;
+            // Offline: keep the tick and sync it when the connection is back
+            await mutationJournal.add(mutationJournal.choreToggle(choreId, isChecked, staffName, chore ? chore.version : undefined));
+        }
         
-        if (!response.ok) throw new Error('Failed to update chore status');
+        if (response && response.status === 409) {
+            // Someone else changed it first: show their state instead of overwriting it
+            const { detail } = await response.json();
+            if (chore && detail.chore) applyChoreState(chore, detail.chore);
+            if (detail.chore && detail.chore.completed !== isChecked) {
+                alert(`${detail.chore.completed_by || 'Someone'} already changed this task. It now shows their update.`);
+            }
+            return;
+        }
+        if (response && !response.ok) throw new Error('Failed to update chore status');
         
         // Update the chore's completed status in our local state
-        const chore = currentChores.find(c => c.id === choreId);
-        if (chore) {
+        if (chore && response) {
+            // Patch the chore's node; progress and the section checkbox follow
+            applyChoreState(chore, (await response.json()).chore);
+        } else if (chore) {
+            // Journaled: predict the version the replay will produce
             chore.completed = isChecked;
             chore.completed_by = isChecked ? staffName : null;
             chore.completed_at = isChecked ? new Date().toISOString() : null;
-            
-            // Update the UI
-            const choreDiv = checkbox.closest('.chore-item');
-            if (choreDiv) {
-                if (isChecked) {
-                    choreDiv.classList.add('completed');
-                    // Add completion info
-                    const completionInfo = document.createElement('div');
-                    completionInfo.className = 'completion-info text-muted ms-4';
-                    completionInfo.innerHTML = `<small>Completed by ${staffName}</small>`;
-                    choreDiv.appendChild(completionInfo);
-                } else {
-                    choreDiv.classList.remove('completed');
-                    // Remove completion info
-                    const completionInfo = choreDiv.querySelector('.completion-info');
-                    if (completionInfo) completionInfo.remove();
-                }
-            }
+            chore.version = (chore.version || 0) + 1;
+            checklistView.patchChore(chore);
         }
         
-        // Update progress
-        updateProgress();
-        
-        // Update section checkbox using safe ID
-        updateSectionCheckbox(sectionName);
-        
     } catch (error) {
         console.error('Error updating chore completion:', error);
         checkbox.checked = !isChecked;
@@ -467,7 +500,7 @@ async function processChoreUpdateQueue() {
     while (choreUpdateQueue.length > 0) {
         const batch = choreUpdateQueue.splice(0, batchSize);
         const promises = batch.map(({ choreId, checkbox, comment }) => 
-            fetch(window.location.origin + `/api/chores/${choreId}/toggle`, {
+            apiFetch(window.location.origin + `/api/chores/${choreId}/toggle`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -497,75 +530,6 @@ async function processChoreUpdateQueue() {
     throttledUpdateProgress();
 }
 
-// Optimized render functions
-function renderSection(sectionName, sectionChores) {
-    const sectionDiv = document.createElement('div');
-    sectionDiv.className = 'section mb-4';
-    sectionDiv.dataset.sectionName = sectionName;
-    sectionDiv.dataset.sectionId = sectionChores[0]?.section_id;
-
-    // Create a safe ID for the section
-    const safeSectionId = `section-${sectionName.replace(/[^a-zA-Z0-9-]/g, '-')}`;
-
-    const sectionHeader = document.createElement('div');
-    sectionHeader.className = 'card-header bg-light d-flex align-items-center gap-2';
-    sectionHeader.innerHTML = `
-        <input type="checkbox" class="form-check-input" id="${safeSectionId}" ${sectionChores.every(chore => chore.completed) ? 'checked' : ''}>
-        <h5 class="mb-0 flex-grow-1">${sectionName}</h5>
-    `;
-
-    const choresContainer = document.createElement('div');
-    choresContainer.className = 'card-body';
-
-    // Sort chores by order
-    sectionChores.sort((a, b) => a.order - b.order);
-
-    // Create chores HTML in a single operation
-    const choresHTML = sectionChores.map(chore => `
-        <div class="chore-item mb-2 ${chore.completed ? 'completed' : ''}">
-            <div class="d-flex align-items-start gap-2">
-                <input type="checkbox" class="form-check-input mt-1 chore-checkbox" id="chore-${chore.id}"
-                       ${chore.completed ? 'checked' : ''} data-chore-id="${chore.id}" data-section="${sectionName}">
-                <label class="form-check-label flex-grow-1" for="chore-${chore.id}">
-                    ${chore.description}
-                </label>
-            </div>
-            ${chore.completed && chore.completed_by ? `
-                <div class="completion-info text-muted ms-4">
-                    <small>Completed by ${chore.completed_by}</small>
-                    ${chore.comment ? `<br><small>Comment: ${chore.comment}</small>` : ''}
-                </div>
-            ` : !chore.completed ? `
-                <div class="chore-comment ms-4 mt-1">
-                    <input type="text" class="form-control form-control-sm" 
-                           placeholder="Add a comment..." value="${chore.comment || ''}">
-                </div>
-            ` : ''}
-        </div>
-    `).join('');
-
-    choresContainer.innerHTML = choresHTML;
-
-    // Add event listeners
-    const checkboxes = choresContainer.querySelectorAll('input[type="checkbox"]');
-    checkboxes.forEach(checkbox => {
-        checkbox.addEventListener('change', () => 
-            handleChoreCompletion(parseInt(checkbox.dataset.choreId), checkbox, sectionName)
-        );
-    });
-
-    sectionDiv.appendChild(sectionHeader);
-    sectionDiv.appendChild(choresContainer);
-
-    // Add section checkbox event listener
-    const sectionCheckbox = sectionHeader.querySelector('input[type="checkbox"]');
-    sectionCheckbox.addEventListener('change', () => 
-        handleSectionCheckboxChange(sectionCheckbox, checkboxes)
-    );
-
-    return sectionDiv;
-}
-
 async function handleSectionCheckboxChange(sectionCheckbox, choreCheckboxes) {
     const isChecked = sectionCheckbox.checked;
     const sectionName = sectionCheckbox.closest('.section').dataset.sectionName;
@@ -577,6 +541,9 @@ async function handleSectionCheckboxChange(sectionCheckbox, choreCheckboxes) {
         return;
     }
 
+    // State of each chore before the optimistic update, for reverting on error
+    const previous = new Map();
+
     try {
         // Prepare batch of chores to update
         const choresToUpdate = Array.from(choreCheckboxes)
@@ -600,50 +567,56 @@ async function handleSectionCheckboxChange(sectionCheckbox, choreCheckboxes) {
             .map(item => item.comment);
         const combinedComment = comments.join(' | ');
 
-        // Optimistically update UI
-        choresToUpdate.forEach(({ checkbox, comment }) => {
+        // Optimistically update the chores; the view patches their nodes
+        choresToUpdate.forEach(({ choreId, checkbox, comment }) => {
             checkbox.checked = isChecked;
-            const choreDiv = checkbox.closest('.chore-item');
-            if (choreDiv) {
-                if (isChecked) {
-                    choreDiv.classList.add('completed');
-                    // Add completion info
-                    const completionInfo = document.createElement('div');
-                    completionInfo.className = 'completion-info text-muted ms-4';
-                    completionInfo.innerHTML = `
-                        <small>Completed by ${staffName}</small>
-                        ${comment ? `<br><small>Comment: ${comment}</small>` : ''}
-                    `;
-                    choreDiv.appendChild(completionInfo);
-                } else {
-                    choreDiv.classList.remove('completed');
-                    // Remove completion info
-                    const completionInfo = choreDiv.querySelector('.completion-info');
-                    if (completionInfo) completionInfo.remove();
-                }
-            }
+            const chore = currentChores.find(c => c.id === choreId);
+            if (!chore) return;
+            previous.set(choreId, { ...chore });
+            chore.completed = isChecked;
+            chore.completed_by = isChecked ? staffName : null;
+            chore.comment = comment || chore.comment;
+            checklistView.patchChore(chore);
         });
 
         // Send single request for the section
         const sectionId = parseInt(sectionCheckbox.closest('.section').dataset.sectionId);
-        const response = await fetch(window.location.origin + `/api/sections/${sectionId}/complete`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                staff_name: staffName,
-                completed: isChecked,
-                comment: combinedComment || undefined
-            })
-        });
+        let response = null;
+        try {
+            response = await apiFetch(window.location.origin + `/api/sections/${sectionId}/complete`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    staff_name: staffName,
+                    completed: isChecked,
+                    comment: combinedComment || undefined
+                })
+            });
+        } catch (error) {
+            if (!isNetworkError(error)) throw error;
+            // Offline: journal each chore so the whole section syncs later
+            for (const { choreId } of choresToUpdate) {
+                const previousState = previous.get(choreId);
+                const version = previousState ? previousState.version : undefined;
+                await mutationJournal.add(mutationJournal.choreToggle(choreId, isChecked, staffName, version));
+                const chore = currentChores.find(c => c.id === choreId);
+                if (chore && version !== undefined) chore.version = version + 1;
+            }
+        }
 
-        if (!response.ok) {
+        if (response && !response.ok) {
             throw new Error('Failed to update section');
         }
-
-        // Update progress
-        updateProgress();
+        if (response) {
+            // New versions of the completed chores, for the next compare-and-swap
+            const { chores = [] } = await response.json();
+            chores.forEach(state => {
+                const chore = currentChores.find(c => c.id === state.chore_id);
+                if (chore) applyChoreState(chore, state);
+            });
+        }
 
         // Add completion animation for successful update
         if (isChecked) {
@@ -660,16 +633,15 @@ async function handleSectionCheckboxChange(sectionCheckbox, choreCheckboxes) {
         console.error('Error updating section:', error);
         // Revert all changes on error
         sectionCheckbox.checked = !isChecked;
+        previous.forEach((state, choreId) => {
+            const chore = currentChores.find(c => c.id === choreId);
+            if (!chore) return;
+            Object.assign(chore, state);
+            checklistView.patchChore(chore);
+        });
         choreCheckboxes.forEach(checkbox => {
-            checkbox.checked = !isChecked;
-            const choreDiv = checkbox.closest('.chore-item');
-            if (choreDiv) {
-                if (!isChecked) {
-                    choreDiv.classList.add('completed');
-                } else {
-                    choreDiv.classList.remove('completed');
-                }
-            }
+            const chore = currentChores.find(c => c.id === parseInt(checkbox.dataset.choreId));
+            if (chore) checkbox.checked = !!chore.completed;
         });
         alert('Failed to update section. Please try again.');
     }
@@ -741,7 +713,7 @@ function renderChore(chore) {
             commentInput.addEventListener('change', async (e) => {
                 const comment = e.target.value.trim();
                 try {
-                    const response = await fetch('/api/chore_completion', {
+                    const response = await apiFetch('/api/chore_completion', {
                         method: 'POST',
                         headers: {
                             'Content-Type': 'application/json',
@@ -770,24 +742,9 @@ function renderChore(chore) {
     return choreDiv;
 }
 
-function updateSectionCheckbox(sectionName) {
-    // Create the same safe ID as in renderSection
-    const safeSectionId = `section-${sectionName.replace(/[^a-zA-Z0-9-]/g, '-')}`;
-    const sectionCheckbox = document.getElementById(safeSectionId);
-    if (!sectionCheckbox) return;
-
-    // Use a more specific selector for chore checkboxes
-    const choreCheckboxes = Array.from(document.querySelectorAll(`.chore-checkbox[data-section="${sectionName}"]`));
-    const allChecked = choreCheckboxes.every(cb => cb.checked);
-    const someChecked = choreCheckboxes.some(cb => cb.checked);
-
-    sectionCheckbox.checked = allChecked;
-    sectionCheckbox.indeterminate = someChecked && !allChecked;
-}
-
 async function handleChoreComment(choreId, comment) {
     try {
-        const response = await fetch('/api/chore_comment', {
+        const response = await apiFetch('/api/chore_comment', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -849,17 +806,23 @@ async function submitChecklist() {
         submitBtn.disabled = true;
         submitBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Submitting...';
 
-        const response = await fetch('/api/submit_checklist', {
+        const body = JSON.stringify({
+            checklist_id: checklistId,
+            staff_name: staffName,
+            generate_pdf: true,
+            save_to_dropbox: true,
+            signature: signaturePad && !signaturePad.isEmpty() ? signaturePad.toDataURL('image/png') : undefined
+        });
+        if (lastSubmission.body !== body) {
+            lastSubmission = { body, key: newIdempotencyKey() };
+        }
+        const response = await apiFetch('/api/submit_checklist', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
-                checklist_id: checklistId,
-                staff_name: staffName,
-                generate_pdf: true,
-                save_to_dropbox: true
-            })
+            body,
+            idempotencyKey: lastSubmission.key
         });
 
         if (!response.ok) {
@@ -903,7 +866,7 @@ function updateProgressIndicator() {
 
 async function toggleChore(choreId, checkbox) {
     try {
-        const response = await fetch(window.location.origin + `/api/chores/${choreId}/toggle`, {
+        const response = await apiFetch(window.location.origin + `/api/chores/${choreId}/toggle`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -944,7 +907,7 @@ async function completeSection(sectionName) {
         }
         
         // Send request to complete the section
-        const response = await fetch(window.location.origin + `/api/sections/${sectionId}/complete`, {
+        const response = await apiFetch(window.location.origin + `/api/sections/${sectionId}/complete`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -1009,7 +972,7 @@ async function populateChecklistDropdown() {
         console.log('Fetching checklists from:', window.location.origin + '/api/checklists');
 
         // Then populate checklists
-        const response = await fetch(window.location.origin + '/api/checklists');
+        const response = await apiFetch(window.location.origin + '/api/checklists');
         const checklists = await response.json();
         
         console.log('Received checklists:', checklists);
@@ -1087,7 +1050,7 @@ function handleCheckboxChange(event) {
 // Add the missing populateStaffDropdown function
 async function populateStaffDropdown() {
     try {
-        const response = await fetch('/api/staff');
+        const response = await apiFetch('/api/staff');
         if (!response.ok) throw new Error('Failed to fetch staff list');
         const staff = await response.json();
         
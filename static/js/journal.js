@@ -0,0 +1,170 @@
+// Offline mutation journal.
+//
+// Ticks that cannot reach the server are stored in IndexedDB with an id
+// generated here, and replayed in order through /api/mutations/batch once
+// the connection is back. The server remembers the ids it has applied, so
+// a batch that is sent twice is only applied once.
+
+const JOURNAL_DB = 'checklist-journal';
+const JOURNAL_STORE = 'mutations';
+const REPLAY_BATCH_SIZE = 50;
+// Tablets come back online together after a Wi-Fi drop; spread their replays out
+const REPLAY_MAX_JITTER_MS = 5000;
+const REPLAY_RETRY_INTERVAL = 30000;
+
+const mutationJournal = (() => {
+    let dbPromise = null;
+    let replaying = false;
+
+    function open() {
+        if (!dbPromise) {
+            dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(JOURNAL_DB, 1);
+                request.onupgradeneeded = () => {
+                    // seq keeps mutations in the order they were made
+                    request.result.createObjectStore(JOURNAL_STORE, { keyPath: 'seq', autoIncrement: true });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return dbPromise;
+    }
+
+    async function transaction(mode, work) {
+        const db = await open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(JOURNAL_STORE, mode);
+            const request = work(tx.objectStore(JOURNAL_STORE));
+            tx.oncomplete = () => resolve(request ? request.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    function newId() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+    }
+
+    // `version` is the chore version the tick was made on; the server
+    // reports a conflict instead of applying it if the chore changed since
+    function choreToggle(choreId, completed, staffName, version) {
+        return {
+            id: newId(),
+            type: 'chore_toggle',
+            chore_id: choreId,
+            completed: completed,
+            staff_name: staffName,
+            version: version,
+            created_at: new Date().toISOString()
+        };
+    }
+
+    async function add(mutation) {
+        await transaction('readwrite', store => store.add(mutation));
+        updateBadge();
+    }
+
+    function all() {
+        return transaction('readonly', store => store.getAll());
+    }
+
+    function remove(seqs) {
+        return transaction('readwrite', store => {
+            seqs.forEach(seq => store.delete(seq));
+        });
+    }
+
+    // Apply pending ticks to a chore list fetched from the server (or the cache)
+    async function overlay(chores) {
+        const pending = await all();
+        if (pending.length === 0 || !Array.isArray(chores)) return chores;
+        const byId = new Map(chores.map(chore => [chore.id, chore]));
+        pending.forEach(mutation => {
+            const chore = byId.get(mutation.chore_id);
+            if (!chore || mutation.type !== 'chore_toggle') return;
+            chore.completed = mutation.completed;
+            chore.completed_by = mutation.completed ? mutation.staff_name : null;
+            chore.completed_at = mutation.completed ? mutation.created_at : null;
+            // Each applied tick bumps the version by one
+            if (mutation.version !== undefined && mutation.version !== null) chore.version = mutation.version + 1;
+        });
+        return chores;
+    }
+
+    // Send pending mutations in batches; returns how many changed the
+    // checklist or lost to someone else's change (both need a reload)
+    async function replay() {
+        if (replaying) return 0;
+        replaying = true;
+        let applied = 0;
+        try {
+            let pending = await all();
+            while (pending.length > 0) {
+                const batch = pending.slice(0, REPLAY_BATCH_SIZE);
+                const response = await apiFetch('/api/mutations/batch', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        mutations: batch.map(({ seq, ...mutation }) => mutation)
+                    })
+                });
+                if (!response.ok) throw new Error(`Replay failed with status ${response.status}`);
+                const data = await response.json();
+                // Every result is final (applied, duplicate or rejected), so drop them all
+                const done = new Set(data.results.map(result => result.id));
+                applied += data.results.filter(result => result.status === 'applied' || result.status === 'conflict').length;
+                await remove(batch.filter(mutation => done.has(mutation.id)).map(mutation => mutation.seq));
+                pending = pending.slice(batch.length);
+            }
+        } catch (error) {
+            console.warn('Offline changes not replayed yet:', error);
+        } finally {
+            replaying = false;
+            updateBadge();
+        }
+        return applied;
+    }
+
+    function scheduleReplay(onApplied) {
+        setTimeout(async () => {
+            const applied = await replay();
+            if (applied > 0 && onApplied) onApplied(applied);
+        }, Math.random() * REPLAY_MAX_JITTER_MS);
+    }
+
+    // Small "N changes waiting" badge while anything is unsent
+    async function updateBadge() {
+        let badge = document.getElementById('offlineBadge');
+        const count = (await all()).length;
+        if (count === 0) {
+            if (badge) badge.remove();
+            return;
+        }
+        if (!badge) {
+            badge = document.createElement('div');
+            badge.id = 'offlineBadge';
+            badge.className = 'badge bg-warning text-dark position-fixed bottom-0 end-0 m-3 p-2';
+            document.body.appendChild(badge);
+        }
+        badge.textContent = `Offline: ${count} change${count === 1 ? '' : 's'} waiting to sync`;
+    }
+
+    // Replay when the connection comes back, on load, and periodically while anything is pending
+    function start(onApplied) {
+        window.addEventListener('online', () => scheduleReplay(onApplied));
+        scheduleReplay(onApplied);
+        setInterval(async () => {
+            if (navigator.onLine && (await all()).length > 0) scheduleReplay(onApplied);
+        }, REPLAY_RETRY_INTERVAL);
+    }
+
+    return { choreToggle, add, all, overlay, replay, start, updateBadge };
+})();
+
+// fetch() rejects with a TypeError when the request never reached the server
+function isNetworkError(error) {
+    return error instanceof TypeError;
+}
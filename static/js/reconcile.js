@@ -0,0 +1,320 @@
+// Keyed, incremental rendering of the checklist.
+//
+// The view keeps one DOM node per section and per chore, keyed by section
+// name and chore id. Given a new chore list it creates nodes only for new
+// chores, removes the ones that are gone, moves nodes only when their order
+// changed and patches only the fields that differ. Everything else stays
+// untouched, so scroll position, focus and half-typed comments survive
+// refreshes and WebSocket updates. Updates are batched into one
+// requestAnimationFrame.
+//
+// The view only uses createElement, appendChild, insertBefore, remove,
+// textContent, className/classList and properties, so
+// benchmarks/bench_dom_patch.js can run it against a small fake DOM in node.
+
+const scheduleFrame = typeof requestAnimationFrame === 'function'
+    ? requestAnimationFrame
+    : (callback) => setTimeout(callback, 16);
+
+function createElement(tag, className) {
+    const element = document.createElement(tag);
+    if (className) element.className = className;
+    return element;
+}
+
+function sectionSafeId(sectionName) {
+    return `section-${sectionName.replace(/[^a-zA-Z0-9-]/g, '-')}`;
+}
+
+// Group chores by section in the order sections first appear, each sorted by chore order
+function groupBySection(chores) {
+    const sections = new Map();
+    chores.forEach(chore => {
+        if (!sections.has(chore.section)) sections.set(chore.section, []);
+        sections.get(chore.section).push(chore);
+    });
+    sections.forEach(sectionChores => sectionChores.sort((a, b) => a.order - b.order));
+    return sections;
+}
+
+// Put `nodes` into `parent` in order, inserting only the ones that are out of
+// place; returns how many were inserted
+function placeInOrder(parent, nodes) {
+    let cursor = parent.firstChild;
+    let inserted = 0;
+    nodes.forEach(node => {
+        if (node === cursor) {
+            cursor = cursor.nextSibling;
+        } else {
+            parent.insertBefore(node, cursor);
+            inserted++;
+        }
+    });
+    return inserted;
+}
+
+function createChecklistView(container, handlers = {}) {
+    const sections = new Map();  // section name -> record
+    const chores = new Map();    // chore id -> record
+    let sectionsContainer = null;
+    let pendingList = null;
+    const pendingChores = new Map();
+    let frameRequested = false;
+    const stats = { created: 0, patched: 0, moved: 0, removed: 0 };
+
+    function mount() {
+        container.textContent = '';
+        const progressDiv = createElement('div', 'progress-display');
+        progressDiv.id = 'progressDisplay';
+        sectionsContainer = createElement('div', 'sections-container');
+        container.appendChild(progressDiv);
+        container.appendChild(sectionsContainer);
+    }
+
+    function createSection(sectionName) {
+        const node = createElement('div', 'section mb-4');
+        node.dataset.sectionName = sectionName;
+
+        const header = createElement('div', 'card-header bg-light d-flex align-items-center gap-2');
+        const checkbox = createElement('input', 'form-check-input');
+        checkbox.type = 'checkbox';
+        checkbox.id = sectionSafeId(sectionName);
+        const title = createElement('h5', 'mb-0 flex-grow-1');
+        title.textContent = sectionName;
+        header.appendChild(checkbox);
+        header.appendChild(title);
+
+        const body = createElement('div', 'card-body');
+        node.appendChild(header);
+        node.appendChild(body);
+
+        const record = { node, checkbox, body, choreIds: [] };
+        checkbox.addEventListener('change', () => {
+            if (handlers.onSectionToggle) handlers.onSectionToggle(checkbox, sectionCheckboxes(sectionName));
+        });
+        sections.set(sectionName, record);
+        stats.created++;
+        return record;
+    }
+
+    function createChore(chore) {
+        const node = createElement('div', 'chore-item mb-2');
+        const row = createElement('div', 'd-flex align-items-start gap-2');
+        const checkbox = createElement('input', 'form-check-input mt-1 chore-checkbox');
+        checkbox.type = 'checkbox';
+        checkbox.id = `chore-${chore.id}`;
+        checkbox.dataset.choreId = chore.id;
+        const label = createElement('label', 'form-check-label flex-grow-1');
+        label.htmlFor = checkbox.id;
+        row.appendChild(checkbox);
+        row.appendChild(label);
+        node.appendChild(row);
+
+        const record = { node, checkbox, label, info: null, commentBox: null, state: {} };
+        checkbox.addEventListener('change', () => {
+            if (handlers.onToggle) handlers.onToggle(chore.id, checkbox, record.state.section);
+        });
+        chores.set(chore.id, record);
+        stats.created++;
+        patchChore(record, chore);
+        return record;
+    }
+
+    function completionInfo(chore) {
+        const info = createElement('div', 'completion-info text-muted ms-4');
+        const by = createElement('small');
+        by.textContent = `Completed by ${chore.completed_by}`;
+        info.appendChild(by);
+        if (chore.comment) {
+            info.appendChild(createElement('br'));
+            const comment = createElement('small');
+            comment.textContent = `Comment: ${chore.comment}`;
+            info.appendChild(comment);
+        }
+        return info;
+    }
+
+    function commentBox(chore) {
+        const box = createElement('div', 'chore-comment ms-4 mt-1');
+        const input = createElement('input', 'form-control form-control-sm');
+        input.type = 'text';
+        input.placeholder = 'Add a comment...';
+        input.value = chore.comment || '';
+        box.appendChild(input);
+        return box;
+    }
+
+    // Bring one chore's node in line with `chore`, touching only what changed
+    function patchChore(record, chore) {
+        const state = record.state;
+        let changed = false;
+        if (state.description !== chore.description) {
+            record.label.textContent = chore.description;
+            changed = true;
+        }
+        if (state.section !== chore.section) {
+            record.checkbox.dataset.section = chore.section;
+            changed = true;
+        }
+        const completed = !!chore.completed;
+        if (state.completed !== completed) {
+            record.checkbox.checked = completed;
+            record.node.classList.toggle('completed', completed);
+            changed = true;
+        }
+        const showInfo = completed && !!chore.completed_by;
+        const infoChanged = state.completed !== completed
+            || state.completed_by !== chore.completed_by
+            || state.comment !== chore.comment;
+        if (infoChanged) {
+            if (record.info) {
+                record.info.remove();
+                record.info = null;
+            }
+            if (showInfo) {
+                record.info = completionInfo(chore);
+                record.node.appendChild(record.info);
+            }
+            changed = true;
+        }
+        // The comment box is kept while the chore stays open, so typed text survives
+        if (completed && record.commentBox) {
+            record.commentBox.remove();
+            record.commentBox = null;
+        } else if (!completed && !record.commentBox) {
+            record.commentBox = commentBox(chore);
+            record.node.appendChild(record.commentBox);
+        }
+        record.state = {
+            description: chore.description,
+            section: chore.section,
+            completed,
+            completed_by: chore.completed_by,
+            comment: chore.comment
+        };
+        if (changed) stats.patched++;
+    }
+
+    function updateSectionCheckbox(record) {
+        const states = record.choreIds.map(id => chores.get(id).state.completed);
+        const allChecked = states.length > 0 && states.every(Boolean);
+        const someChecked = states.some(Boolean);
+        if (record.checkbox.checked !== allChecked) record.checkbox.checked = allChecked;
+        const indeterminate = someChecked && !allChecked;
+        if (record.checkbox.indeterminate !== indeterminate) record.checkbox.indeterminate = indeterminate;
+    }
+
+    function reconcile(nextChores) {
+        if (!sectionsContainer) mount();
+        const grouped = groupBySection(nextChores);
+        const seenChores = new Set();
+        const sectionNodes = [];
+
+        grouped.forEach((sectionChores, sectionName) => {
+            const section = sections.get(sectionName) || createSection(sectionName);
+            const sectionId = String(sectionChores[0]?.section_id);
+            if (section.node.dataset.sectionId !== sectionId) section.node.dataset.sectionId = sectionId;
+
+            let created = 0;
+            const choreNodes = sectionChores.map(chore => {
+                seenChores.add(chore.id);
+                const record = chores.get(chore.id);
+                if (record) {
+                    patchChore(record, chore);
+                    return record.node;
+                }
+                created++;
+                return createChore(chore).node;
+            });
+            stats.moved += placeInOrder(section.body, choreNodes) - created;
+            section.choreIds = sectionChores.map(chore => chore.id);
+            updateSectionCheckbox(section);
+            sectionNodes.push(section.node);
+        });
+
+        chores.forEach((record, id) => {
+            if (!seenChores.has(id)) {
+                record.node.remove();
+                chores.delete(id);
+                stats.removed++;
+            }
+        });
+        sections.forEach((record, name) => {
+            if (!grouped.has(name)) {
+                record.node.remove();
+                sections.delete(name);
+                stats.removed++;
+            }
+        });
+        placeInOrder(sectionsContainer, sectionNodes);
+    }
+
+    function flush() {
+        frameRequested = false;
+        if (pendingList) {
+            const list = pendingList;
+            pendingList = null;
+            pendingChores.clear();
+            reconcile(list);
+        } else {
+            const touched = new Set();
+            pendingChores.forEach((chore, id) => {
+                const record = chores.get(id);
+                if (!record) return;
+                patchChore(record, chore);
+                touched.add(record.state.section);
+            });
+            pendingChores.clear();
+            touched.forEach(name => {
+                if (sections.has(name)) updateSectionCheckbox(sections.get(name));
+            });
+        }
+        if (handlers.onRendered) handlers.onRendered();
+    }
+
+    function requestFlush() {
+        if (frameRequested) return;
+        frameRequested = true;
+        scheduleFrame(flush);
+    }
+
+    function sectionCheckboxes(sectionName) {
+        const section = sections.get(sectionName);
+        return section ? section.choreIds.map(id => chores.get(id).checkbox) : [];
+    }
+
+    return {
+        stats,
+        // Render the full list in the next frame; a later call in the same frame wins
+        schedule(nextChores) {
+            pendingList = nextChores;
+            requestFlush();
+        },
+        // Patch a single chore in the next frame, e.g. from a WebSocket update
+        patchChore(chore) {
+            pendingChores.set(chore.id, { ...chore });
+            requestFlush();
+        },
+        // Render now, skipping the frame wait
+        render(nextChores) {
+            pendingList = nextChores;
+            flush();
+        },
+        // Apply whatever is scheduled now
+        flush,
+        // Forget every node, e.g. when switching to another checklist
+        reset() {
+            sections.clear();
+            chores.clear();
+            pendingList = null;
+            pendingChores.clear();
+            sectionsContainer = null;
+            container.textContent = '';
+        },
+        sectionCheckboxes
+    };
+}
+
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { createChecklistView, groupBySection };
+}
@@ -0,0 +1,102 @@
+// Service worker for offline mode.
+//
+// The page and everything it links (app.js, style.css, the CDN scripts) are
+// cached on install, so the app opens without a connection. Checklist data
+// is fetched network-first and falls back to the last copy seen. Writes are
+// never cached here: app.js keeps offline ticks in its IndexedDB journal
+// and replays them through /api/mutations/batch.
+
+const CACHE_VERSION = 'v1';
+const SHELL_CACHE = `shell-${CACHE_VERSION}`;
+const DATA_CACHE = `data-${CACHE_VERSION}`;
+
+// Read-only API responses worth having offline
+const CACHED_API = [
+    /^\/api\/checklists$/,
+    /^\/api\/checklists\/[^/]+\/chores$/,
+    /^\/api\/staff$/,
+];
+
+// Assets referenced by the page: local static files and the CDN libraries
+function linkedAssets(html) {
+    const urls = new Set();
+    const pattern = /(?:src|href)="((?:\/static\/|https:\/\/cdn\.jsdelivr\.net\/)[^"]+)"/g;
+    let match;
+    while ((match = pattern.exec(html)) !== null) {
+        urls.add(match[1]);
+    }
+    return [...urls];
+}
+
+self.addEventListener('install', (event) => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(SHELL_CACHE);
+        const response = await fetch('/', { cache: 'no-cache' });
+        if (response.ok) {
+            const html = await response.clone().text();
+            await cache.put('/', response);
+            // CDN files are cross-origin, so they are cached as opaque responses
+            await Promise.all(linkedAssets(html).map(async (url) => {
+                try {
+                    const asset = await fetch(url, url.startsWith('/') ? {} : { mode: 'no-cors' });
+                    if (asset.ok || asset.type === 'opaque') await cache.put(url, asset);
+                } catch (error) {
+                    console.warn('Could not precache', url, error);
+                }
+            }));
+        }
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        const keep = new Set([SHELL_CACHE, DATA_CACHE]);
+        for (const key of await caches.keys()) {
+            if (!keep.has(key)) await caches.delete(key);
+        }
+        await self.clients.claim();
+    })());
+});
+
+// Try the network, keep a copy, and fall back to the copy when offline
+async function networkFirst(request, cacheName, cacheKey = request) {
+    const cache = await caches.open(cacheName);
+    try {
+        const response = await fetch(request);
+        if (response.ok) await cache.put(cacheKey, response.clone());
+        return response;
+    } catch (error) {
+        const cached = await cache.match(cacheKey);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+// Fingerprinted and CDN assets never change under the same URL
+async function cacheFirst(request) {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') await cache.put(request, response.clone());
+    return response;
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+
+    if (request.mode === 'navigate' && url.origin === self.location.origin && url.pathname === '/') {
+        event.respondWith(networkFirst(request, SHELL_CACHE, '/'));
+    } else if (url.origin === self.location.origin && CACHED_API.some((pattern) => pattern.test(url.pathname))) {
+        event.respondWith(networkFirst(request, DATA_CACHE));
+    } else if (url.origin === self.location.origin && url.pathname.startsWith('/static/dist/')) {
+        event.respondWith(cacheFirst(request));
+    } else if (url.origin === self.location.origin && url.pathname.startsWith('/static/')) {
+        event.respondWith(networkFirst(request, SHELL_CACHE));
+    } else if (url.hostname === 'cdn.jsdelivr.net') {
+        event.respondWith(cacheFirst(request));
+    }
+});